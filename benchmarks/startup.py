@@ -0,0 +1,135 @@
+# startup.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Benchmark for the startup time of the console entry points of
+# git-branchhealth.
+#
+# Each entry point declared in setup.py is measured in a fresh interpreter, so
+# that every measurement is a cold import: once for importing its module, and
+# once for running it with --help. Usage:
+#
+#   python benchmarks/startup.py [-n REPEAT]
+
+import argparse
+import ast
+import os.path
+import subprocess
+import sys
+
+# Modules that are slow to import, and shouldn't be needed just to start up.
+HEAVY_MODULES = ['git', 'babel', 'dateutil', 'pytz', 'nicelog', 'colors']
+
+# Script run in a fresh interpreter to time importing an entry point's module.
+IMPORT_SCRIPT = '''
+import sys, time
+start = time.time()
+import %(module)s
+elapsed = time.time() - start
+heavy = [x for x in %(heavy)r if x in sys.modules]
+print('%%f %%s' %% (elapsed, ','.join(heavy)))
+'''
+
+# Script run in a fresh interpreter to time running an entry point with --help.
+HELP_SCRIPT = '''
+import sys
+sys.argv = [%(name)r, '--help']
+from %(module)s import %(function)s
+%(function)s()
+'''
+
+def findRootDir():
+  return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def readEntryPoints(aSetupPath):
+  """
+  Read the console entry points declared in setup.py, without running it.
+
+  :return: A list of (script name, module, function) tuples.
+  """
+  with open(aSetupPath, 'r') as setupHandle:
+    tree = ast.parse(setupHandle.read(), aSetupPath)
+
+  entryPoints = []
+  for node in tree.body:
+    if not isinstance(node, ast.Assign):
+      continue
+    if [x.id for x in node.targets if isinstance(x, ast.Name)] != ['entry_points']:
+      continue
+
+    for declaration in ast.literal_eval(node.value).get('console_scripts', []):
+      (name, target) = [x.strip() for x in declaration.split('=', 1)]
+      (module, function) = target.split(':', 1)
+      entryPoints.append((name, module, function))
+  return entryPoints
+
+def timeImport(aModule, aRootDir):
+  """
+  Import a module in a fresh interpreter.
+
+  :return: A (seconds, list of heavy modules imported) tuple.
+  """
+  script = IMPORT_SCRIPT % {'module': aModule, 'heavy': HEAVY_MODULES}
+  output = subprocess.check_output([sys.executable, '-c', script], cwd=aRootDir)
+  parts = output.decode('utf-8').strip().split(' ')
+  heavy = []
+  if len(parts) > 1 and parts[1]:
+    heavy = parts[1].split(',')
+  return (float(parts[0]), heavy)
+
+def timeHelp(aName, aModule, aFunction, aRootDir):
+  """
+  Run an entry point with --help in a fresh interpreter, including the time
+  taken to start the interpreter itself.
+
+  :return: The wall clock time taken, in seconds.
+  """
+  import time
+
+  script = HELP_SCRIPT % {'name': aName, 'module': aModule, 'function': aFunction}
+  with open(os.devnull, 'w') as devNull:
+    start = time.time()
+    subprocess.call([sys.executable, '-c', script], cwd=aRootDir, stdout=devNull, stderr=devNull)
+    return time.time() - start
+
+def timeBaseline(aRootDir):
+  """
+  Start an empty interpreter, for comparison with timeHelp().
+  """
+  import time
+
+  start = time.time()
+  subprocess.call([sys.executable, '-c', 'pass'], cwd=aRootDir)
+  return time.time() - start
+
+def median(aValues):
+  values = sorted(aValues)
+  return values[len(values) // 2]
+
+def formatMillis(aSeconds):
+  return '%.1f ms' % (aSeconds * 1000)
+
+def runMain():
+  parser = argparse.ArgumentParser(description='Measure the cold startup time of the git-branchhealth console entry points.')
+  parser.add_argument('-n', '--repeat', action='store', type=int, dest='repeat', default=10,
+                      help='Number of fresh interpreters to measure each entry point with (default: 10)')
+  parsed = parser.parse_args()
+
+  rootDir = findRootDir()
+  repeat = max(1, parsed.repeat)
+
+  baseline = median([timeBaseline(rootDir) for x in range(repeat)])
+  print('{0:24} {1}'.format('interpreter', formatMillis(baseline)))
+
+  for (name, module, function) in readEntryPoints(os.path.join(rootDir, 'setup.py')):
+    imports = [timeImport(module, rootDir) for x in range(repeat)]
+    importTime = median([x[0] for x in imports])
+    heavy = imports[0][1]
+    helpTime = median([timeHelp(name, module, function, rootDir) for x in range(repeat)])
+
+    print('{0:24} import {1}, --help {2}'.format(name, formatMillis(importTime), formatMillis(helpTime)))
+    if heavy:
+      print('{0:24} heavy modules imported at startup: {1}'.format('', ', '.join(heavy)))
+
+if __name__ == '__main__':
+  runMain()
@@ -0,0 +1,180 @@
+# archive.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for archiving old branches, rather than deleting them, within
+# git-branchhealth.
+
+from datetime import date
+import os
+import os.path
+import shutil
+
+from refs import RefReader, findCheckedOutBranches, findCommonDir
+from transaction import RefTransaction, RefUpdateResult
+
+# The namespace that archived branches are moved to.
+ARCHIVE_NAMESPACE = 'refs/archive'
+
+class BranchArchiver:
+  """
+  Object used to archive local branches: each branch is moved from
+  'refs/heads/<name>' to 'refs/archive/<date>/<name>', so that it no longer
+  shows up as a branch (or needs to be read by every command that reads
+  branches), but none of its commits are lost. All branches are moved in a
+  single atomic ref transaction, and can be moved back with restoreBranches().
+
+  The configuration of archived branches (e.g. their upstreams) is kept, so
+  that it applies again once they are restored. So is their reflog, which is
+  moved along with each branch, so that the commits it was at before are still
+  listed (and kept by 'git gc').
+  """
+
+  def __init__(self, aConfig):
+    """
+    Create a new BranchArchiver instance.
+
+    :param aConfig: The :class:`config.BranchHealthConfig` object for this run.
+    """
+    self.__mConfig = aConfig
+
+  def archiveBranches(self, aBranches, aDate=None):
+    """
+    Archive a set of local branches.
+
+    :param aBranches: A list of (path, expected sha) tuples, where path is the
+                      full path of the branch (e.g. 'refs/heads/foo'), and
+                      expected sha is the sha the branch must still point to
+                      for it to be archived, or None to archive it wherever it
+                      points.
+    :param aDate: The date to file the archived branches under. Defaults to
+                  today.
+
+    :return: A list containing one :class:`transaction.RefUpdateResult` per
+             branch, in the order of aBranches.
+    """
+    archivePrefix = ARCHIVE_NAMESPACE + '/' + (aDate or date.today()).isoformat() + '/'
+    gitDir = self.__mConfig.getGitDir()
+    reader = RefReader(gitDir)
+    currentShas = dict(reader.readRefs(['refs/heads', archivePrefix]))
+    checkedOut = findCheckedOutBranches(gitDir)
+
+    results = {}
+    pending = []
+    for (path, expectedSha) in aBranches:
+      if path in results:
+        continue
+
+      currentSha = currentShas.get(path)
+      archivePath = archivePrefix + path[len('refs/heads/'):]
+      if not path.startswith('refs/heads/'):
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, 'only local branches can be archived')
+      elif path.split('/')[-1] == 'master':
+        results[path] = RefUpdateResult(path, RefUpdateResult.PROTECTED, 'cowardly refusing to archive master branch')
+      elif path in checkedOut:
+        results[path] = RefUpdateResult(path, RefUpdateResult.PROTECTED, 'branch is checked out')
+      elif currentSha is None:
+        results[path] = RefUpdateResult(path, RefUpdateResult.MISSING)
+      elif expectedSha and currentSha != expectedSha:
+        results[path] = RefUpdateResult(path, RefUpdateResult.MOVED, 'expected ' + expectedSha + ', found ' + currentSha)
+      elif archivePath in currentShas:
+        results[path] = RefUpdateResult(path, RefUpdateResult.EXISTS, archivePath + ' already exists')
+      else:
+        pending.append((path, archivePath, currentSha))
+        results[path] = None
+
+    self.__move(pending, RefUpdateResult.ARCHIVED, results)
+    return [results[path] for (path, expectedSha) in aBranches]
+
+  def restoreBranches(self, aArchive):
+    """
+    Move archived branches back to 'refs/heads'.
+
+    :param aArchive: Either the date the branches were archived under (e.g.
+                     '2014-07-20'), to restore all of them, or the name of a
+                     single archived branch below 'refs/archive' (e.g.
+                     '2014-07-20/feature/foo').
+
+    :return: A list containing one :class:`transaction.RefUpdateResult` per
+             archived branch (with the path of the archived ref), sorted by
+             path.
+    """
+    archivePath = ARCHIVE_NAMESPACE + '/' + aArchive.strip('/')
+    reader = RefReader(self.__mConfig.getGitDir())
+    archivedRefs = reader.readRefs([archivePath])
+    currentShas = dict(reader.readRefs(['refs/heads']))
+
+    results = {}
+    pending = []
+    for (path, sha) in archivedRefs:
+      # Strip 'refs/archive/<date>/' from the path.
+      relativePath = path[len(ARCHIVE_NAMESPACE) + 1:]
+      separator = relativePath.find('/')
+      branchPath = 'refs/heads/' + relativePath[separator + 1:]
+      if separator < 0:
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, 'not an archived branch')
+      elif branchPath in currentShas:
+        results[path] = RefUpdateResult(path, RefUpdateResult.EXISTS, branchPath + ' already exists')
+      else:
+        pending.append((path, branchPath, sha))
+        results[path] = None
+
+    self.__move(pending, RefUpdateResult.RESTORED, results)
+    return [results[path] for (path, sha) in archivedRefs]
+
+  ## Private API ##
+
+  def __move(self, aMoves, aOutcome, aResults):
+    """
+    Move refs in a single transaction.
+
+    :param aMoves: A list of (source path, destination path, sha) tuples.
+    :param aOutcome: The outcome to report for refs that were moved.
+    :param aResults: A dictionary mapping each source path to its
+                     RefUpdateResult, to fill in.
+    """
+    # Deleting a ref deletes its reflog, so each reflog is copied to the
+    # destination first. Git then appends the creation of the destination ref
+    # to it.
+    copiedReflogs = {}
+    groups = []
+    for (sourcePath, destinationPath, sha) in aMoves:
+      copiedReflogs[sourcePath] = self.__copyReflog(sourcePath, destinationPath)
+      groups.append((sourcePath, ['create ' + destinationPath + ' ' + sha, 'delete ' + sourcePath + ' ' + sha]))
+
+    errors = RefTransaction(self.__mConfig).commit(groups)
+    for (sourcePath, destinationPath, sha) in aMoves:
+      if errors[sourcePath]:
+        if copiedReflogs[sourcePath]:
+          self.__removeFile(copiedReflogs[sourcePath])
+        aResults[sourcePath] = RefUpdateResult(sourcePath, RefUpdateResult.FAILED, errors[sourcePath])
+      else:
+        aResults[sourcePath] = RefUpdateResult(sourcePath, aOutcome, destinationPath)
+
+  def __copyReflog(self, aSourcePath, aDestinationPath):
+    """
+    Copy the reflog of a ref to the reflog of another ref.
+
+    :return: The path of the copied reflog, or None if the source ref has no
+             reflog (or it couldn't be copied).
+    """
+    logsDir = os.path.join(findCommonDir(self.__mConfig.getGitDir()), 'logs')
+    sourceLog = os.path.join(logsDir, *aSourcePath.split('/'))
+    destinationLog = os.path.join(logsDir, *aDestinationPath.split('/'))
+    if not os.path.isfile(sourceLog):
+      return None
+
+    try:
+      if not os.path.isdir(os.path.dirname(destinationLog)):
+        os.makedirs(os.path.dirname(destinationLog))
+      shutil.copyfile(sourceLog, destinationLog)
+    except (IOError, OSError) as error:
+      self.__mConfig.getLog().warn("Unable to copy reflog of " + aSourcePath + ": " + str(error))
+      return None
+    return destinationLog
+
+  def __removeFile(self, aPath):
+    try:
+      os.remove(aPath)
+    except OSError:
+      pass
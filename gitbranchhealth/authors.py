@@ -0,0 +1,120 @@
+# authors.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for summarizing the health of branches by author within
+# git-branchhealth.
+
+import heapq
+
+from branch import Branch
+
+def getIdentityEmail(aIdentity):
+  """
+  Retrieve the (lower case) email address of an identity of the form
+  'Name <email>', or the whole identity if it has no email address.
+  """
+  start = aIdentity.rfind('<')
+  end = aIdentity.rfind('>')
+  if start < 0 or end < start:
+    return aIdentity.strip().lower()
+  return aIdentity[start + 1:end].strip().lower()
+
+class AuthorSummary:
+  """
+  The branches of a single author: the number of branches of each health, and
+  the oldest of them.
+  """
+
+  def __init__(self, aIdentity):
+    self.__mIdentity = aIdentity
+    self.__mHealthCounts = [0, 0, 0]
+    # A heap of (-epoch, path) tuples of the oldest branches, newest first.
+    self.__mOldest = []
+
+  def getIdentity(self):
+    """
+    Retrieve the identity ('Name <email>') of this author, as it appears on the
+    most recently added branch.
+    """
+    return self.__mIdentity
+
+  def getBranchCount(self):
+    return sum(self.__mHealthCounts)
+
+  def getHealthCount(self, aHealth):
+    """
+    Retrieve the number of this author's branches with a given health (e.g.
+    Branch.OLD).
+    """
+    return self.__mHealthCounts[aHealth]
+
+  def getOldestBranches(self):
+    """
+    Retrieve the oldest branches of this author.
+
+    :return: A list of (path, epoch) tuples, oldest first.
+    """
+    return [(path, -negativeEpoch) for (negativeEpoch, path) in sorted(self.__mOldest, reverse=True)]
+
+  def add(self, aIdentity, aPath, aEpoch, aHealth, aOldestCount):
+    self.__mIdentity = aIdentity
+    self.__mHealthCounts[aHealth] += 1
+    if len(self.__mOldest) < aOldestCount:
+      heapq.heappush(self.__mOldest, (-aEpoch, aPath))
+    elif aOldestCount and (-aEpoch, aPath) > self.__mOldest[0]:
+      heapq.heapreplace(self.__mOldest, (-aEpoch, aPath))
+
+class AuthorReport:
+  """
+  A summary of branches by the author of their tip commit. Branches are added
+  one at a time, and only a few counters and the oldest branches of each
+  author are kept, so memory use depends on the number of authors, rather
+  than the number of branches.
+
+  Authors are identified by their email address, so that branches whose tips
+  were written under different spellings of the same name are counted
+  together.
+  """
+
+  # Number of oldest branches to keep for each author, if not configured.
+  OLDEST_COUNT = 3
+
+  def __init__(self, aOldestCount=OLDEST_COUNT):
+    """
+    Create a new, empty AuthorReport.
+
+    :param aOldestCount: The number of oldest branches to keep for each author.
+    """
+    self.__mOldestCount = aOldestCount
+    self.__mSummaries = {}
+
+  def add(self, aPath, aEpoch, aHealth, aAuthor):
+    """
+    Add a branch to this report.
+
+    :param aPath: The full ref path of the branch.
+    :param aEpoch: The date of last activity on the branch, in seconds since
+                   the epoch (UTC).
+    :param aHealth: The health of the branch (e.g. Branch.OLD).
+    :param aAuthor: The author of the tip commit of the branch, of the form
+                    'Name <email>'.
+    """
+    key = getIdentityEmail(aAuthor)
+    summary = self.__mSummaries.get(key)
+    if summary is None:
+      summary = AuthorSummary(aAuthor)
+      self.__mSummaries[key] = summary
+    summary.add(aAuthor, aPath, aEpoch, aHealth, self.__mOldestCount)
+
+  def getSummaries(self):
+    """
+    Retrieve the summary of each author, those with the most old branches first
+    (and then those with the most branches).
+
+    :return: A list of AuthorSummary objects.
+    """
+    def sortKey(aSummary):
+      return (-aSummary.getHealthCount(Branch.OLD), -aSummary.getBranchCount(), aSummary.getIdentity())
+
+    return sorted(self.__mSummaries.values(), key=sortKey)
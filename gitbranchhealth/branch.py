@@ -1,9 +1,7 @@
-from datetime import timedelta
 from datetime import datetime
-from babel.dates import format_timedelta
-import dateutil.parser
-from datetime import *
-import pytz
+
+from relativetime import formatRelativeTime
+from resolver import ActivityResolver, dateTimeToEpoch, epochToDateTime
 
 class Branch:
   """
@@ -17,14 +15,32 @@ class Branch:
   AGED = 1
   OLD = 2
 
-  def __init__(self, aBranchPath, aConfig):
+  def __init__(self, aBranchPath, aConfig, aLastActivity=None, aSha=None):
+    """
+    Create a new Branch object.
+
+    :param aBranchPath: The full ref path of the branch (e.g. 'refs/heads/foo').
+    :param aConfig: The :class:`config.BranchHealthConfig` object for this run.
+    :param aLastActivity: If given, the (naive, UTC) datetime of the last
+                          activity on this branch, as already resolved in bulk
+                          by an :class:`resolver.ActivityResolver`. If not
+                          given, it will be computed by querying git directly.
+    :param aSha: If given, the sha of the commit at the tip of this branch.
+    """
     self.__mLastActivityRelative = None
+    self.__mLastActivityEpoch = None
+    self.__mHealth = None
+    self.__mDivergence = None
     self.__mBranchPath = aBranchPath
     self.__mConfig = aConfig
-    self.__computeLastActivity()
+    self.__mSha = aSha
+    if aLastActivity is not None:
+      self.__mLastActivity = aLastActivity
+    else:
+      self.__computeLastActivity()
 
   def __str__(self):
-    return self.__mBranchPath + ", Last Activity: " + str(self.__mLastActivity) + "(" + self.__mLastActivityRelative +  ")"
+    return self.__mBranchPath + ", Last Activity: " + str(self.__mLastActivity) + "(" + self.getLastActivityRelativeToNow() +  ")"
 
   def isRemote(self):
     if self.getPath().startswith('refs/remotes'):
@@ -34,61 +50,83 @@ class Branch:
   def getPath(self):
     return self.__mBranchPath
 
+  def getSha(self):
+    """
+    Retrieve the sha of the commit at the tip of this branch, if it is known.
+    """
+    return self.__mSha
+
   def getLastActivity(self):
     return self.__mLastActivity
 
+  def getLastActivityEpoch(self):
+    """
+    Retrieve the date of last activity on this branch, in seconds since the
+    epoch (UTC).
+    """
+    if self.__mLastActivityEpoch is None:
+      self.__mLastActivityEpoch = dateTimeToEpoch(self.__mLastActivity)
+    return self.__mLastActivityEpoch
+
   def getLastActivityRelativeToNow(self):
     if not self.__mLastActivityRelative:
       self.__computeRelativeLastActivity()
     return str(self.__mLastActivityRelative)
 
   def getHealth(self):
-    self.markHealth()
+    if self.__mHealth is None:
+      self.markHealth()
     return self.__mHealth
 
   def getName(self):
     return self.getPath().split('/')[-1]
 
+  def getDivergence(self):
+    """
+    Retrieve how far this branch has diverged from the trunk branch, if it has
+    been determined (see :meth:`manager.BranchManager.getDivergence`).
+
+    :return: An (ahead, behind, exact) tuple, where ahead and behind are the
+             numbers of commits on this branch but not the trunk, and on the
+             trunk but not this branch, and exact is False if they are lower
+             bounds; or None if the divergence isn't known.
+    """
+    return self.__mDivergence
+
+  def setDivergence(self, aAhead, aBehind, aIsExact=True):
+    self.__mDivergence = (aAhead, aBehind, aIsExact)
+
   def markHealth(self):
     """
     Determine whether this branch is healthy, based on the date of last activity.
     """
 
-    healthyDays = self.__mConfig.getHealthyDays()
-    branchPath = self.getPath()
-    isoDate = self.getLastActivity()
-    humanDate = self.getLastActivityRelativeToNow()
-
-    branchLife = date.today() - isoDate.date()
-    if branchLife > timedelta(healthyDays * 2):
-      self.__mHealth = Branch.OLD
-    elif branchLife > timedelta(healthyDays):
-      self.__mHealth = Branch.AGED
-    else:
-      self.__mHealth = Branch.HEALTHY
+    # Note that the relative date is deliberately not computed here, as
+    # formatting it is expensive, and it's only needed for branches that are
+    # actually displayed.
+    classifier = self.__mConfig.getHealthClassifier()
+    self.__mHealth = classifier.classify(self.getLastActivityEpoch())
 
   ## Private API ##
 
   def __computeLastActivity(self):
     repo = self.__mConfig.getRepo()
-    assert(repo.bare == False)
     gitCmd = repo.git
 
-    hasActivityNonRel = gitCmd.log('--abbrev-commit', '--date=iso', '-1', self.getPath())
-    hasActivityNonRelLines = hasActivityNonRel.split('\n')
-    i = 0
-    for line in hasActivityNonRelLines:
-      if 'Date:' in line:
-        lastActivity = line.replace('Date: ', '').strip()
-        lastActivityNonRel = hasActivityNonRelLines[i].replace('Date: ', '').strip()
-        self.__mLastActivity = self.__parseDateFromString(lastActivityNonRel).astimezone(pytz.timezone("UTC")).replace(tzinfo=None)
-        break
-      i = i + 1
+    # Resolve the branch the same way branches are resolved in bulk, so that it
+    # benefits from the commit date cache and the commit-graph.
+    for (path, sha, epoch) in ActivityResolver(self.__mConfig).resolve([self.getPath()]):
+      if path == self.getPath():
+        self.__mLastActivity = epochToDateTime(epoch)
+        self.__mSha = sha
+        return
 
-  def __parseDateFromString(self, aDateString):
-    return dateutil.parser.parse(aDateString)
+    # Not a full ref path, so ask git for the timestamp directly.
+    logFormat = ActivityResolver.LOG_FORMATS[self.__mConfig.getCommitDateField()]
+    lastActivityEpoch = gitCmd.log('-1', '--format=' + logFormat, self.getPath()).strip()
+    self.__mLastActivity = epochToDateTime(int(lastActivityEpoch))
 
   def __computeRelativeLastActivity(self):
     curDateTime = datetime.utcnow()
     difference = curDateTime - self.__mLastActivity
-    self.__mLastActivityRelative = format_timedelta(difference) + " ago"
+    self.__mLastActivityRelative = formatRelativeTime(difference.days * 86400 + difference.seconds)
@@ -13,17 +13,16 @@ import logging
 import sys
 import os
 
-from git import *
-
 import argparse
-import sys
-from datetime import *
-import dateutil.parser
-from colors import red, yellow, green
 
+from authors import AuthorReport
 from branch import Branch
+from cache import ReportCache
 from config import BranchHealthConfig
 from manager import BranchManager
+from multirepo import MultiRepositoryScanner, findRepositories, readRepositoryList
+from resolver import epochToDateTime
+from table import BranchTable
 from util import parseIgnoredBranchListFromString
 
 class BranchHealthApplication:
@@ -33,18 +32,23 @@ class BranchHealthApplication:
   as a harness for testing.
   """
 
-  def __init__(self, aArguments=None):
+  def __init__(self, aArguments=None, aRepository=None):
     """
     Create a new BranchHealthApplication context.
 
     @param aConfig Configuration information to initialize the application.
     @param aArguments Command line arguments to initialize the application with
            if no arguments are given, default values will be assigned.
+    @param aRepository If given, the path to the repository to operate on,
+           overriding -R and any options that select multiple repositories.
     """
     self.__mArgParser = self.__createParser()
+    self.__mArguments = aArguments or []
+    self.__mParsedArguments = None
+    self.__mBranchTable = None
 
-    if aArguments:
-      self.__mConfig = self.__parseArguments(aArguments)
+    if aArguments or aRepository:
+      self.__mConfig = self.__parseArguments(self.__mArguments, aRepository)
     else:
       self.__mConfig = BranchHealthConfig('.', aLogLevel=0)
 
@@ -53,10 +57,63 @@ class BranchHealthApplication:
     Output the health of all branches from the branch map given in the BranchManager.
     This displays the branches in descending order of last activity age.
 
+    If caching is enabled and the repository's refs have not changed since the
+    last run, the branch table from that run is reused. Branch health is always
+    recomputed against the current time.
+
     :param aStream: An output stream to send the output to.
     """
-    branchMap = []
+    config = self.getConfig()
+    if config.shouldReportByAuthor():
+      self.showAuthorReport(aStream)
+      return
+
+    if config.getLimit() or config.shouldSortByDate():
+      # Keep the sorted branches in a compact table, and only create a Branch
+      # object for each one as it is printed.
+      branches = self.computeBranchTable().iterBranches(config)
+    else:
+      # Print each branch as soon as it has been resolved.
+      branches = BranchManager(config).iterBranches()
+
+    oldBranches = self.__printBranchHealthChart(branches, aStream)
+    self.deleteOldBranchesIfRequested(oldBranches)
+
+  def showAuthorReport(self, aStream=sys.stdout):
+    """
+    Output a summary of branches by the author of their tip commits: for each
+    author, the number of branches (and of old branches), followed by their
+    oldest branches (as many as given by --limit). Authors with the most old
+    branches are shown first.
 
+    :param aStream: An output stream to send the output to.
+    """
+    config = self.getConfig()
+    oldestCount = config.getLimit()
+    if oldestCount is None:
+      oldestCount = AuthorReport.OLDEST_COUNT
+
+    report = BranchManager(config).getAuthorReport(oldestCount, config.getBadOnly())
+    for summary in report.getSummaries():
+      aStream.write('{0} ({1} branches, {2} old):\n'.format(summary.getIdentity(), summary.getBranchCount(), summary.getHealthCount(Branch.OLD)))
+      for (branchPath, epoch) in summary.getOldestBranches():
+        branch = Branch(branchPath, config, epochToDateTime(epoch))
+        self.__printBranchHealthLine('  ' + branchPath, branch.getHealth(), branch.getLastActivityRelativeToNow(), False, not config.shouldUseColor(), aStream)
+
+  def computeBranchTable(self):
+    """
+    Compute the branches to show, as a :class:`table.BranchTable` sorted in
+    descending order of last activity age.
+
+    If caching is enabled and the repository's refs have not changed since the
+    last run, the branch table from that run is reused.
+
+    If a limit was given, only the oldest (or newest) branches, up to that
+    limit, are included. If only bad branches are to be shown, the others are
+    left out.
+
+    :returns: A sorted BranchTable.
+    """
     config = self.getConfig()
     log = config.getLog()
     remoteName = config.getRemoteName()
@@ -66,11 +123,128 @@ class BranchHealthApplication:
       log.debug('Operating on repository in: ' + repoPath)
       log.debug('Operating on remote named: ' + str(remoteName))
 
-    repo = config.getRepo()
     manager = BranchManager(config)
 
-    branchMap = manager.getBranchMap()
-    self.__printBranchHealthChart(branchMap, aStream)
+    limit = config.getLimit()
+    if limit:
+      # If no refs have changed since the last run, take the branches from its
+      # branch table. Otherwise, stream the branches through a bounded heap,
+      # rather than sorting all of them.
+      table = None
+      if config.shouldUseCache():
+        table = manager.loadBranchTableFromCache(ReportCache(config.getGitDir(), log))
+
+      if table is None:
+        table = BranchTable()
+        for branch in manager.getTopBranches(limit, config.shouldShowNewest(), config.getBadOnly()):
+          table.append(branch.getPath(), branch.getSha(), branch.getLastActivityEpoch(), branch.getHealth())
+      else:
+        if config.getBadOnly():
+          table = table.selectHealth(Branch.OLD)
+        indices = range(len(table))
+        if config.shouldShowNewest():
+          table = table.select(indices[-limit:])
+        else:
+          table = table.select(indices[:limit])
+    elif config.shouldUseCache():
+      # If no refs have changed since the last run, reuse its branch table.
+      table = manager.getBranchTableFromCache(ReportCache(config.getGitDir(), log), config.getBadOnly())
+    else:
+      table = manager.getBranchTable(aOldOnly=config.getBadOnly())
+
+    self.__mBranchTable = table
+    return self.__mBranchTable
+
+  def deleteOldBranchesIfRequested(self, aOldBranches=None):
+    """
+    Delete (or archive) old branches, if deletion (or archival) of old branches
+    was requested.
+
+    :param aOldBranches: The list of Branch objects to delete. If not given, all
+                         branches in the most recently computed branch table
+                         that are considered old are deleted.
+    """
+    config = self.getConfig()
+    if not config.shouldDeleteOldBranches() and not config.shouldArchiveOldBranches():
+      return
+
+    deleteBucket = aOldBranches
+    if deleteBucket is None:
+      deleteBucket = []
+      if self.__mBranchTable is not None:
+        deleteBucket = list(self.__mBranchTable.selectHealth(Branch.OLD).iterBranches(config))
+    manager = BranchManager(config)
+    if config.shouldRemoveMergedOnly():
+      deleteBucket = manager.selectMergedBranches(deleteBucket)
+    if config.shouldArchiveOldBranches():
+      manager.archiveAllOldBranches(deleteBucket)
+    else:
+      manager.deleteAllOldBranches(deleteBucket)
+
+  def restoreArchivedBranches(self, aStream=sys.stdout):
+    """
+    Move the branches of the archive given by --restore back to 'refs/heads',
+    and output the outcome for each of them.
+
+    :param aStream: An output stream to send the output to.
+    """
+    config = self.getConfig()
+    results = BranchManager(config).restoreArchivedBranches(config.getArchiveToRestore())
+    if not results:
+      config.getLog().warn("No archived branches found in: " + config.getArchiveToRestore())
+
+    for result in results:
+      aStream.write(str(result) + '\n')
+
+  def isMultiRepository(self):
+    """
+    Determine whether this application context operates on many repositories,
+    as requested by the --repository-list or --scan-dir options.
+    """
+    return self.__mConfig is None
+
+  def showMultiRepositoryHealth(self, aStream=sys.stdout, aErrorStream=sys.stderr, aInputStream=sys.stdin):
+    """
+    Output the health of all branches in each of the repositories selected by the
+    --repository-list and --scan-dir options. Repositories are scanned in
+    parallel, and a failure to scan one repository is reported without
+    affecting any of the others.
+
+    :param aStream: An output stream to send the output to.
+    :param aErrorStream: An output stream to report failed repositories to.
+    :param aInputStream: The stream to read the repository list from, if it was
+                         given as '-'.
+    """
+    parsed = self.__mParsedArguments
+    repositories = []
+    if parsed.repositoryList == '-':
+      repositories.extend(readRepositoryList(aInputStream))
+    elif parsed.repositoryList:
+      with open(parsed.repositoryList, 'r') as listHandle:
+        repositories.extend(readRepositoryList(listHandle))
+    if parsed.scanDir:
+      repositories.extend(findRepositories(parsed.scanDir))
+
+    scanner = MultiRepositoryScanner(self.__mArguments, parsed.jobs)
+    combinedRows = []
+    for (repoPath, rows, error) in scanner.scan(repositories):
+      if error:
+        aErrorStream.write('Unable to check branch health of ' + repoPath + ': ' + error + '\n')
+        continue
+
+      if parsed.combined:
+        combinedRows.extend([(epoch, repoPath, branchPath, health, lastActivityRel) for (branchPath, epoch, health, lastActivityRel) in rows])
+        continue
+
+      aStream.write(repoPath + ':\n')
+      for (branchPath, epoch, health, lastActivityRel) in rows:
+        self.__printBranchHealthLine('  ' + branchPath, health, lastActivityRel, parsed.badOnly, parsed.noColor, aStream)
+
+    if parsed.combined:
+      combinedRows.sort()
+      for (epoch, repoPath, branchPath, health, lastActivityRel) in combinedRows:
+        label = repoPath + ' ' + branchPath
+        self.__printBranchHealthLine(label, health, lastActivityRel, parsed.badOnly, parsed.noColor, aStream)
 
   def getConfig(self):
     """
@@ -118,13 +292,53 @@ class BranchHealthApplication:
     parser.add_argument('-d', '--days', action='store', dest='numDays',
                         help='Specify number of days old where a branch is considered to no longer be \'healthy\'',
                         default=14)
+    parser.add_argument('-u', '--unsorted', action='store_true', dest='unsorted',
+                        help='Print each branch as soon as it has been checked, rather than sorting branches by date')
+    parser.add_argument('-l', '--limit', action='store', type=int, metavar=('N'), dest='limit', default=None,
+                        help='Only show the N oldest branches (N must be at least 1)')
+    parser.add_argument('--newest', action='store_true', dest='newest',
+                        help='With --limit, show the N newest branches instead of the N oldest')
+    parser.add_argument('--shared-tips', action='store_true', dest='sharedTips',
+                        help='Show the other branches that point to the same commit as each branch')
+    parser.add_argument('--by-author', action='store_true', dest='byAuthor',
+                        help='Summarize branches by the author of their tip commits, showing the oldest branches (up to --limit) of each author')
     parser.add_argument('-n', '--nocolor', action='store_true', help="Don't use ANSI colors to display branch health",
                         dest='noColor')
     parser.add_argument('-R', '--repository', action='store',  metavar=('repository'), help='Path to git repository where branches should be listed', nargs='?', default='.', dest='repo')
-    parser.add_argument('-D', '--delete', action='store_true', help='Delete old branches that are considered "unhealthy"', dest='deleteOld')
-    parser.add_argument('-i-', '--ignore-branches', action='store', help='Ignore a set of branches specified by a comma-separated list of branch names', dest='ignoredBranches', default='master')
+    deleteGroup = parser.add_mutually_exclusive_group()
+    deleteGroup.add_argument('-D', '--delete', action='store_true', help='Delete old branches that are considered "unhealthy"', dest='deleteOld')
+    deleteGroup.add_argument('--archive', action='store_true', dest='archiveOld',
+                             help='Move old local branches to refs/archive/<date>/<name>, rather than deleting them')
+    deleteGroup.add_argument('--restore', action='store', metavar=('archive'), dest='restoreArchive', default=None,
+                             help='Move archived branches back to refs/heads: either all branches archived on a given date (e.g. 2014-07-20), or a single archived branch (e.g. 2014-07-20/foo)')
+    parser.add_argument('--merged-only', action='store_true', dest='mergedOnly',
+                        help='With --delete or --archive, only remove old branches that have been merged into the trunk branch')
+    parser.add_argument('--show-merged', action='store_true', dest='showMerged',
+                        help='Show whether each branch has been merged into the trunk branch')
+    parser.add_argument('--ahead-behind', action='store_true', dest='showDivergence',
+                        help='Show how many commits each branch is ahead of and behind the trunk branch')
+    parser.add_argument('--max-walk', action='store', type=int, metavar=('N'), dest='maxWalk', default=None,
+                        help='Walk at most N commits, newest first, when comparing branches with the trunk branch; counts that are cut short are shown as lower bounds with a "+" (default: %d)' % BranchHealthConfig.MAX_WALK)
+    parser.add_argument('-i-', '--ignore-branches', action='store', help='Ignore a set of branches specified by a comma-separated list of branch names, namespaces (e.g. "dependabot/") or glob patterns (e.g. "release/*")', dest='ignoredBranches', default='master')
+    parser.add_argument('--ref-pattern', action='append', metavar=('pattern'), dest='refPatterns', default=None,
+                        help='Only check refs matching the given pattern (e.g. "feature/*", or "refs/heads/feature/*"), which is passed to ref enumeration so that other refs are never read. May be given more than once')
+    parser.add_argument('--backend', action='store', choices=BranchHealthConfig.BACKENDS, dest='backend', default=None,
+                        help='Specify how refs and commits are read: by running git commands ("git"), or by reading the repository directly, without any subprocesses ("native")')
+    parser.add_argument('--activity', action='store', choices=BranchHealthConfig.ACTIVITY_SOURCES, dest='activitySource', default=None,
+                        help='Specify where the date of last activity on each branch comes from: the author date of its tip commit ("author"), the committer date of its tip commit, which changes when it is rebased or cherry-picked, and is the only date that the commit-graph of the repository speeds up ("committer"), the last entry of its reflog, e.g. when it was last rebased or fetched ("reflog"), or the later of the reflog and the author date ("max")')
+    parser.add_argument('--no-cache', action='store_true', dest='noCache',
+                        help="Don't read or write the on-disk cache of commit dates")
     parser.add_argument('-t', '--trunk', action='store', help='Specify the trunk branch name for the given repository', metavar=('trunkBranch'), dest='trunkBranch', default='master')
 
+    parser.add_argument('--repository-list', action='store', metavar=('file'), dest='repositoryList', default=None,
+                        help='Check the branch health of every repository listed (one per line) in the given file, or on stdin if the file is "-"')
+    parser.add_argument('--scan-dir', action='store', metavar=('directory'), dest='scanDir', default=None,
+                        help='Check the branch health of every repository found below the given directory')
+    parser.add_argument('-j', '--jobs', action='store', type=int, metavar=('jobs'), dest='jobs', default=None,
+                        help='Number of repositories to check in parallel, when checking multiple repositories (default: number of CPUs), or of remotes to delete branches from in parallel')
+    parser.add_argument('--combined', action='store_true', dest='combined',
+                        help='When checking multiple repositories, show the branches of all repositories in a single list, sorted by date, rather than one section per repository')
+
     # Make sure that only one of -r and --all-remotes is specified
     remoteGroup = parser.add_mutually_exclusive_group()
     remoteGroup.add_argument('-r', '--remote', metavar=('<remote name>'), action='store',
@@ -136,18 +350,31 @@ class BranchHealthApplication:
 
     return parser
 
-  def __parseArguments(self, aArguments):
+  def __parseArguments(self, aArguments, aRepository=None):
     """
     Parse command line arguments given to this application.
 
+    :param aRepository: If given, the path to the repository to operate on,
+                        overriding -R and any options that select multiple
+                        repositories.
+
     :returns: A BranchHealthConfig object populated with the values from the command
               line arguments, as well as the values from the git configuration file
-              for a given repository (if it exists).
+              for a given repository (if it exists), or None if multiple
+              repositories were selected.
     """
     parsed = self.__mArgParser.parse_args(aArguments)
+    self.__mParsedArguments = parsed
+
+    if parsed.limit is not None and parsed.limit < 1:
+      self.__mArgParser.error('--limit must be at least 1')
+
+    if not aRepository and (parsed.repositoryList or parsed.scanDir):
+      self.__checkMultiRepositoryArguments(parsed)
+      return None
 
     # Retrieve the git repository, if one wasn't given on the command line
-    repo = parsed.repo
+    repo = aRepository or parsed.repo
 
     ignoredBranches = parseIgnoredBranchListFromString(parsed.ignoredBranches)
 
@@ -166,7 +393,20 @@ class BranchHealthApplication:
     elif parsed.allRemotes:
       remote = 'all'
 
-    return BranchHealthConfig(repo, remote, parsed.numDays, parsed.badOnly, parsed.noColor, parsed.deleteOld, parsed.trunkBranch, ignoredBranches, possibleLogLevels[logLevel])
+    return BranchHealthConfig(repo, remote, parsed.numDays, parsed.badOnly, parsed.noColor, parsed.deleteOld, parsed.trunkBranch, ignoredBranches, possibleLogLevels[logLevel], aBackend=parsed.backend, aNoCache=parsed.noCache, aUnsorted=parsed.unsorted, aLimit=parsed.limit, aNewest=parsed.newest, aJobs=parsed.jobs, aArchiveOldBranches=parsed.archiveOld, aRestoreArchive=parsed.restoreArchive, aRefPatterns=parsed.refPatterns, aShowSharedTips=parsed.sharedTips, aMergedOnly=parsed.mergedOnly, aShowMerged=parsed.showMerged, aShowDivergence=parsed.showDivergence, aMaxWalk=parsed.maxWalk, aByAuthor=parsed.byAuthor, aActivitySource=parsed.activitySource)
+
+  def __checkMultiRepositoryArguments(self, aParsed):
+    """
+    Reject options that only apply to a single repository, when multiple
+    repositories were selected. The per-repository output has no room for the
+    extra columns or reports they produce, so they would otherwise be ignored.
+    """
+    singleRepositoryOptions = [('byAuthor', '--by-author'), ('showMerged', '--show-merged'),
+                               ('showDivergence', '--ahead-behind'), ('sharedTips', '--shared-tips'),
+                               ('restoreArchive', '--restore')]
+    for (dest, option) in singleRepositoryOptions:
+      if getattr(aParsed, dest):
+        self.__mArgParser.error(option + ' cannot be used with --repository-list or --scan-dir')
 
   def __printBranchHealthChart(self, aBranchMap, aStream):
     """
@@ -178,9 +418,13 @@ class BranchHealthApplication:
           ago will be colored in YELLOW.
         - All other branches will be colored in GREEN
 
-    :param aBranchMap: A list of Branch objects. Note that this list is assumed to
-                       be pre-sorted in the order in which they should be output.
+    :param aBranchMap: An iterable of Branch objects, in the order in which they
+                       should be output. It is consumed one branch at a time,
+                       so it may be a generator.
     :param aStream: An output stream to print the data to.
+
+    :returns: A list of the branches that are considered old, if old branches
+              should be deleted; otherwise, an empty list.
     """
 
     config = self.getConfig()
@@ -189,37 +433,87 @@ class BranchHealthApplication:
 
     log = config.getLog()
 
+    shouldDelete = config.shouldDeleteOldBranches() or config.shouldArchiveOldBranches()
     deleteBucket = []
+
+    sharedTips = {}
+    if config.shouldShowSharedTips():
+      sharedTips = BranchManager(config).getRefsSharingTips()
+
+    mergedTips = None
+    if config.shouldShowMerged():
+      mergedTips = BranchManager(config).getMergedTips()
+
+    divergence = {}
+    if config.shouldShowDivergence():
+      divergence = BranchManager(config).getDivergence() or {}
+
     for someBranch in aBranchMap:
       branchPath = someBranch.getPath()
       branchHealth = someBranch.getHealth()
-      lastActivityRel = someBranch.getLastActivityRelativeToNow()
 
       # If this is an unhealthy branch, then let's put it in the "delete"
       # bucket.
-      if branchHealth == Branch.OLD:
+      if shouldDelete and branchHealth == Branch.OLD:
         deleteBucket.append(someBranch)
 
-      # Skip healthy and aged branches if we're only looking for bad ones
+      # The relative date is only formatted for lines that are printed.
       if badOnly and not branchHealth == Branch.OLD:
         continue
 
-      if not noColor:
-        if branchHealth == Branch.HEALTHY:
-          coloredDate = green(lastActivityRel)
-        elif branchHealth == Branch.AGED:
-          coloredDate = yellow(lastActivityRel)
+      lastActivityRel = someBranch.getLastActivityRelativeToNow()
+      sharingPaths = [x for x in sharedTips.get(someBranch.getSha(), []) if x != branchPath]
+      suffix = ''
+      if mergedTips is not None:
+        if someBranch.getSha() in mergedTips:
+          suffix += ' [merged]'
         else:
-          coloredDate = red(lastActivityRel)
-      else:
-          coloredDate = lastActivityRel
+          suffix += ' [unmerged]'
+      if someBranch.getSha() in divergence:
+        (ahead, behind, isExact) = divergence[someBranch.getSha()]
+        someBranch.setDivergence(ahead, behind, isExact)
+        bound = ''
+        if not isExact:
+          bound = '+'
+        suffix += ' (ahead ' + str(ahead) + bound + ', behind ' + str(behind) + bound + ')'
+      if sharingPaths:
+        suffix += ' (same commit as: ' + ', '.join(sharingPaths) + ')'
+      self.__printBranchHealthLine(branchPath, branchHealth, lastActivityRel, badOnly, noColor, aStream, suffix)
+
+    return deleteBucket
+
+  def __printBranchHealthLine(self, aLabel, aHealth, aLastActivityRel, aBadOnly, aNoColor, aStream, aSuffix=''):
+    """
+    Print a single line of a 'health chart', colored according to the health of
+    the branch it describes.
+
+    :param aLabel: The text identifying the branch (usually its path).
+    :param aHealth: The health of the branch (e.g. Branch.OLD).
+    :param aLastActivityRel: The time since the last activity on the branch, as
+                             a human-readable string.
+    :param aBadOnly: If True, the line is only printed if the branch is old.
+    :param aNoColor: If True, don't use ANSI colors.
+    :param aStream: An output stream to print the line to.
+    :param aSuffix: Additional (uncolored) text to print after the date.
+    """
+    # Skip healthy and aged branches if we're only looking for bad ones
+    if aBadOnly and not aHealth == Branch.OLD:
+      return
 
-      alignedPrintout = '{0:40} {1}\n'.format(branchPath + ":", coloredDate)
-      aStream.write(alignedPrintout)
+    if not aNoColor:
+      from colors import red, yellow, green
 
-    if config.shouldDeleteOldBranches():
-      manager = BranchManager(config)
-      manager.deleteAllOldBranches(deleteBucket)
+      if aHealth == Branch.HEALTHY:
+        coloredDate = green(aLastActivityRel)
+      elif aHealth == Branch.AGED:
+        coloredDate = yellow(aLastActivityRel)
+      else:
+        coloredDate = red(aLastActivityRel)
+    else:
+        coloredDate = aLastActivityRel
+
+    alignedPrintout = '{0:40} {1}{2}\n'.format(aLabel + ":", coloredDate, aSuffix)
+    aStream.write(alignedPrintout)
 
 # Main entry point
 def runMain(aInOldMode=False):
@@ -228,10 +522,18 @@ def runMain(aInOldMode=False):
 
   context = BranchHealthApplication(sys.argv[1:])
 
+  if context.isMultiRepository():
+    context.showMultiRepositoryHealth()
+    return
+
   if context.getConfig().getRepoPath() == None:
     context.printHelp()
     return
 
+  if context.getConfig().getArchiveToRestore():
+    context.restoreArchivedBranches()
+    return
+
   context.showBranchHealth()
 
 # Entry point for 'git branchhealth', the old version of the command. This is
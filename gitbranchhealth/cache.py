@@ -0,0 +1,313 @@
+# cache.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for persisting data computed by git-branchhealth between runs.
+
+import errno
+import os
+import os.path
+import time
+from collections import OrderedDict
+
+from refs import findCommonDir
+from util import encodeText
+
+def getCacheDir(aGitDir):
+  """
+  Retrieve the directory in which git-branchhealth stores its caches for a
+  given repository.
+  """
+  return os.path.join(findCommonDir(aGitDir), 'branchhealth')
+
+def replaceFile(aSource, aDestination):
+  """
+  Atomically move a file into place, replacing any existing file.
+  """
+  if hasattr(os, 'replace'):
+    os.replace(aSource, aDestination)
+    return
+
+  try:
+    os.rename(aSource, aDestination)
+  except OSError:
+    # Windows does not allow renaming over an existing file.
+    os.remove(aDestination)
+    os.rename(aSource, aDestination)
+
+class CacheLock:
+  """
+  An advisory lock, held by creating a lock file exclusively. Locks are never
+  waited on: a process that cannot acquire the lock simply skips the work it
+  guards, as the caches are an optimization only.
+  """
+
+  # Age, in seconds, after which a lock file is assumed to have been left
+  # behind by a process that died, and is removed.
+  STALE_AFTER = 60
+
+  def __init__(self, aPath):
+    self.__mPath = aPath
+    self.__mHeld = False
+
+  def acquire(self):
+    """
+    Try to acquire this lock.
+
+    :return: True if the lock was acquired; False if it is held by someone else.
+    """
+    for attempt in range(2):
+      try:
+        os.close(os.open(self.__mPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        self.__mHeld = True
+        return True
+      except OSError as error:
+        if error.errno != errno.EEXIST or not self.__removeIfStale():
+          return False
+    return False
+
+  def release(self):
+    if self.__mHeld:
+      self.__mHeld = False
+      try:
+        os.remove(self.__mPath)
+      except OSError:
+        pass
+
+  ## Private API ##
+
+  def __removeIfStale(self):
+    try:
+      if time.time() - os.path.getmtime(self.__mPath) < CacheLock.STALE_AFTER:
+        return False
+      os.remove(self.__mPath)
+    except OSError:
+      pass
+    return True
+
+class CommitDateCache:
+  """
+  An on-disk cache mapping commit shas to author (or committer) timestamps.
+  Since a commit's dates never change, entries never need to be invalidated;
+  instead, the cache is capped in size, and the least recently used entries are
+  evicted.
+
+  The cache is stored in '<git dir>/branchhealth/author-dates' (or
+  'commit-dates', for committer timestamps) and is shared by every ref in the
+  repository, so local and remote-tracking refs that point at
+  the same commit share an entry. Updates are written to a temporary file and
+  atomically renamed into place under a lock, and are merged with whatever
+  other processes have written in the meantime, so concurrent runs are safe.
+  """
+
+  # The name of the cache file for each kind of timestamp.
+  FILE_NAMES = {'author': 'author-dates', 'committer': 'commit-dates'}
+  HEADER = '# git-branchhealth commit date cache v1'
+
+  # The default maximum number of commits kept in the cache.
+  DEFAULT_MAX_ENTRIES = 100000
+
+  def __init__(self, aGitDir, aMaxEntries=DEFAULT_MAX_ENTRIES, aLog=None, aDateField='author'):
+    """
+    Create a new CommitDateCache instance. The cache file is not read until the
+    first lookup.
+
+    :param aGitDir: The path to the git directory of the repository.
+    :param aMaxEntries: The maximum number of commits to keep in the cache.
+    :param aLog: A logging object to write debugging information to.
+    :param aDateField: The kind of timestamp to cache: either 'author' or
+                       'committer'.
+    """
+    self.__mCacheDir = getCacheDir(aGitDir)
+    self.__mPath = os.path.join(self.__mCacheDir, CommitDateCache.FILE_NAMES[aDateField])
+    self.__mMaxEntries = aMaxEntries
+    self.__mLog = aLog
+    self.__mEntries = None
+    self.__mDirty = False
+
+  def get(self, aSha):
+    """
+    Retrieve the timestamp of a commit, if it is in the cache. The commit
+    becomes the most recently used entry.
+
+    :return: The timestamp, or None if the commit is not cached.
+    """
+    entries = self.__getEntries()
+    epoch = entries.pop(aSha, None)
+    if epoch is None:
+      return None
+
+    entries[aSha] = epoch
+
+    # Recency only needs to be persisted once entries may start to be evicted.
+    if len(entries) >= self.__mMaxEntries:
+      self.__mDirty = True
+    return epoch
+
+  def put(self, aSha, aEpoch):
+    """
+    Add the timestamp of a commit to the cache, as its most recently used
+    entry.
+    """
+    entries = self.__getEntries()
+    entries.pop(aSha, None)
+    entries[aSha] = aEpoch
+    self.__mDirty = True
+
+  def save(self):
+    """
+    Write any changes to this cache to disk. If another process is currently
+    writing the cache, or the git directory is not writable, the changes are
+    silently discarded.
+    """
+    if not self.__mDirty:
+      return
+
+    try:
+      if not os.path.isdir(self.__mCacheDir):
+        os.makedirs(self.__mCacheDir)
+    except OSError:
+      self.__debug("Unable to create cache directory: " + self.__mCacheDir)
+      return
+
+    lock = CacheLock(self.__mPath + '.lock')
+    if not lock.acquire():
+      self.__debug("Commit date cache is locked by another process; not saving")
+      return
+
+    try:
+      # Merge in anything written by other processes since we read the cache,
+      # treating our own entries as the most recently used.
+      merged = self.__readEntries()
+      for (sha, epoch) in self.__mEntries.items():
+        merged.pop(sha, None)
+        merged[sha] = epoch
+
+      while len(merged) > self.__mMaxEntries:
+        merged.popitem(last=False)
+
+      tempPath = self.__mPath + '.' + str(os.getpid()) + '.tmp'
+      with open(tempPath, 'w') as tempHandle:
+        tempHandle.write(CommitDateCache.HEADER + '\n')
+        for (sha, epoch) in merged.items():
+          tempHandle.write(sha + ' ' + str(epoch) + '\n')
+      replaceFile(tempPath, self.__mPath)
+
+      self.__mEntries = merged
+      self.__mDirty = False
+    except (IOError, OSError) as error:
+      self.__debug("Unable to save commit date cache: " + str(error))
+    finally:
+      lock.release()
+
+  ## Private API ##
+
+  def __getEntries(self):
+    if self.__mEntries is None:
+      self.__mEntries = self.__readEntries()
+    return self.__mEntries
+
+  def __readEntries(self):
+    """
+    Read the cache file, from least to most recently used entry.
+    """
+    entries = OrderedDict()
+    try:
+      with open(self.__mPath, 'r') as cacheHandle:
+        if cacheHandle.readline().rstrip('\n') != CommitDateCache.HEADER:
+          return entries
+
+        for line in cacheHandle:
+          parts = line.split()
+          if len(parts) == 2 and parts[1].isdigit():
+            entries[parts[0]] = int(parts[1])
+    except IOError:
+      pass
+    return entries
+
+  def __debug(self, aMessage):
+    if self.__mLog:
+      self.__mLog.debug(aMessage)
+
+class ReportCache:
+  """
+  An on-disk copy of the sorted branch table produced by the last run, along
+  with the fingerprint of the ref state it was computed from. If a later run
+  sees the same fingerprint, the table can be reused as is, without resolving
+  any refs. Only ref paths, tip shas and dates are stored; health depends on
+  the current time, and is always recomputed.
+
+  The report is stored in '<git dir>/branchhealth/report'.
+  """
+
+  FILE_NAME = 'report'
+  HEADER = '# git-branchhealth report cache v1'
+
+  def __init__(self, aGitDir, aLog=None):
+    """
+    Create a new ReportCache instance.
+
+    :param aGitDir: The path to the git directory of the repository.
+    :param aLog: A logging object to write debugging information to.
+    """
+    self.__mCacheDir = getCacheDir(aGitDir)
+    self.__mPath = os.path.join(self.__mCacheDir, ReportCache.FILE_NAME)
+    self.__mLog = aLog
+
+  def load(self, aFingerprint, aTable):
+    """
+    Retrieve the cached branch table, if it was computed from a given ref
+    state. Branches are appended to the table as they are read, so the report
+    is never held in memory as a whole.
+
+    :param aFingerprint: The fingerprint of the current ref state.
+    :param aTable: An empty :class:`table.BranchTable` to append the cached
+                   branches to, in the order they were saved.
+
+    :return: aTable, or None if there is no (valid) report for the given
+             fingerprint, in which case aTable should be discarded.
+    """
+    try:
+      with open(self.__mPath, 'rb') as reportHandle:
+        if reportHandle.readline().rstrip('\n') != ReportCache.HEADER:
+          return None
+        if reportHandle.readline().rstrip('\n') != aFingerprint:
+          return None
+
+        for line in reportHandle:
+          parts = line.rstrip('\n').split(' ', 2)
+          if len(parts) != 3 or not parts[0].isdigit() or len(parts[1]) != 40:
+            return None
+          (epoch, sha, path) = parts
+          aTable.append(path, sha, int(epoch))
+        return aTable
+    except (IOError, TypeError):
+      # TypeError is raised for a sha that isn't valid hex.
+      return None
+
+  def save(self, aFingerprint, aTable):
+    """
+    Save a branch table, replacing any previously saved one. Failures to write
+    are ignored.
+
+    :param aFingerprint: The fingerprint of the ref state the table was
+                         computed from.
+    :param aTable: The :class:`table.BranchTable` to save.
+    """
+    tempPath = self.__mPath + '.' + str(os.getpid()) + '.tmp'
+    try:
+      if not os.path.isdir(self.__mCacheDir):
+        os.makedirs(self.__mCacheDir)
+
+      # Rows are written as UTF-8 bytes, so that ref paths that aren't ASCII
+      # are saved exactly as they are read back.
+      with open(tempPath, 'wb') as tempHandle:
+        tempHandle.write(ReportCache.HEADER + '\n')
+        tempHandle.write(aFingerprint + '\n')
+        for index in range(len(aTable)):
+          path = encodeText(aTable.getPath(index))
+          tempHandle.write(str(aTable.getLastActivityEpoch(index)) + b' ' + aTable.getSha(index) + b' ' + path + b'\n')
+      replaceFile(tempPath, self.__mPath)
+    except (IOError, OSError) as error:
+      if self.__mLog:
+        self.__mLog.debug("Unable to save report cache: " + str(error))
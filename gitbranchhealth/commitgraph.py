@@ -0,0 +1,320 @@
+# commitgraph.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for reading git's commit-graph files, which store the commit date,
+# parents and generation number of every commit they cover, so that they can
+# be retrieved without inflating any objects.
+
+import binascii
+import mmap
+import os
+import os.path
+import struct
+
+from refs import findCommonDir
+
+class CommitGraph:
+  """
+  Object used to look up commits in a repository's commit-graph. Both a single
+  'objects/info/commit-graph' file and a split graph (a chain of layers listed
+  in 'objects/info/commit-graphs/commit-graph-chain') are supported. Every
+  layer is memory-mapped, and commits are located by binary searching the
+  sorted OID table of each layer, narrowed by its fanout table.
+
+  Commits are identified by their position within the whole graph (the base
+  layer first), which is how the graph itself refers to parents.
+  """
+
+  SIGNATURE = b'CGPH'
+
+  # Chunk identifiers.
+  CHUNK_OID_FANOUT = b'OIDF'
+  CHUNK_OID_LOOKUP = b'OIDL'
+  CHUNK_COMMIT_DATA = b'CDAT'
+  CHUNK_EXTRA_EDGES = b'EDGE'
+
+  # Size of each record in the commit data chunk: a tree sha, two parent
+  # positions, and the generation number and commit date packed in 8 bytes.
+  COMMIT_DATA_SIZE = 36
+
+  # Parent position meaning 'no parent'.
+  PARENT_NONE = 0x70000000
+
+  # Flag set on the second parent position of an octopus merge, whose lower bits
+  # are then an index into the extra edges chunk, and on the last entry of each
+  # list in that chunk.
+  EDGE_FLAG = 0x80000000
+
+  def __init__(self, aGitDir):
+    """
+    Create a new CommitGraph instance. If the repository has no (readable)
+    commit-graph, the resulting object is empty, and all lookups fail.
+
+    :param aGitDir: The path to the git directory (e.g. '<repo>/.git') of the
+                    repository whose commit-graph should be read.
+    """
+    self.__mLayers = []
+    infoDir = os.path.join(findCommonDir(aGitDir), 'objects', 'info')
+
+    for graphPath in self.__findGraphFiles(infoDir):
+      layer = CommitGraphLayer.open(graphPath)
+      if layer is None:
+        # A broken layer invalidates every layer built on top of it.
+        break
+      self.__mLayers.append(layer)
+
+    self.__mLayerStarts = []
+    start = 0
+    for layer in self.__mLayers:
+      self.__mLayerStarts.append(start)
+      start += layer.getCount()
+
+  def isAvailable(self):
+    """
+    Determine whether this repository has a commit-graph that can be used.
+    """
+    return len(self.__mLayers) > 0
+
+  def findCommit(self, aSha):
+    """
+    Find the position of a commit within the commit-graph.
+
+    :param aSha: The hex sha of the commit.
+
+    :return: The position of the commit within the graph, or None if the
+             commit is not covered by the graph.
+    """
+    binSha = binascii.unhexlify(aSha)
+    for (layer, start) in zip(self.__mLayers, self.__mLayerStarts):
+      index = layer.findIndex(binSha)
+      if index is not None:
+        return start + index
+    return None
+
+  def getCommitTime(self, aSha):
+    """
+    Retrieve the committer timestamp of a given commit from the graph.
+
+    :param aSha: The hex sha of the commit.
+
+    :return: The committer timestamp, in seconds since the epoch (UTC), or None
+             if the commit is not covered by the graph.
+    """
+    position = self.findCommit(aSha)
+    if position is None:
+      return None
+
+    (layer, index) = self.__locate(position)
+    return layer.getCommitTime(index)
+
+  def getSha(self, aPosition):
+    """
+    Retrieve the hex sha of the commit at a given position of the graph.
+    """
+    (layer, index) = self.__locate(aPosition)
+    return binascii.hexlify(layer.getBinSha(index))
+
+  def getGeneration(self, aPosition):
+    """
+    Retrieve the generation number (topological level) of the commit at a given
+    position of the graph. A commit's generation number is always greater than
+    those of its parents, so a commit can never reach a commit with a greater
+    or equal generation number (other than itself).
+
+    :return: The generation number, or 0 if the graph was written without
+             generation numbers.
+    """
+    (layer, index) = self.__locate(aPosition)
+    return layer.getGeneration(index)
+
+  def getParents(self, aPosition):
+    """
+    Retrieve the positions of the parents of the commit at a given position of
+    the graph. Parents are always covered by the graph.
+    """
+    (layer, index) = self.__locate(aPosition)
+    return layer.getParents(index)
+
+  def close(self):
+    """
+    Release all commit-graph files that were opened by this CommitGraph.
+    """
+    for layer in self.__mLayers:
+      layer.close()
+    self.__mLayers = []
+    self.__mLayerStarts = []
+
+  ## Private API ##
+
+  def __findGraphFiles(self, aInfoDir):
+    """
+    Retrieve the paths of all commit-graph layers, base layer first. A split
+    commit-graph chain takes precedence over a single commit-graph file, as it
+    does within git itself.
+    """
+    graphsDir = os.path.join(aInfoDir, 'commit-graphs')
+    chainPath = os.path.join(graphsDir, 'commit-graph-chain')
+    if os.path.isfile(chainPath):
+      with open(chainPath, 'r') as chainHandle:
+        hashes = [line.strip() for line in chainHandle if line.strip()]
+      return [os.path.join(graphsDir, 'graph-' + graphHash + '.graph') for graphHash in hashes]
+
+    singlePath = os.path.join(aInfoDir, 'commit-graph')
+    if os.path.isfile(singlePath):
+      return [singlePath]
+    return []
+
+  def __locate(self, aPosition):
+    """
+    Convert a position within the whole graph to a (layer, index) tuple.
+    """
+    for layerIndex in range(len(self.__mLayers) - 1, -1, -1):
+      start = self.__mLayerStarts[layerIndex]
+      if aPosition >= start:
+        return (self.__mLayers[layerIndex], aPosition - start)
+    raise IndexError('Invalid commit-graph position: ' + str(aPosition))
+
+class CommitGraphLayer:
+  """
+  A single, memory-mapped commit-graph file.
+  """
+
+  @staticmethod
+  def open(aPath):
+    """
+    Open a commit-graph file.
+
+    :return: A CommitGraphLayer, or None if the file does not exist, is not a
+             SHA-1 commit-graph, or is missing a required chunk.
+    """
+    try:
+      handle = open(aPath, 'rb')
+    except IOError:
+      return None
+
+    try:
+      data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+      handle.close()
+      return None
+
+    # Header: signature, version, hash version (1 = SHA-1), chunk count and
+    # base graph count.
+    if len(data) < 8 or data[0:4] != CommitGraph.SIGNATURE or bytearray(data[5:6])[0] != 1:
+      data.close()
+      handle.close()
+      return None
+
+    chunkCount = bytearray(data[6:7])[0]
+    chunks = {}
+    for chunkIndex in range(chunkCount):
+      entryStart = 8 + 12 * chunkIndex
+      chunkId = data[entryStart:entryStart + 4]
+      chunkOffset = struct.unpack('>Q', data[entryStart + 4:entryStart + 12])[0]
+      chunks[chunkId] = chunkOffset
+
+    required = [CommitGraph.CHUNK_OID_FANOUT, CommitGraph.CHUNK_OID_LOOKUP, CommitGraph.CHUNK_COMMIT_DATA]
+    if not all(chunkId in chunks for chunkId in required):
+      data.close()
+      handle.close()
+      return None
+
+    return CommitGraphLayer(handle, data, chunks)
+
+  def __init__(self, aHandle, aData, aChunks):
+    self.__mHandle = aHandle
+    self.__mData = aData
+    self.__mChunks = aChunks
+    self.__mFanout = aChunks[CommitGraph.CHUNK_OID_FANOUT]
+    self.__mLookup = aChunks[CommitGraph.CHUNK_OID_LOOKUP]
+    self.__mCommitData = aChunks[CommitGraph.CHUNK_COMMIT_DATA]
+    self.__mExtraEdges = aChunks.get(CommitGraph.CHUNK_EXTRA_EDGES)
+    self.__mCount = self.__fanout(255)
+
+  def getCount(self):
+    return self.__mCount
+
+  def findIndex(self, aBinSha):
+    """
+    Binary search the OID table of this layer for a commit.
+
+    :param aBinSha: The 20-byte binary sha of the commit.
+
+    :return: The index of the commit within this layer, or None.
+    """
+    firstByte = bytearray(aBinSha[0:1])[0]
+    low = 0
+    if firstByte > 0:
+      low = self.__fanout(firstByte - 1)
+    high = self.__fanout(firstByte)
+
+    while low < high:
+      middle = (low + high) // 2
+      start = self.__mLookup + 20 * middle
+      middleSha = self.__mData[start:start + 20]
+      if middleSha < aBinSha:
+        low = middle + 1
+      elif middleSha > aBinSha:
+        high = middle
+      else:
+        return middle
+    return None
+
+  def getCommitTime(self, aIndex):
+    """
+    Retrieve the commit date of the commit at a given index of this layer. The
+    date is stored in the lower 34 bits of the last 8 bytes of its record.
+    """
+    start = self.__mCommitData + CommitGraph.COMMIT_DATA_SIZE * aIndex + 28
+    (high, low) = struct.unpack('>II', self.__mData[start:start + 8])
+    return ((high & 0x3) << 32) | low
+
+  def getBinSha(self, aIndex):
+    start = self.__mLookup + 20 * aIndex
+    return self.__mData[start:start + 20]
+
+  def getGeneration(self, aIndex):
+    """
+    Retrieve the generation number of the commit at a given index of this layer,
+    which is stored in the upper 30 bits of the last 8 bytes of its record.
+    """
+    start = self.__mCommitData + CommitGraph.COMMIT_DATA_SIZE * aIndex + 28
+    return struct.unpack('>I', self.__mData[start:start + 4])[0] >> 2
+
+  def getParents(self, aIndex):
+    """
+    Retrieve the graph positions of the parents of the commit at a given index
+    of this layer. The first two parents are stored in its record; the parents
+    of octopus merges continue in the extra edges chunk.
+    """
+    start = self.__mCommitData + CommitGraph.COMMIT_DATA_SIZE * aIndex + 20
+    (first, second) = struct.unpack('>II', self.__mData[start:start + 8])
+    if first == CommitGraph.PARENT_NONE:
+      return []
+    if second == CommitGraph.PARENT_NONE:
+      return [first]
+    if not second & CommitGraph.EDGE_FLAG:
+      return [first, second]
+
+    parents = [first]
+    if self.__mExtraEdges is None:
+      return parents
+
+    edgeStart = self.__mExtraEdges + 4 * (second & ~CommitGraph.EDGE_FLAG)
+    while True:
+      edge = struct.unpack('>I', self.__mData[edgeStart:edgeStart + 4])[0]
+      parents.append(edge & ~CommitGraph.EDGE_FLAG)
+      if edge & CommitGraph.EDGE_FLAG:
+        return parents
+      edgeStart += 4
+
+  def close(self):
+    self.__mData.close()
+    self.__mHandle.close()
+
+  ## Private API ##
+
+  def __fanout(self, aIndex):
+    start = self.__mFanout + 4 * aIndex
+    return struct.unpack('>I', self.__mData[start:start + 4])[0]
@@ -1,12 +1,11 @@
-import git.config
-from git import Repo
 import ConfigParser
 import os.path
 import sys
-from nicelog.formatters import ColorLineFormatter
 import logging
 
-from util import parseIgnoredBranchListFromString
+from util import encodeText, parseIgnoredBranchListFromString
+from health import HealthClassifier, parseThresholdsFromString
+from ignore import IgnoreMatcher
 
 
 class BranchHealthConfig:
@@ -14,11 +13,28 @@ class BranchHealthConfig:
   Composition of all possible options for a given run of git branchhealth.
   """
 
-  def __init__(self, aRepoPath, aRemoteName='', aNumDays=14, aBadOnly=False, aNoColor=False, aDeleteOldBranches=False, aTrunkBranch='master', aIgnoredBranches=['master', 'HEAD'], aLogLevel=logging.ERROR):
+  # Backends that can be used to read refs and commits.
+  BACKENDS = ['git', 'native']
+
+  # Sources of the date of last activity on a branch: the author date of its
+  # tip commit, the committer date of its tip commit, the date it was last
+  # updated according to its reflog, or the later of the reflog and the author
+  # date.
+  ACTIVITY_SOURCES = ['author', 'committer', 'reflog', 'max']
+
+  # Maximum number of commits to walk when comparing branches with the trunk
+  # branch, if not configured.
+  MAX_WALK = 100000
+
+  def __init__(self, aRepoPath, aRemoteName='', aNumDays=14, aBadOnly=False, aNoColor=False, aDeleteOldBranches=False, aTrunkBranch='master', aIgnoredBranches=['master', 'HEAD'], aLogLevel=logging.ERROR, aBackend=None, aNoCache=False, aUnsorted=False, aLimit=None, aNewest=False, aJobs=None, aArchiveOldBranches=False, aRestoreArchive=None, aRefPatterns=None, aShowSharedTips=False, aMergedOnly=False, aShowMerged=False, aShowDivergence=False, aMaxWalk=None, aByAuthor=False, aActivitySource=None):
     """
     Initialize a new BranchHealthConfig object with parameters that were given
     from the command line.
     """
+    # GitPython is slow to import, so it's only imported once a configuration
+    # is actually created (e.g. not when just printing --help).
+    from git import Repo
+
     self.mRepoPath = aRepoPath
     self.mRemoteName = aRemoteName
     self.mNumDays = aNumDays
@@ -27,6 +43,25 @@ class BranchHealthConfig:
     self.mTrunkBranch = aTrunkBranch
     self.mRepo = Repo(self.mRepoPath)
     self.mDeleteOldBranches = aDeleteOldBranches
+    self.mBackend = aBackend
+    self.mNoCache = aNoCache
+    self.mUnsorted = aUnsorted
+    self.mLimit = aLimit
+    self.mNewest = aNewest
+    self.mJobs = aJobs
+    self.mArchiveOldBranches = aArchiveOldBranches
+    self.mRestoreArchive = aRestoreArchive
+    self.mRefPatterns = list(aRefPatterns or [])
+    self.mShowSharedTips = aShowSharedTips
+    self.mMergedOnly = aMergedOnly
+    self.mShowMerged = aShowMerged
+    self.mShowDivergence = aShowDivergence
+    self.mMaxWalk = aMaxWalk
+    self.mByAuthor = aByAuthor
+    self.mActivitySource = aActivitySource
+    self.mThresholds = None
+    self.__mHealthClassifier = None
+    self.__mIgnoreMatcher = None
 
     self.__setupLogging(aLogLevel)
 
@@ -42,12 +77,88 @@ class BranchHealthConfig:
   def shouldDeleteOldBranches(self):
     return self.mDeleteOldBranches
 
+  def shouldArchiveOldBranches(self):
+    """
+    Determine whether old branches should be moved to the 'refs/archive'
+    namespace, rather than deleted.
+    """
+    return self.mArchiveOldBranches
+
+  def getArchiveToRestore(self):
+    """
+    Retrieve the archive (a date, or an archived branch below 'refs/archive')
+    whose branches should be restored, or None if nothing should be restored.
+    """
+    return self.mRestoreArchive
+
+  def getRefPatterns(self):
+    """
+    Retrieve the ref patterns (e.g. 'feature/*', or 'refs/heads/feature/*')
+    that limit which refs are enumerated, or an empty list to enumerate every
+    ref in the scanned namespaces.
+    """
+    return self.mRefPatterns
+
+  def shouldShowSharedTips(self):
+    """
+    Determine whether each branch should be reported along with the other
+    branches that point to the same commit.
+    """
+    return self.mShowSharedTips
+
+  def shouldRemoveMergedOnly(self):
+    """
+    Determine whether only old branches that have been merged into the trunk
+    branch should be deleted (or archived).
+    """
+    return self.mMergedOnly
+
+  def shouldShowMerged(self):
+    """
+    Determine whether each branch should be reported as merged into the trunk
+    branch, or not.
+    """
+    return self.mShowMerged
+
+  def shouldShowDivergence(self):
+    """
+    Determine whether the number of commits each branch is ahead of and behind
+    the trunk branch should be reported.
+    """
+    return self.mShowDivergence
+
+  def getMaxWalk(self):
+    """
+    Retrieve the maximum number of commits to walk when comparing branches with
+    the trunk branch, so that huge histories can't take arbitrarily long.
+    """
+    if self.mMaxWalk is None:
+      return BranchHealthConfig.MAX_WALK
+    return self.mMaxWalk
+
+  def shouldReportByAuthor(self):
+    """
+    Determine whether branches should be summarized by the author of their tip
+    commits, rather than listed individually.
+    """
+    return self.mByAuthor
+
   def getTrunkBranchName(self):
     return self.mTrunkBranch
 
   def getIgnoredBranches(self):
     return self.__mIgnoredBranches
 
+  def getIgnoreMatcher(self):
+    """
+    Retrieve the :class:`ignore.IgnoreMatcher` for the ignored branches (from
+    both the command line and the configuration file), which is compiled on
+    first use.
+    """
+    if not self.__mIgnoreMatcher:
+      self.__mIgnoreMatcher = IgnoreMatcher(self.getIgnoredBranches())
+    return self.__mIgnoreMatcher
+
   def getRepo(self):
     return self.mRepo
 
@@ -60,15 +171,99 @@ class BranchHealthConfig:
   def getHealthyDays(self):
     return int(self.mNumDays)
 
+  def getHealthThresholds(self):
+    """
+    Retrieve the thresholds, in days, that separate the tiers of branch health.
+    By default, these are the number of healthy days, and twice that.
+    """
+    if self.mThresholds:
+      return list(self.mThresholds)
+    return [self.getHealthyDays(), self.getHealthyDays() * 2]
+
+  def getHealthClassifier(self):
+    """
+    Retrieve the :class:`health.HealthClassifier` used to classify all branches
+    in this run. It is created on first use, and the current date is captured
+    at that point, so that every branch is classified against the same date.
+    """
+    if not self.__mHealthClassifier:
+      self.__mHealthClassifier = HealthClassifier(self.getHealthThresholds())
+    return self.__mHealthClassifier
+
   def getBadOnly(self):
     return self.mBadOnly
 
+  def shouldSortByDate(self):
+    return not self.mUnsorted
+
+  def getLimit(self):
+    """
+    Retrieve the maximum number of branches to show, or None to show all of
+    them.
+    """
+    return self.mLimit
+
+  def shouldShowNewest(self):
+    """
+    Determine whether, when the number of branches shown is limited, the newest
+    branches should be shown rather than the oldest.
+    """
+    return self.mNewest
+
+  def getJobs(self):
+    """
+    Retrieve the number of operations (e.g. pushes to remotes) to run in
+    parallel, or None to use a default.
+    """
+    return self.mJobs
+
   def shouldUseColor(self):
     return not self.mNoColor
 
   def getLog(self):
     return self.__mLog
 
+  def getBackend(self):
+    """
+    Retrieve the name of the backend used to read refs and commits: either
+    'git', which runs git commands, or 'native', which reads the repository's
+    on-disk storage directly without spawning any subprocesses.
+    """
+    return self.mBackend
+
+  def getActivitySource(self):
+    """
+    Retrieve the source of the date of last activity on each branch: 'author'
+    for the author date of its tip commit, 'committer' for the committer date
+    of its tip commit (which changes when it is rebased or cherry-picked),
+    'reflog' for the date it was last updated according to its reflog (e.g.
+    when it was last rebased or fetched), falling back to the author date of
+    its tip commit if it has no reflog, or 'max' for the later of the reflog
+    and the author date.
+    """
+    return self.mActivitySource
+
+  def getCommitDateField(self):
+    """
+    Retrieve the field of the tip commit whose date is used as the date of last
+    activity (or as the fallback for the reflog): 'committer' if the activity
+    source is 'committer', and 'author' otherwise.
+    """
+    if self.getActivitySource() == 'committer':
+      return 'committer'
+    return 'author'
+
+  def shouldUseCache(self):
+    """
+    Determine whether data that does not change between runs (such as commit
+    dates) should be cached on disk, in the 'branchhealth' directory inside
+    the git directory.
+    """
+    return not self.mNoCache
+
+  def getGitDir(self):
+    return self.getRepo().git_dir
+
   ## Private API ##
 
   def __setupTrunkName(self):
@@ -77,7 +272,7 @@ class BranchHealthConfig:
       specifiedTrunkBranchOnCommandLine = True
 
     try:
-      trunkName = self.mParser.get_value(option='trunk')
+      trunkName = encodeText(self.mParser.get_value(option='trunk'))
       self.getLog().debug("Trunk branch name from config is: " + str(trunkName))
     except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
       # Do nothing, since we've already setup the trunk branch in the default
@@ -91,21 +286,31 @@ class BranchHealthConfig:
 
   def __setupLogging(self, aLogLevel=logging.ERROR):
     log = logging.getLogger("git-branchhealth")
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setFormatter(ColorLineFormatter())
+
+    # Reuse the handler installed by a previous configuration, so that running
+    # many configurations in one process doesn't print each message many times.
+    if log.handlers:
+      handler = log.handlers[0]
+    else:
+      from nicelog.formatters import ColorLineFormatter
+
+      handler = logging.StreamHandler(sys.stderr)
+      handler.setFormatter(ColorLineFormatter())
+      log.addHandler(handler)
+
     log.setLevel(aLogLevel)
     handler.setLevel(aLogLevel)
 
-    log.addHandler(handler)
-
     self.__mLog = log
 
   def __setupParser(self):
+    import git.config
+
     self.mParser = git.config.SectionConstraint(self.getRepo().config_reader(), 'branchhealth')
 
   def __setupIgnoreBranches(self):
     try:
-      ignoredBranchString = self.mParser.get_value(option='ignoredbranches')
+      ignoredBranchString = encodeText(self.mParser.get_value(option='ignoredbranches'))
       self.getLog().debug("Ignored branch string is: " + str(ignoredBranchString))
     except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
       # Do nothing, since we just want to continue merrily.
@@ -146,9 +351,74 @@ class BranchHealthConfig:
 
     self.mNoColor = not color or self.mNoColor
 
+  def __setupCache(self):
+    try:
+      noCache = self.mParser.get_value(option='nocache')
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+      noCache = False
+
+    self.mNoCache = noCache or self.mNoCache
+
+  def __setupBackend(self):
+    if self.mBackend:
+      # The command line takes precedence over the configuration file.
+      return
+
+    try:
+      backend = self.mParser.get_value(option='backend')
+      self.getLog().debug("Backend from config is: " + str(backend))
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+      backend = 'git'
+
+    if backend not in BranchHealthConfig.BACKENDS:
+      self.getLog().warn('Unknown backend "' + str(backend) + '" in configuration file. Using "git".')
+      backend = 'git'
+    self.mBackend = backend
+
+  def __setupActivitySource(self):
+    if self.mActivitySource:
+      # The command line takes precedence over the configuration file.
+      return
+
+    try:
+      activitySource = self.mParser.get_value(option='activity')
+      self.getLog().debug("Activity source from config is: " + str(activitySource))
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+      activitySource = 'author'
+
+    if activitySource not in BranchHealthConfig.ACTIVITY_SOURCES:
+      self.getLog().warn('Unknown activity source "' + str(activitySource) + '" in configuration file. Using "author".')
+      activitySource = 'author'
+    self.mActivitySource = activitySource
+
+  def __setupThresholds(self):
+    try:
+      thresholdString = str(self.mParser.get_value(option='thresholds'))
+      self.getLog().debug("Health thresholds from config are: " + thresholdString)
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+      return
+
+    if self.getHealthyDays() != 14:
+      self.getLog().warn('You specified a number of days on the command line ("' + str(self.getHealthyDays()) + '"), and health thresholds in the configuration file ("' + thresholdString + '"). Using the command line version.')
+      return
+
+    try:
+      thresholds = parseThresholdsFromString(thresholdString)
+    except ValueError:
+      thresholds = []
+
+    if not thresholds:
+      self.getLog().warn('Invalid health thresholds "' + thresholdString + '" in configuration file. Using the number of days instead.')
+      return
+    self.mThresholds = thresholds
+
   def __setupConfigOptions(self):
     self.__setupParser()
     log = self.getLog()
     self.__setupColor()
     self.__setupIgnoreBranches()
     self.__setupTrunkName()
+    self.__setupBackend()
+    self.__setupActivitySource()
+    self.__setupCache()
+    self.__setupThresholds()
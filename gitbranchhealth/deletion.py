@@ -0,0 +1,296 @@
+# deletion.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for deleting many branches at once within git-branchhealth.
+
+import threading
+
+try:
+  from Queue import Queue, Empty
+except ImportError:
+  from queue import Queue, Empty
+
+from refs import RefReader, findCheckedOutBranches
+from transaction import RefTransaction, RefUpdateResult
+from util import encodeText
+
+def splitRemoteBranchPath(aPath, aRemoteNames):
+  """
+  Split the path of a remote-tracking branch into the name of its remote and
+  the name of the branch on that remote (e.g. 'refs/remotes/origin/feature/x'
+  into ('origin', 'feature/x')). Remote names may contain slashes, so the
+  longest matching remote name is used.
+
+  :param aPath: The full path of the remote-tracking branch.
+  :param aRemoteNames: The names of the repository's remotes.
+
+  :return: A (remote name, branch name) tuple, or (None, None) if the path isn't
+           below any of the remotes.
+  """
+  for remoteName in sorted(aRemoteNames, key=len, reverse=True):
+    prefix = 'refs/remotes/' + remoteName + '/'
+    if aPath.startswith(prefix):
+      return (remoteName, aPath[len(prefix):])
+  return (None, None)
+
+class LocalBranchDeleter:
+  """
+  Object used to delete many local branches in a single atomic ref transaction
+  (see :class:`transaction.RefTransaction`), rather than running 'git branch'
+  once per branch.
+
+  Each branch is only deleted if it still points to the commit it pointed to
+  when it was scanned, so a branch that has moved since then is never lost.
+  As with 'git branch -d', branches that are checked out, or that have not
+  been merged into HEAD, are left alone.
+  """
+
+  def __init__(self, aConfig):
+    """
+    Create a new LocalBranchDeleter instance.
+
+    :param aConfig: The :class:`config.BranchHealthConfig` object for this run.
+    """
+    self.__mConfig = aConfig
+
+  def deleteBranches(self, aBranches):
+    """
+    Delete a set of local branches.
+
+    :param aBranches: A list of (path, expected sha) tuples, where path is the
+                      full path of the branch (e.g. 'refs/heads/foo'), and
+                      expected sha is the sha the branch must still point to
+                      for it to be deleted, or None to delete it wherever it
+                      points.
+
+    :return: A list containing one :class:`transaction.RefUpdateResult` per
+             branch, in the order of aBranches.
+    """
+    log = self.__mConfig.getLog()
+    gitDir = self.__mConfig.getGitDir()
+
+    currentShas = dict(RefReader(gitDir).readRefs(['refs/heads']))
+    checkedOut = findCheckedOutBranches(gitDir)
+    merged = self.__findMergedBranches()
+
+    results = {}
+    pending = []
+    for (path, expectedSha) in aBranches:
+      if path in results:
+        continue
+
+      currentSha = currentShas.get(path)
+      if not path.startswith('refs/heads/'):
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, 'not a local branch')
+      elif path.split('/')[-1] == 'master':
+        results[path] = RefUpdateResult(path, RefUpdateResult.PROTECTED, 'cowardly refusing to delete master branch')
+      elif path in checkedOut:
+        results[path] = RefUpdateResult(path, RefUpdateResult.PROTECTED, 'branch is checked out')
+      elif currentSha is None:
+        results[path] = RefUpdateResult(path, RefUpdateResult.MISSING)
+      elif expectedSha and currentSha != expectedSha:
+        results[path] = RefUpdateResult(path, RefUpdateResult.MOVED, 'expected ' + expectedSha + ', found ' + currentSha)
+      elif path not in merged:
+        results[path] = RefUpdateResult(path, RefUpdateResult.UNMERGED, 'branch is not merged into HEAD')
+      else:
+        pending.append((path, currentSha))
+        results[path] = None
+
+    # Delete all of the branches in one transaction.
+    errors = RefTransaction(self.__mConfig).commit([(path, ['delete ' + path + ' ' + sha]) for (path, sha) in pending])
+    for (path, sha) in pending:
+      if errors[path]:
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, errors[path])
+      else:
+        results[path] = RefUpdateResult(path, RefUpdateResult.DELETED)
+
+    deletedPaths = [path for (path, sha) in pending if results[path].isSuccessful()]
+    self.__removeBranchConfig(deletedPaths)
+    log.debug("Deleted " + str(len(deletedPaths)) + " of " + str(len(results)) + " local branches")
+
+    return [results[path] for (path, expectedSha) in aBranches]
+
+  ## Private API ##
+
+  def __findMergedBranches(self):
+    """
+    Retrieve the paths of the local branches that have been merged into HEAD.
+    """
+    from git.exc import GitCommandError
+
+    try:
+      output = self.__mConfig.getRepo().git.for_each_ref('--merged', 'HEAD', '--format=%(refname)', 'refs/heads')
+    except GitCommandError:
+      # HEAD doesn't point to a commit (e.g. in an empty repository).
+      return set()
+    return set(encodeText(output).splitlines())
+
+  def __removeBranchConfig(self, aBranchPaths):
+    """
+    Remove the configuration (e.g. the upstream) of deleted branches, as
+    'git branch -d' does, writing the configuration file only once.
+    """
+    if not aBranchPaths:
+      return
+
+    writer = self.__mConfig.getRepo().config_writer()
+    try:
+      for path in aBranchPaths:
+        section = 'branch "' + path[len('refs/heads/'):] + '"'
+        if writer.has_section(section):
+          writer.remove_section(section)
+    finally:
+      writer.release()
+
+class RemoteBranchDeleter:
+  """
+  Object used to delete many branches from remote repositories. The branches
+  of each remote are deleted with a single 'git push' (or a few, for very many
+  branches), rather than one per branch, and several remotes are pushed to in
+  parallel.
+
+  Each branch is only deleted from its remote if it still points to the commit
+  its remote-tracking branch pointed to when it was scanned (i.e. the push uses
+  --force-with-lease), so a branch that someone has pushed to since the last
+  fetch is never lost.
+  """
+
+  # Maximum number of branches to delete with one push.
+  CHUNK_SIZE = 256
+
+  # Maximum number of remotes to push to at once, if not configured.
+  MAX_JOBS = 8
+
+  def __init__(self, aConfig, aJobs=None, aChunkSize=CHUNK_SIZE):
+    """
+    Create a new RemoteBranchDeleter instance.
+
+    :param aConfig: The :class:`config.BranchHealthConfig` object for this run.
+    :param aJobs: The number of remotes to push to at once. Defaults to all of
+                  them, up to MAX_JOBS.
+    :param aChunkSize: The maximum number of branches to delete with one push.
+    """
+    self.__mConfig = aConfig
+    self.__mJobs = aJobs
+    self.__mChunkSize = max(1, aChunkSize)
+
+  def deleteBranches(self, aBranches):
+    """
+    Delete a set of branches from their remotes.
+
+    :param aBranches: A list of (path, expected sha) tuples, where path is the
+                      full path of the remote-tracking branch (e.g.
+                      'refs/remotes/origin/foo'), and expected sha is the sha
+                      the branch must still point to on the remote for it to be
+                      deleted, or None to delete it wherever it points.
+
+    :return: A list containing one :class:`transaction.RefUpdateResult` per
+             branch (with the path of the remote-tracking branch), in the
+             order of aBranches.
+    """
+    remoteNames = [encodeText(x.name) for x in self.__mConfig.getRepo().remotes]
+
+    results = {}
+    branchesByRemote = {}
+    for (path, expectedSha) in aBranches:
+      if path in results:
+        continue
+
+      (remoteName, branchName) = splitRemoteBranchPath(path, remoteNames)
+      if not remoteName:
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, 'not a branch of a known remote')
+      elif path.split('/')[-1] == 'master':
+        results[path] = RefUpdateResult(path, RefUpdateResult.PROTECTED, 'cowardly refusing to delete master branch')
+      else:
+        branchesByRemote.setdefault(remoteName, []).append((path, expectedSha))
+        results[path] = None
+
+    tasks = Queue()
+    for remoteName in sorted(branchesByRemote.keys()):
+      branches = branchesByRemote[remoteName]
+      for start in range(0, len(branches), self.__mChunkSize):
+        tasks.put((remoteName, branches[start:start + self.__mChunkSize]))
+
+    jobs = min(self.__mJobs or RemoteBranchDeleter.MAX_JOBS, tasks.qsize())
+    workers = []
+    collected = []
+    for workerIndex in range(jobs):
+      worker = threading.Thread(target=self.__work, args=(tasks, collected))
+      worker.daemon = True
+      worker.start()
+      workers.append(worker)
+    for worker in workers:
+      worker.join()
+
+    for result in collected:
+      results[result.getPath()] = result
+    return [results[path] for (path, expectedSha) in aBranches]
+
+  ## Private API ##
+
+  def __work(self, aTasks, aResults):
+    """
+    Push deletions to remotes until there are none left to push.
+    """
+    while True:
+      try:
+        (remoteName, branches) = aTasks.get_nowait()
+      except Empty:
+        return
+
+      # list.extend() is atomic, so the results of each push can be collected
+      # without a lock.
+      aResults.extend(self.__push(remoteName, branches))
+
+  def __push(self, aRemoteName, aBranches):
+    """
+    Delete branches from a remote with a single push.
+
+    :param aRemoteName: The name of the remote.
+    :param aBranches: A list of (remote-tracking path, expected sha) tuples.
+
+    :return: A list of RefUpdateResult objects.
+    """
+    trackingPrefix = 'refs/remotes/' + aRemoteName + '/'
+    remotePaths = {}
+    arguments = ['--porcelain']
+    refspecs = []
+    for (path, expectedSha) in aBranches:
+      remotePath = 'refs/heads/' + path[len(trackingPrefix):]
+      remotePaths[remotePath] = path
+      if expectedSha:
+        arguments.append('--force-with-lease=' + remotePath + ':' + expectedSha)
+      refspecs.append(':' + remotePath)
+
+    self.__mConfig.getLog().debug("Deleting " + str(len(refspecs)) + " branches from remote: " + aRemoteName)
+    (status, output, errorOutput) = self.__mConfig.getRepo().git.push(*(arguments + [aRemoteName] + refspecs),
+                                                                      with_extended_output=True, with_exceptions=False)
+    output = encodeText(output)
+    errorOutput = encodeText(errorOutput)
+
+    results = {}
+    for line in output.splitlines():
+      parts = line.split('\t')
+      if len(parts) != 3:
+        continue
+
+      (flag, refspec, summary) = parts
+      path = remotePaths.get(refspec.split(':')[-1])
+      if not path:
+        continue
+
+      if flag == '-':
+        results[path] = RefUpdateResult(path, RefUpdateResult.DELETED)
+      elif 'stale info' in summary:
+        results[path] = RefUpdateResult(path, RefUpdateResult.MOVED, 'branch has changed on ' + aRemoteName)
+      else:
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, summary)
+
+    # Branches that the push didn't report on (e.g. because the remote couldn't
+    # be reached at all) weren't deleted.
+    message = errorOutput.strip() or 'push to ' + aRemoteName + ' failed'
+    for (path, expectedSha) in aBranches:
+      if path not in results:
+        results[path] = RefUpdateResult(path, RefUpdateResult.FAILED, message)
+    return [results[path] for (path, expectedSha) in aBranches]
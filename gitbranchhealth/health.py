@@ -0,0 +1,105 @@
+# health.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for classifying the health of branches within git-branchhealth.
+
+import bisect
+from datetime import date
+
+from branch import Branch
+
+# Number of seconds in a day.
+SECONDS_PER_DAY = 86400
+
+def parseThresholdsFromString(aThresholdString):
+  """
+  Parse a comma-separated list of thresholds, in days (e.g. '14, 28').
+
+  :return: A sorted list of distinct, positive integer thresholds.
+
+  :raises ValueError: If any of the thresholds is not a positive integer.
+  """
+  thresholds = set()
+  for threshold in aThresholdString.split(','):
+    threshold = threshold.strip()
+    if not threshold:
+      continue
+    days = int(threshold)
+    if days <= 0:
+      raise ValueError('Thresholds must be positive: ' + threshold)
+    thresholds.add(days)
+  return sorted(thresholds)
+
+class HealthClassifier:
+  """
+  Object used to classify the health of branches from their dates of last
+  activity. The current date is captured once, when the classifier is created,
+  and each threshold is turned into an epoch cutoff up front, so that every
+  branch in a run is classified against the same 'now' (even if the run
+  crosses midnight), using a single bisect over integers.
+
+  A branch's tier is the number of thresholds its age exceeds, where age is
+  measured in whole calendar days, as it always has been. With thresholds
+  [healthy days, 2 * healthy days] (the default), tiers 0, 1 and 2 correspond
+  to Branch.HEALTHY, Branch.AGED and Branch.OLD. Any other number of
+  thresholds may be configured: the first tier is healthy, the last is old, and
+  all the tiers in between are aged.
+  """
+
+  def __init__(self, aThresholds, aToday=None):
+    """
+    Create a new HealthClassifier instance.
+
+    :param aThresholds: A non-empty list of thresholds, in days.
+    :param aToday: The date to classify branches against. Defaults to today.
+    """
+    self.__mThresholds = sorted(aThresholds)
+    if aToday is None:
+      aToday = date.today()
+
+    todayDays = aToday.toordinal() - date(1970, 1, 1).toordinal()
+
+    # A branch is past a threshold of T days if the day of its last activity is
+    # earlier than today - T, i.e. if its epoch is below the start of that day.
+    # Larger thresholds have smaller cutoffs, so the reversed list is sorted.
+    self.__mCutoffs = [(todayDays - days) * SECONDS_PER_DAY for days in reversed(self.__mThresholds)]
+
+  @staticmethod
+  def fromHealthyDays(aHealthyDays, aToday=None):
+    """
+    Create the default classifier: branches are aged after aHealthyDays days,
+    and old after twice that many days.
+    """
+    return HealthClassifier([aHealthyDays, aHealthyDays * 2], aToday)
+
+  def getThresholds(self):
+    return list(self.__mThresholds)
+
+  def getTierCount(self):
+    return len(self.__mThresholds) + 1
+
+  def getTier(self, aEpoch):
+    """
+    Retrieve the tier of a branch: the number of thresholds its age exceeds.
+
+    :param aEpoch: The date of last activity on the branch, in seconds since
+                   the epoch (UTC).
+    """
+    return len(self.__mCutoffs) - bisect.bisect_right(self.__mCutoffs, aEpoch)
+
+  def classify(self, aEpoch):
+    """
+    Retrieve the health of a branch.
+
+    :param aEpoch: The date of last activity on the branch, in seconds since
+                   the epoch (UTC).
+
+    :return: One of Branch.HEALTHY, Branch.AGED or Branch.OLD.
+    """
+    tier = self.getTier(aEpoch)
+    if tier == 0:
+      return Branch.HEALTHY
+    elif tier == len(self.__mCutoffs):
+      return Branch.OLD
+    return Branch.AGED
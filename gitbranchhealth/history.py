@@ -0,0 +1,284 @@
+# history.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for walking the commit history of a git repository within
+# git-branchhealth, without spawning any git subprocesses.
+
+import heapq
+import itertools
+
+from commitgraph import CommitGraph
+from objects import ObjectReader, parseIdentity
+
+class CommitHistory:
+  """
+  Object used to walk the history of a repository. Parents and generation
+  numbers are read from the commit-graph for the commits it covers; any other
+  commits (e.g. those created since the commit-graph was last written, or all
+  of them, if there is no commit-graph) are read from the object database.
+
+  Commits are visited in descending order of generation number, which lets a
+  walk stop as soon as none of the commits it is looking for can still be
+  reached. Commits that aren't covered by the commit-graph have no known
+  generation number, so they are treated as newer than every covered commit
+  (which they must be, as the commit-graph covers every ancestor of each
+  commit it contains), and are visited in descending order of commit date
+  among themselves, as git's own walks do. Either way, each commit is visited
+  after all of its children, as long as commit dates don't go backwards from
+  parent to child.
+  """
+
+  # Generation number of commits that aren't covered by the commit-graph.
+  GENERATION_INFINITY = 0xFFFFFFFF
+
+  def __init__(self, aGitDir):
+    """
+    Create a new CommitHistory instance.
+
+    :param aGitDir: The path to the git directory (e.g. '<repo>/.git') of the
+                    repository whose history should be walked.
+    """
+    self.__mGraph = CommitGraph(aGitDir)
+    self.__mObjectReader = ObjectReader(aGitDir)
+
+  def findReachable(self, aSourceSha, aTargetShas):
+    """
+    Determine which of a set of commits can be reached from a source commit
+    (i.e. are the source itself, or one of its ancestors), with a single walk
+    of the source's history. This is how every branch is checked for having
+    been merged into the trunk at once, rather than with one 'git merge-base'
+    per branch.
+
+    :param aSourceSha: The hex sha of the commit to walk from (e.g. the tip of
+                       the trunk).
+    :param aTargetShas: An iterable of the hex shas of the commits to look for
+                        (e.g. the tips of all branches).
+
+    :return: The set of the shas in aTargetShas that are reachable from
+             aSourceSha.
+    """
+    remaining = set(aTargetShas)
+    found = set()
+
+    # The walk can stop once it is below the lowest generation number of any
+    # commit that hasn't been found yet.
+    targetGenerations = [(self.__lookupGeneration(sha, None)[0], sha) for sha in remaining]
+    heapq.heapify(targetGenerations)
+
+    order = itertools.count()
+    queue = [self.__createEntry(aSourceSha, None, order)]
+    visited = set([aSourceSha])
+    while queue and remaining:
+      while targetGenerations[0][1] not in remaining:
+        heapq.heappop(targetGenerations)
+
+      (negativeGeneration, negativeEpoch, index, sha, position, parents) = heapq.heappop(queue)
+      if -negativeGeneration < targetGenerations[0][0]:
+        break
+
+      if sha in remaining:
+        remaining.discard(sha)
+        found.add(sha)
+
+      for (parentSha, parentPosition) in self.__readParents(sha, position, parents):
+        if parentSha in visited:
+          continue
+        visited.add(parentSha)
+        heapq.heappush(queue, self.__createEntry(parentSha, parentPosition, order))
+    return found
+
+  def countDivergence(self, aBaseSha, aTipShas, aMaxCommits=None):
+    """
+    Count how many commits each of a set of commits is ahead of and behind a
+    base commit (as 'git rev-list --left-right --count' would), with a single
+    walk from all of them at once.
+
+    Each commit walked carries a bitset (an integer) of the commits it can be
+    reached from: bit 0 for the base, and one bit for each distinct tip. Bits
+    are propagated from each commit to its parents, and the walk stops once
+    every commit left to walk can be reached from all of them, as none of their
+    ancestors can count towards any tip.
+
+    :param aBaseSha: The hex sha of the commit to compare with (e.g. the tip of
+                     the trunk).
+    :param aTipShas: An iterable of the hex shas of the commits to compare (e.g.
+                     the tips of all branches).
+    :param aMaxCommits: The maximum number of commits to walk, or None to walk
+                        as many as needed. If the walk is cut short, the counts
+                        of the affected tips are lower bounds, since commits
+                        are walked after all of their children (see
+                        :class:`CommitHistory`), so the counted commits have
+                        already been reached from everything that can reach
+                        them.
+
+    :return: A dictionary mapping each sha in aTipShas to an (ahead, behind,
+             exact) tuple, where exact is False if the counts are lower bounds.
+    """
+    tips = [sha for sha in sorted(set(aTipShas)) if sha != aBaseSha]
+    bits = {aBaseSha: 1}
+    for (index, sha) in enumerate(tips):
+      bits[sha] = 1 << (index + 1)
+    allBits = (1 << (len(tips) + 1)) - 1
+
+    masks = {}
+    queue = []
+    order = itertools.count()
+    queued = set()
+    walked = set()
+    # The queued commits that still have to be walked: those that can't be
+    # reached from every tip, and those whose bitsets have changed since they
+    # were last walked.
+    pending = set()
+    for (sha, bit) in bits.items():
+      masks[sha] = bit
+      queued.add(sha)
+      heapq.heappush(queue, self.__createEntry(sha, None, order))
+      if bit != allBits:
+        pending.add(sha)
+
+    while pending:
+      if aMaxCommits is not None and len(walked) >= aMaxCommits:
+        break
+
+      (negativeGeneration, negativeEpoch, index, sha, position, parents) = heapq.heappop(queue)
+      queued.discard(sha)
+      pending.discard(sha)
+      walked.add(sha)
+      mask = masks[sha]
+
+      for (parentSha, parentPosition) in self.__readParents(sha, position, parents):
+        parentMask = masks.get(parentSha, 0)
+        newMask = parentMask | mask
+        if newMask == parentMask:
+          continue
+
+        masks[parentSha] = newMask
+        if parentSha not in queued:
+          # If commit dates go backwards, a commit that isn't covered by the
+          # commit-graph can be walked before all of its children, in which
+          # case it's walked again.
+          queued.add(parentSha)
+          heapq.heappush(queue, self.__createEntry(parentSha, parentPosition, order))
+        if newMask != allBits or parentSha in walked:
+          pending.add(parentSha)
+        else:
+          pending.discard(parentSha)
+
+    # A tip's counts are only lower bounds if a commit that is left to walk
+    # could still count towards them, i.e. can be reached from the tip or the
+    # base, but not both.
+    inexactBits = 0
+    for sha in pending:
+      mask = masks[sha]
+      if mask & 1:
+        inexactBits |= ~mask & allBits
+      else:
+        inexactBits |= mask
+
+    # Commits are counted once, with their final bitset. Commits reachable from
+    # the base are behind every tip they can't be reached from; the others are
+    # ahead of every tip they can be reached from.
+    maskCounts = {}
+    for (sha, mask) in masks.items():
+      if sha in walked:
+        maskCounts[mask] = maskCounts.get(mask, 0) + 1
+
+    behindAll = 0
+    counts = [[0, 0] for x in range(len(tips) + 1)]
+    for (mask, count) in maskCounts.items():
+      side = 1 - (mask & 1)
+      if side == 0:
+        behindAll += count
+      remainingBits = mask & ~1
+      while remainingBits:
+        lowestBit = remainingBits & -remainingBits
+        counts[lowestBit.bit_length() - 1][side] += count
+        remainingBits ^= lowestBit
+
+    divergence = {aBaseSha: (0, 0, True)}
+    for (index, sha) in enumerate(tips):
+      (behindReached, ahead) = counts[index + 1]
+      divergence[sha] = (ahead, behindAll - behindReached, not inexactBits & (1 << (index + 1)))
+    return divergence
+
+  def close(self):
+    """
+    Release all files that were opened by this CommitHistory.
+    """
+    self.__mGraph.close()
+    self.__mObjectReader.close()
+
+  ## Private API ##
+
+  def __lookupGeneration(self, aSha, aPosition):
+    """
+    Retrieve the generation number and commit-graph position of a commit.
+
+    :param aSha: The hex sha of the commit.
+    :param aPosition: The position of the commit within the commit-graph, if it
+                      is already known.
+
+    :return: A (generation, position) tuple. Commits that aren't covered by the
+             commit-graph have a position of None, and a generation number of
+             GENERATION_INFINITY.
+    """
+    if aPosition is None:
+      aPosition = self.__mGraph.findCommit(aSha)
+    if aPosition is None:
+      return (CommitHistory.GENERATION_INFINITY, None)
+
+    # Graphs written by very old versions of git have no generation numbers.
+    return (self.__mGraph.getGeneration(aPosition) or CommitHistory.GENERATION_INFINITY, aPosition)
+
+  def __createEntry(self, aSha, aPosition, aOrder):
+    """
+    Create the entry of a commit in the queue of a walk. Entries are ordered by
+    descending generation number, then by descending commit date (which is
+    only needed for commits without a generation number), and then in the
+    order in which they were queued.
+
+    :param aSha: The hex sha of the commit.
+    :param aPosition: The position of the commit within the commit-graph, if it
+                      is already known.
+    :param aOrder: An itertools.count() shared by all entries of the walk.
+
+    :return: A (-generation, -epoch, order, sha, position, parents) tuple, where
+             parents is the list of the commit's parents, if its commit object
+             had to be read to find its date, or None.
+    """
+    (generation, position) = self.__lookupGeneration(aSha, aPosition)
+    epoch = 0
+    parents = None
+    if generation == CommitHistory.GENERATION_INFINITY:
+      if position is not None:
+        epoch = self.__mGraph.getCommitTime(aSha) or 0
+      else:
+        header = self.__mObjectReader.readCommitHeader(aSha)
+        parents = []
+        if header is not None:
+          parents = [(x, None) for x in header.get('parent', [])]
+          if 'committer' in header:
+            epoch = parseIdentity(header['committer'])[1] or 0
+    return (-generation, -epoch, next(aOrder), aSha, position, parents)
+
+  def __readParents(self, aSha, aPosition, aParents):
+    """
+    Retrieve the parents of a commit.
+
+    :param aParents: The parents of the commit, if they have already been read
+                     (see __createEntry()), or None.
+
+    :return: A list of (sha, position) tuples, where position is the position of
+             the parent within the commit-graph, or None if it isn't known.
+    """
+    if aParents is not None:
+      return aParents
+
+    if aPosition is not None:
+      return [(self.__mGraph.getSha(x), x) for x in self.__mGraph.getParents(aPosition)]
+
+    header = self.__mObjectReader.readCommitHeader(aSha)
+    if header is None:
+      return []
+    return [(x, None) for x in header.get('parent', [])]
@@ -0,0 +1,160 @@
+# ignore.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for matching branch names against the branches to be ignored within
+# git-branchhealth.
+
+import re
+
+# Characters that make an ignore pattern a glob, rather than an exact name.
+GLOB_CHARACTERS = '*?['
+
+def translateGlob(aGlob):
+  """
+  Translate a glob pattern into a regular expression (without anchors). A '*'
+  matches any part of a single path segment, '**' matches any number of whole
+  segments, '?' matches any single character except '/', and '[...]' matches a
+  character class, as in .gitignore.
+
+  :param aGlob: The glob pattern (e.g. 'release/*').
+
+  :return: A regular expression string.
+  """
+  regex = ''
+  index = 0
+  while index < len(aGlob):
+    character = aGlob[index]
+    if aGlob.startswith('**/', index):
+      regex += '(?:.*/)?'
+      index += 3
+      continue
+    elif aGlob.startswith('**', index):
+      regex += '.*'
+      index += 2
+      continue
+    elif character == '*':
+      regex += '[^/]*'
+    elif character == '?':
+      regex += '[^/]'
+    elif character == '[':
+      end = aGlob.find(']', index + 2)
+      if end < 0:
+        regex += re.escape(character)
+      else:
+        characterClass = aGlob[index + 1:end]
+        if characterClass.startswith('!'):
+          characterClass = '^' + characterClass[1:]
+        regex += '[' + characterClass.replace('\\', '\\\\') + ']'
+        index = end
+    else:
+      regex += re.escape(character)
+    index += 1
+  return regex
+
+class IgnoreMatcher:
+  """
+  Object used to determine whether a branch should be ignored, given a list of
+  ignore patterns. Each pattern is one of:
+
+    - An exact name (e.g. 'master' or 'release/1.0'), which matches a branch
+      with that name, or whose last path segment is that name (so that 'master'
+      also matches 'feature/master', as it always has). All exact names are
+      kept in a set, so matching them doesn't depend on how many there are.
+    - A namespace (e.g. 'dependabot/' or 'dependabot/**'), which matches every
+      branch below it. All namespaces are kept in a trie of path segments, so
+      matching them only depends on the depth of the branch.
+    - A glob (e.g. 'release/*' or '*-wip'). All globs are combined into a single
+      compiled regular expression.
+
+  Branch names are matched without their ref namespace, e.g. 'feature/foo' for
+  both 'refs/heads/feature/foo' and 'refs/remotes/origin/feature/foo'.
+  """
+
+  # Key marking the end of a namespace in the trie. It can't collide with a
+  # path segment, as segments are never empty.
+  __END = ''
+
+  def __init__(self, aPatterns):
+    """
+    Create a new IgnoreMatcher instance.
+
+    :param aPatterns: A list of ignore patterns.
+    """
+    self.__mNames = set()
+    self.__mNamespaces = {}
+    self.__mNamespaceDepth = 0
+    globs = []
+
+    for pattern in aPatterns:
+      pattern = pattern.strip()
+      if not pattern:
+        continue
+
+      namespace = None
+      if pattern.endswith('/**'):
+        namespace = pattern[:-len('/**')]
+      elif pattern.endswith('/'):
+        namespace = pattern.rstrip('/')
+
+      if namespace is not None and not self.__isGlob(namespace):
+        self.__addNamespace(namespace)
+      elif self.__isGlob(pattern):
+        globs.append(translateGlob(pattern))
+      else:
+        self.__mNames.add(pattern)
+
+    self.__mGlobRegex = None
+    if globs:
+      self.__mGlobRegex = re.compile('^(?:' + '|'.join(globs) + ')$')
+
+  def matches(self, aBranchName):
+    """
+    Determine whether a branch should be ignored.
+
+    :param aBranchName: The name of the branch, without its ref namespace (e.g.
+                        'feature/foo').
+
+    :return: True, if the branch matches any of the ignore patterns; False,
+             otherwise.
+    """
+    if aBranchName in self.__mNames or aBranchName[aBranchName.rfind('/') + 1:] in self.__mNames:
+      return True
+
+    if self.__mNamespaces and self.__isInNamespace(aBranchName):
+      return True
+
+    return self.__mGlobRegex is not None and self.__mGlobRegex.match(aBranchName) is not None
+
+  ## Private API ##
+
+  def __isGlob(self, aPattern):
+    for character in GLOB_CHARACTERS:
+      if character in aPattern:
+        return True
+    return False
+
+  def __addNamespace(self, aNamespace):
+    segments = [x for x in aNamespace.split('/') if x]
+    self.__mNamespaceDepth = max(self.__mNamespaceDepth, len(segments))
+
+    node = self.__mNamespaces
+    for segment in segments:
+      node = node.setdefault(segment, {})
+    node[IgnoreMatcher.__END] = True
+
+  def __isInNamespace(self, aBranchName):
+    node = self.__mNamespaces
+    if IgnoreMatcher.__END in node:
+      return True
+
+    # Only split off as many segments as the deepest namespace has. The last
+    # segment is the branch itself (or the rest of its name), not a namespace.
+    segments = aBranchName.split('/', self.__mNamespaceDepth)
+    for segment in segments[:-1]:
+      node = node.get(segment)
+      if node is None:
+        return False
+      if IgnoreMatcher.__END in node:
+        return True
+    return False
@@ -4,14 +4,19 @@
 #
 # Module for managing branches within git-branchhealth.
 
-from git.refs.head import Head
-from git.util import join_path
-from git.refs.remote import RemoteReference
-from git.refs.reference import Reference
+import heapq
 
+from archive import BranchArchiver
+from authors import AuthorReport
 from branch import Branch
 from config import BranchHealthConfig
-from util import branchDateComparator
+from deletion import LocalBranchDeleter, RemoteBranchDeleter, splitRemoteBranchPath
+from history import CommitHistory
+from refs import RefReader, getRefPatternBase
+from resolver import ActivityResolver, epochToDateTime
+from table import BranchTable
+from transaction import RefUpdateResult
+from util import encodeText
 
 class BranchManager:
   """
@@ -19,37 +24,354 @@ class BranchManager:
   branch health processing algorithm. Each branch is associated with a given
   healthiness state, and this object does that association.
   """
-  def __init__(self, aConfig):
+  def __init__(self, aConfig, aProcessRunner=None):
     """
     Create a new BranchManager instance.
 
     :param aConfig: The :class:`config.BranchHealthConfig` object containing the
                     configuration options for the new instance.
+    :param aProcessRunner: If given, the function used to start the git
+                           processes that resolve branches (see
+                           :class:`resolver.ActivityResolver`).
     """
     self.__mConfig = aConfig
+    self.__mProcessRunner = aProcessRunner
     self.__mBranchMap = None
 
-  def getBranchMap(self):
-    config = self.__mConfig
-    if self.__mBranchMap:
+  def getBranchMap(self, aOldOnly=False):
+    """
+    Retrieve the branch map for this manager: a list of Branch objects, one for
+    each branch that is not ignored, with its health marked, sorted in
+    descending order of last activity age.
+
+    :param aOldOnly: If True, only branches considered old are included. Since
+                     branches are filtered before they are sorted, only old
+                     branches are ever held in memory.
+
+    :return: A sorted list of Branch objects.
+    """
+    if self.__mBranchMap is not None and not aOldOnly:
       return self.__mBranchMap
 
+    branchMap = list(self.getBranchTable(aOldOnly).iterBranches(self.__getConfig()))
+    if not aOldOnly:
+      self.__mBranchMap = branchMap
+    return branchMap
+
+  def getBranchTable(self, aOldOnly=False):
+    """
+    Retrieve the branches of this manager as a compact, columnar
+    :class:`table.BranchTable`, with their health marked, sorted in the same
+    order as getBranchMap(). This is the preferred way to process very large
+    numbers of branches, as no Branch objects are created.
+
+    :param aOldOnly: If True, only branches considered old are included. They
+                     are filtered out before the table is sorted.
+
+    :return: A sorted BranchTable.
+    """
+    config = self.__getConfig()
+    table = BranchTable()
+    resolver = self.__createResolver()
+    isIgnored = self.__createIgnoreFilter(self.getRefPrefixes())
+    for (branchPath, sha, epoch) in resolver.iterResolve(self.getRefPatterns()):
+      if not isIgnored(branchPath):
+        table.append(branchPath, sha, epoch)
+
+    table.classify(config.getHealthClassifier())
+    if aOldOnly:
+      table = table.selectHealth(Branch.OLD)
+    return table.sortByAge(self.getRefPrefixes())
+
+  def getTopBranches(self, aLimit, aNewest=False, aOldOnly=False):
+    """
+    Retrieve only the oldest (or newest) branches of this manager. Branches are
+    streamed through a heap that never holds more than aLimit of them, so this
+    is much cheaper than sorting the whole branch map when aLimit is small.
+
+    :param aLimit: The maximum number of branches to retrieve.
+    :param aNewest: If True, retrieve the newest branches instead of the oldest.
+    :param aOldOnly: If True, only branches considered old are included.
+
+    :return: A list of at most aLimit Branch objects, sorted in the same order
+             as getBranchMap().
+    """
+    branches = self.iterBranches()
+    if aOldOnly:
+      branches = (x for x in branches if x.getHealth() == Branch.OLD)
+
+    sortKey = self.__createSortKey()
+    if aNewest:
+      return list(reversed(heapq.nlargest(aLimit, branches, key=sortKey)))
+    return heapq.nsmallest(aLimit, branches, key=sortKey)
+
+  def iterBranches(self):
+    """
+    Stream the branches of this manager, without sorting them. This is a
+    pipeline of generators: refs are enumerated, their dates of last activity
+    are resolved, and each resulting Branch has its health marked as soon as it
+    is created, so the first branch is available before all refs have been
+    enumerated, and memory use does not grow with the number of branches.
+
+    :return: A generator of Branch objects, in no particular order.
+    """
+    config = self.__getConfig()
+    resolver = self.__createResolver()
+    isIgnored = self.__createIgnoreFilter(self.getRefPrefixes())
+    for (branchPath, sha, epoch) in resolver.iterResolve(self.getRefPatterns()):
+      if isIgnored(branchPath):
+        continue
+
+      branch = Branch(branchPath, config, epochToDateTime(epoch), sha)
+      branch.markHealth()
+      yield branch
+
+  def getRefsSharingTips(self):
+    """
+    Retrieve the branches that point to the same commit as at least one other
+    branch (e.g. a local branch and its remote-tracking branches), grouped by
+    that commit. Refs are only enumerated, so no dates are resolved.
+
+    :return: A dictionary mapping the sha of each shared tip commit to a sorted
+             list of the paths of the branches pointing to it.
+    """
+    isIgnored = self.__createIgnoreFilter(self.getRefPrefixes())
+    refsByTip = {}
+    for (branchPath, sha) in self.__createResolver().iterRefs(self.getRefPatterns()):
+      if not isIgnored(branchPath):
+        refsByTip.setdefault(sha, []).append(branchPath)
+    return dict([(sha, sorted(paths)) for (sha, paths) in refsByTip.items() if len(paths) > 1])
+
+  def getTrunkSha(self):
+    """
+    Retrieve the commit at the tip of the trunk branch. When operating on a
+    single remote, the trunk branch of that remote is preferred over the local
+    trunk branch.
+
+    :return: The hex sha of the trunk's tip, or None if the trunk branch
+             couldn't be found.
+    """
+    config = self.__getConfig()
+    trunkName = config.getTrunkBranchName()
+    candidates = ['refs/heads/' + trunkName]
+    if trunkName.startswith('refs/'):
+      candidates = [trunkName]
+    elif config.getRemoteName() and config.getRemoteName() not in ['local', 'all']:
+      candidates.insert(0, 'refs/remotes/' + config.getRemoteName() + '/' + trunkName)
+
+    reader = RefReader(config.getGitDir())
+    for candidate in candidates:
+      sha = reader.readRef(candidate)
+      if sha:
+        return sha
+
+    config.getLog().warn("Unable to find trunk branch: " + trunkName)
+    return None
+
+  def getMergedTips(self):
+    """
+    Determine which of the scanned branches have been merged into the trunk
+    branch (see getTrunkSha()). Every branch is checked with a single walk of
+    the trunk's history (see :meth:`history.CommitHistory.findReachable`),
+    which stops as soon as no unmerged branch can still be reached.
+
+    :return: The set of the shas of the branch tips that have been merged into
+             the trunk, or None if the trunk branch couldn't be found.
+    """
+    trunkSha = self.getTrunkSha()
+    if not trunkSha:
+      return None
+
+    history = CommitHistory(self.__getConfig().getGitDir())
+    try:
+      return history.findReachable(trunkSha, self.__findTips())
+    finally:
+      history.close()
+
+  def getDivergence(self):
+    """
+    Determine how far each of the scanned branches has diverged from the trunk
+    branch (see getTrunkSha()): how many commits it is ahead of and behind the
+    trunk. Every branch is compared with a single walk of history (see
+    :meth:`history.CommitHistory.countDivergence`), which walks at most
+    :meth:`config.BranchHealthConfig.getMaxWalk` commits.
+
+    :return: A dictionary mapping the sha of each branch tip to an (ahead,
+             behind, exact) tuple, or None if the trunk branch couldn't be
+             found.
+    """
+    trunkSha = self.getTrunkSha()
+    if not trunkSha:
+      return None
+
+    history = CommitHistory(self.__getConfig().getGitDir())
+    try:
+      return history.countDivergence(trunkSha, self.__findTips(), self.__getConfig().getMaxWalk())
+    finally:
+      history.close()
+
+  def selectMergedBranches(self, aBranches):
+    """
+    Select only those branches that have been merged into the trunk branch, so
+    that deleting them can't lose any work.
+
+    :param aBranches: A list of Branch objects.
+
+    :return: A list of the Branch objects in aBranches whose tips are reachable
+             from the trunk, in the same order, or an empty list if the trunk
+             branch couldn't be found.
+    """
+    log = self.__getConfig().getLog()
+    mergedTips = self.getMergedTips()
+    if mergedTips is None:
+      log.warn("Not removing any branches, as the trunk branch couldn't be found")
+      return []
+
+    merged = []
+    for branch in aBranches:
+      if branch.getSha() in mergedTips:
+        merged.append(branch)
+      else:
+        log.info("Not removing unmerged branch " + branch.getPath())
+    return merged
+
+  def getAuthorReport(self, aOldestCount=AuthorReport.OLDEST_COUNT, aOldOnly=False):
+    """
+    Summarize the branches of this manager by the author of their tip commits.
+    Authors are resolved in the same batched pass as the dates of last activity
+    (see :meth:`resolver.ActivityResolver.iterResolveIdentities`), and each
+    branch is added to the report as soon as it is resolved, so no Branch
+    objects are created.
+
+    :param aOldestCount: The number of oldest branches to keep for each author.
+    :param aOldOnly: If True, only branches considered old are included.
+
+    :return: An :class:`authors.AuthorReport`.
+    """
+    config = self.__getConfig()
+    classify = config.getHealthClassifier().classify
+    isIgnored = self.__createIgnoreFilter(self.getRefPrefixes())
+    report = AuthorReport(aOldestCount)
+    for (branchPath, sha, epoch, author, committer) in self.__createResolver().iterResolveIdentities(self.getRefPatterns()):
+      if isIgnored(branchPath):
+        continue
+
+      health = classify(epoch)
+      if not aOldOnly or health == Branch.OLD:
+        report.add(branchPath, epoch, health, author)
+    return report
+
+  def getRefPrefixes(self):
+    """
+    Retrieve the ref namespaces that are scanned for branches, according to the
+    remote this manager was configured to operate on.
+
+    :return: A list of ref namespaces (e.g. 'refs/heads' or
+             'refs/remotes/origin').
+    """
+    config = self.__mConfig
     config.getLog().debug("Remote name is: " + str(config.getRemoteName()))
 
     if not config.getRemoteName() or config.getRemoteName() == 'local':
       # We're operating on the local repo only.
-      self.__mBranchMap = self.__getBranchMapFromRefList(config.getRepo().heads)
+      return ['refs/heads']
     elif config.getRemoteName() == 'all':
       # We're operating on ALL remotes, as well as local branches.
-      self.__mBranchMap = []
-      for remote in config.getRepo().remotes:
-        self.__mBranchMap = self.__mBranchMap + self.__getRemoteBranchMap(remote.name)
-      self.__mBranchMap = self.__mBranchMap + self.__getBranchMapFromRefList(config.getRepo().heads)
-    else:
-      # We're operating on a specific remote
-      self.__mBranchMap = self.__getRemoteBranchMap(config.getRemoteName())
+      refPrefixes = ['refs/remotes/' + encodeText(remote.name) for remote in config.getRepo().remotes]
+      refPrefixes.append('refs/heads')
+      return refPrefixes
+
+    # We're operating on a specific remote
+    return self.__getRemoteRefPrefixes(config.getRemoteName())
 
-    return self.__sortBranchMapByDate()
+  def getRefPatterns(self):
+    """
+    Retrieve the ref patterns that are passed to ref enumeration, so that refs
+    outside of them are never read at all. Each configured pattern that isn't a
+    full ref path (e.g. 'feature/*') is applied within every scanned namespace
+    (e.g. 'refs/heads/feature/*'), while a full ref path (e.g.
+    'refs/heads/feature/*') is only used if it lies within one of the scanned
+    namespaces.
+
+    :return: A list of ref patterns, or the scanned namespaces themselves (see
+             getRefPrefixes()) if no patterns were configured.
+    """
+    config = self.__getConfig()
+    refPrefixes = self.getRefPrefixes()
+    if not config.getRefPatterns():
+      return refPrefixes
+
+    refPatterns = []
+    for pattern in config.getRefPatterns():
+      if pattern.startswith('refs/'):
+        base = getRefPatternBase(pattern) + '/'
+        if not any([base.startswith(x.rstrip('/') + '/') for x in refPrefixes]):
+          config.getLog().warn("Ignoring ref pattern outside of the scanned namespaces: " + pattern)
+          continue
+        candidates = [pattern]
+      else:
+        candidates = [x.rstrip('/') + '/' + pattern.lstrip('/') for x in refPrefixes]
+
+      for candidate in candidates:
+        if candidate not in refPatterns:
+          refPatterns.append(candidate)
+    return refPatterns
+
+  def getRefStateFingerprint(self):
+    """
+    Compute a fingerprint of everything that determines the branch map: the
+    state of the refs matching the ref patterns, the branches being ignored, the
+    source of activity dates and the health thresholds. If the fingerprint is
+    unchanged since a previous run, so is the branch map (apart from health,
+    which depends on the time).
+
+    :return: A string fingerprint.
+    """
+    config = self.__getConfig()
+    settings = [
+      'thresholds=' + ','.join([str(x) for x in config.getHealthThresholds()]),
+      'activity=' + str(config.getActivitySource()),
+      'ignored=' + ','.join(sorted(config.getIgnoredBranches())),
+    ]
+    return RefReader(config.getGitDir()).computeFingerprint(self.getRefPatterns(), settings)
+
+  def getBranchTableFromCache(self, aReportCache, aOldOnly=False):
+    """
+    Retrieve the branch table from the report saved by a previous run, if the
+    fingerprint of the repository's refs has not changed since then. Otherwise,
+    compute the branch table (see getBranchTable()) and save it for the next
+    run. Either way, no Branch objects are created.
+
+    :param aReportCache: The :class:`cache.ReportCache` to read from and write to.
+    :param aOldOnly: If True, only branches considered old are included. The
+                     report always contains all branches.
+
+    :return: A BranchTable, sorted in the same way as getBranchTable(), with
+             the health of its branches marked.
+    """
+    fingerprint = self.getRefStateFingerprint()
+    table = self.__loadBranchTable(aReportCache, fingerprint)
+    if table is None:
+      table = self.getBranchTable()
+      aReportCache.save(fingerprint, table)
+
+    if aOldOnly:
+      table = table.selectHealth(Branch.OLD)
+    return table
+
+  def loadBranchTableFromCache(self, aReportCache):
+    """
+    Retrieve the branch table from the report saved by a previous run, if the
+    fingerprint of the repository's refs has not changed since then. Unlike
+    getBranchTableFromCache(), nothing is computed if the report can't be used.
+
+    :param aReportCache: The :class:`cache.ReportCache` to read from.
+
+    :return: A BranchTable, sorted in the same way as getBranchTable(), with
+             the health of its branches marked, or None if there is no up to
+             date report.
+    """
+    return self.__loadBranchTable(aReportCache, self.getRefStateFingerprint())
 
   def getPrefix(self, aRef):
     """
@@ -61,6 +383,8 @@ class BranchManager:
 
     :return: A string for the prefix of the git path to the reference.
     """
+    from git.refs.remote import RemoteReference
+
     if type(aRef) == RemoteReference:
       return 'refs/remotes/'
     return 'refs/heads/'
@@ -74,10 +398,9 @@ class BranchManager:
              repository being processed.
     """
     branches = []
-    branchNames = self.getLocalBranchNames()
-    for branchName in branchNames:
-      branchPath = 'refs/heads/' + branchName
-      branch = Branch(branchPath, self.__getConfig())
+    resolver = self.__createResolver()
+    for (branchPath, sha, epoch) in resolver.resolve(['refs/heads']):
+      branch = Branch(branchPath, self.__getConfig(), epochToDateTime(epoch), sha)
       branches.append(branch)
     return branches
 
@@ -99,84 +422,171 @@ class BranchManager:
 
     :param aBranchesToDelete: A list containing the names of branches to delete.
 
+    :return: A list containing a :class:`transaction.RefUpdateResult` for each
+             branch that was to be deleted: first the remote branches, and then
+             the local branches (including the local counterparts of the remote
+             branches that were deleted). A local counterpart that wasn't
+             scanned itself is only deleted if it points to the commit its
+             remote branch pointed to when it was scanned, so that local work
+             is never lost.
+
     :warning: Use this method with care - it's operations are irreversible, and
               you may end up losing work!
     """
-    log = self.__getConfig().getLog()
+    config = self.__getConfig()
+    log = config.getLog()
+    localBranches = []
+    remoteBranches = []
     for branchToDelete in aBranchesToDelete:
-      branchPath = branchToDelete.getPath()
-      lastActivityRel = branchToDelete.getLastActivityRelativeToNow()
-      branchHealth = branchToDelete.getHealth()
-      remoteName = 'local'
+      # Only delete branches that haven't moved since they were scanned.
       if branchToDelete.isRemote():
-        splitName = branchPath.split('/')
-        remoteName = splitName[len(splitName) - 2]
+        remoteBranches.append((branchToDelete.getPath(), branchToDelete.getSha()))
+      else:
+        localBranches.append((branchToDelete.getPath(), branchToDelete.getSha()))
+
+    # Delete all of the remote branches with as few pushes as possible.
+    results = RemoteBranchDeleter(config, config.getJobs()).deleteBranches(remoteBranches)
+    remoteNames = [encodeText(x.name) for x in config.getRepo().remotes]
+    scannedShas = dict(remoteBranches)
+    localPaths = set([path for (path, sha) in localBranches])
+    for result in results:
+      if result.isSuccessful():
+        # Now, delete the corresponding local branch, if it exists, and is still
+        # at the commit the remote branch was at when it was scanned.
+        (remoteName, branchName) = splitRemoteBranchPath(result.getPath(), remoteNames)
+        localPath = 'refs/heads/' + branchName
+        if localPath not in localPaths:
+          localPaths.add(localPath)
+          localBranches.append((localPath, scannedShas[result.getPath()]))
+
+    # Delete all of the local branches at once.
+    results = results + LocalBranchDeleter(config).deleteBranches(localBranches)
+    for result in results:
+      if result.isSuccessful():
+        log.info("Deleted branch " + result.getPath())
+      elif result.getOutcome() == RefUpdateResult.MISSING:
+        log.debug("Not deleting missing branch " + result.getPath())
+      else:
+        log.warn("Not deleting branch " + str(result))
+    return results
+
+  def archiveAllOldBranches(self, aBranchesToArchive):
+    """
+    Move local branches to the 'refs/archive/<date>' namespace, rather than
+    deleting them, all in a single ref transaction. Remote branches can't be
+    archived, and are left alone.
 
-      self.__deleteOldBranch(branchPath, remoteName)
+    :param aBranchesToArchive: A list of Branch objects to archive.
 
-  ## Private API ##
+    :return: A list containing a :class:`transaction.RefUpdateResult` for each
+             branch.
+    """
+    log = self.__getConfig().getLog()
 
-  def __sortBranchMapByDate(self):
+    # Only archive branches that haven't moved since they were scanned.
+    branches = [(x.getPath(), x.getSha()) for x in aBranchesToArchive]
+    results = BranchArchiver(self.__getConfig()).archiveBranches(branches)
+    for result in results:
+      if result.isSuccessful():
+        log.info("Archived branch " + result.getPath() + " to " + result.getMessage())
+      else:
+        log.warn("Not archiving branch " + str(result))
+    return results
+
+  def restoreArchivedBranches(self, aArchive):
     """
-    Sort the list of Branch objects by the date the last activity occurred on them.
+    Move archived branches back to 'refs/heads'.
 
-    :return: A list of Branch objects, guaranteed to be sorted in non-
-             ascending order, by the iso-standardized date of last activity.
+    :param aArchive: The date the branches were archived under (e.g.
+                     '2014-07-20'), or the name of a single archived branch
+                     below 'refs/archive' (e.g. '2014-07-20/foo').
+
+    :return: A list containing a :class:`transaction.RefUpdateResult` for each
+             archived branch.
     """
-    sortedBranchMap = sorted(self.__mBranchMap, cmp=branchDateComparator)
+    return BranchArchiver(self.__getConfig()).restoreBranches(aArchive)
 
-    finalBranchList = []
-    for someBranch in sortedBranchMap:
-      someBranch.markHealth()
-      branchPath = someBranch.getPath()
-      humanDate = someBranch.getLastActivityRelativeToNow()
-      branchHealth = someBranch.getHealth()
-      finalBranchList.append(someBranch)
+  ## Private API ##
 
-    return finalBranchList
+  def __findTips(self):
+    """
+    Retrieve the set of distinct commits that the scanned branches point to.
+    Refs are only enumerated, so no dates are resolved.
+    """
+    isIgnored = self.__createIgnoreFilter(self.getRefPrefixes())
+    tips = set()
+    for (branchPath, sha) in self.__createResolver().iterRefs(self.getRefPatterns()):
+      if not isIgnored(branchPath):
+        tips.add(sha)
+    return tips
+
+  def __loadBranchTable(self, aReportCache, aFingerprint):
+    """
+    Load the branch table from a report cache, if it was saved for a given ref
+    state fingerprint, and mark the health of its branches, which depends on
+    the current time.
+    """
+    table = aReportCache.load(aFingerprint, BranchTable())
+    if table is None:
+      return None
 
-  def __getBranchMapFromRefList(self, aRefList):
+    config = self.__getConfig()
+    config.getLog().debug("Ref state is unchanged; using the cached report")
+    table.classify(config.getHealthClassifier())
+    return table
+
+  def __createResolver(self):
+    return ActivityResolver(self.__getConfig(), self.__mProcessRunner)
+
+  def __createSortKey(self):
+    """
+    Create the key function used to order branches by age: a tuple of plain
+    integers and strings (the epoch of last activity, the position of the
+    branch's namespace in getRefPrefixes(), and the path), which is cheap to
+    compare, and never requires any dates to be formatted.
     """
-    Retrieve the branch map for this manager for all local branches. The branch
-    map is a list of Branch objects, each mapping a ref path to a
-    healthy/aged/old status.
+    prefixes = [x.rstrip('/') + '/' for x in self.getRefPrefixes()]
+
+    def sortKey(aBranch):
+      path = aBranch.getPath()
+      rank = len(prefixes)
+      for (index, prefix) in enumerate(prefixes):
+        if path.startswith(prefix):
+          rank = index
+          break
+      return (aBranch.getLastActivityEpoch(), rank, path)
 
-    :param aRefList: A list of Reference objects that should be processed and
-                     mapped to healthy statuses.
+    return sortKey
 
-    :return: A list of Branch objects, each of which maps one Reference in aRefList
-             to a health status.
+  def __createIgnoreFilter(self, aRefPrefixes):
     """
-    log = self.__mConfig.getLog()
-    branchMap = []
+    Create the function used to determine whether a branch should be left out of
+    the branch map, because it matches one of the ignored branches. Branches
+    are matched by their name within the namespace they were found in (e.g.
+    'feature/foo' for 'refs/remotes/origin/feature/foo').
 
-    for branch in aRefList:
-      branchPath = branch.path
-      branchName = branchPath.split('/')[-1]
+    :param aRefPrefixes: The ref namespaces being scanned.
+    """
+    # Check longer namespaces first, in case they're nested.
+    prefixes = sorted([x.rstrip('/') + '/' for x in aRefPrefixes], key=len, reverse=True)
+    matcher = self.__getConfig().getIgnoreMatcher()
 
-      # Don't include branches that should be ignored.
-      shouldIgnore = False
-      for ignoredBranch in self.__getConfig().getIgnoredBranches():
-        if branchName == ignoredBranch:
-          shouldIgnore = True
-          break
-      if shouldIgnore:
-        continue
+    def isIgnored(aBranchPath):
+      for prefix in prefixes:
+        if aBranchPath.startswith(prefix):
+          return matcher.matches(aBranchPath[len(prefix):])
+      return matcher.matches(aBranchPath[aBranchPath.rfind('/') + 1:])
 
-      newBranch = Branch(branchPath, self.__getConfig())
-      branchMap.append(newBranch)
-    return branchMap
+    return isIgnored
 
-  def __getRemoteBranchMap(self, aRemoteName):
+  def __getRemoteRefPrefixes(self, aRemoteName):
     """
-    Retrieve the branch map for this manager for all branches on a given remote.
-    The branch map is a list of Branch objects, each mapping a ref path to a
-    healthy/aged/old status.
+    Retrieve the ref namespaces containing all branches on a given remote.
 
     :param aRemoteName: The name of a remote for the repository being processed.
 
-    :return: A list of Branch objects, each of which maps one Reference in aRefList
-             to a health status.
+    :return: A list containing the ref namespace for the remote, or an empty
+             list if the remote could not be found.
     """
 
     log = self.__getConfig().getLog()
@@ -185,16 +595,13 @@ class BranchManager:
       return []
 
     repo = self.__getConfig().getRepo()
-    assert(repo.bare == False)
-    gitCmd = repo.git
 
-    remoteToUse = None
     for someRemote in repo.remotes:
-      if aRemoteName == someRemote.name:
-        remoteToUse = someRemote
+      if aRemoteName == encodeText(someRemote.name):
+        return ['refs/remotes/' + aRemoteName]
 
-    remotePrefix = 'remotes/' + aRemoteName + '/'
-    return self.__getBranchMapFromRefList(remoteToUse.refs)
+    log.warn("Unable to find remote named: " + str(aRemoteName))
+    return []
 
   def __getConfig(self):
     """
@@ -205,42 +612,3 @@ class BranchManager:
              with.
     """
     return self.__mConfig
-
-  def __deleteOldBranch(self, aBranchPath, aRemote='local', aShouldDeleteLocal=True):
-    """
-    Delete a given branch from a remote, the local repository, or both.
-
-    :param aBranchPath: The path of the branch to remove.
-    :param aRemote: The name of the remote repository on which to work (default:
-                    'local', representing the local repository).
-    :param aShouldDeleteLocal: If True and aRemote != 'local', then local branches
-           will be removed as well as the remote ones; otherwise, only the remote
-           branches will be removed.
-    """
-    log = self.__getConfig().getLog()
-    repo = self.__getConfig().getRepo()
-
-    # Cowardly refuse to remove the special 'master' branch
-    if aBranchPath.split('/')[-1] == 'master':
-      log.warn("Cowardly refusing to delete master branch")
-      return
-
-    log.debug("Saw deletion request for remote named: " + str(aRemote))
-    if aRemote == 'local':
-      log.debug("Going to delete LOCAL branch: " + aBranchPath)
-      if aBranchPath.split('/')[-1] in repo.heads:
-        branchRef = Reference(repo, aBranchPath)
-
-        # NOTE: Head.delete has a parameter in it's kwargs that allows you to
-        #       specify whether to "force" this to be deleted, even if it hasn't
-        #       been merged into the main development trunk.
-        Head.delete(repo, branchRef)
-    else:
-      log.debug("Going to delete REMOTE branch: " + aBranchPath)
-      branchRef = RemoteReference(repo, aBranchPath)
-      log.debug("Ready to delete: " + str(branchRef))
-      RemoteReference.delete(repo, branchRef)
-
-      # Now, delete the corresponding local branch, if it exists
-      if aShouldDeleteLocal:
-        self.__deleteOldBranch(join_path('refs/heads', branchRef.remote_head))
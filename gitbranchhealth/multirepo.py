@@ -0,0 +1,133 @@
+# multirepo.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for checking the health of branches in many repositories at once.
+
+import os
+import os.path
+import traceback
+
+def readRepositoryList(aStream):
+  """
+  Read a list of repository paths, one per line. Blank lines and lines starting
+  with '#' are ignored.
+
+  :param aStream: A stream (e.g. an open file, or stdin) to read from.
+
+  :return: A list of repository paths.
+  """
+  repositories = []
+  for line in aStream:
+    line = line.strip()
+    if line and not line.startswith('#'):
+      repositories.append(line)
+  return repositories
+
+def isBareRepository(aPath):
+  """
+  Determine whether a directory looks like a bare repository (e.g. a mirror
+  created with 'git clone --mirror'): one with a 'HEAD' file, and 'objects'
+  and 'refs' directories.
+  """
+  return (os.path.isfile(os.path.join(aPath, 'HEAD')) and
+          os.path.isdir(os.path.join(aPath, 'objects')) and
+          os.path.isdir(os.path.join(aPath, 'refs')))
+
+def findRepositories(aRootDir):
+  """
+  Find all git repositories below a given directory, including bare
+  repositories. The search does not descend into repositories that have been
+  found.
+
+  :param aRootDir: The directory to start searching in.
+
+  :return: A sorted list of paths to the working trees of the repositories
+           (or to the repositories themselves, if they are bare).
+  """
+  repositories = []
+  for (root, dirs, files) in os.walk(aRootDir):
+    if '.git' in dirs or '.git' in files or isBareRepository(root):
+      repositories.append(root)
+      dirs[:] = []
+      continue
+    dirs.sort()
+  return sorted(repositories)
+
+def scanRepository(aTask):
+  """
+  Compute the branch table of a single repository. This is run in a worker
+  process of a :class:`MultiRepositoryScanner`, so any failure is caught and
+  reported as part of the result, rather than affecting other repositories.
+
+  :param aTask: A (repository path, command line arguments) tuple.
+
+  :return: A (repository path, rows, error) tuple, where rows is a list of
+           (branch path, epoch, health, relative last activity) tuples, sorted
+           by date, and error is None, or a description of what went wrong.
+  """
+  # Imported here, as the application itself depends on this module.
+  from branchhealth import BranchHealthApplication
+
+  (repoPath, arguments) = aTask
+  try:
+    context = BranchHealthApplication(arguments, aRepository=repoPath)
+    rows = []
+    for branch in context.computeBranchTable().iterBranches(context.getConfig()):
+      rows.append((branch.getPath(), branch.getLastActivityEpoch(), branch.getHealth(), branch.getLastActivityRelativeToNow()))
+    context.deleteOldBranchesIfRequested()
+    return (repoPath, rows, None)
+  except Exception as error:
+    return (repoPath, [], str(error) or traceback.format_exc())
+
+class MultiRepositoryScanner:
+  """
+  Object used to scan many repositories in parallel, using a pool of worker
+  processes. Each repository is scanned with the same command line arguments.
+  """
+
+  def __init__(self, aArguments, aJobs=None):
+    """
+    Create a new MultiRepositoryScanner instance.
+
+    :param aArguments: The command line arguments to scan each repository with.
+    :param aJobs: The number of worker processes to use. Defaults to the number
+                  of CPUs on this machine.
+    """
+    import multiprocessing
+
+    self.__mArguments = list(aArguments)
+    self.__mJobs = aJobs or multiprocessing.cpu_count()
+
+  def scan(self, aRepositories):
+    """
+    Scan a list of repositories.
+
+    :param aRepositories: A list of paths to repositories.
+
+    :return: A generator of (repository path, rows, error) tuples, as returned
+             by scanRepository(), in the order of aRepositories. Each result is
+             yielded as soon as it (and all results before it) are available.
+    """
+    tasks = [(os.path.abspath(repoPath), self.__mArguments) for repoPath in aRepositories]
+    if not tasks:
+      return
+
+    jobs = min(self.__mJobs, len(tasks))
+    if jobs == 1:
+      for task in tasks:
+        yield scanRepository(task)
+      return
+
+    import multiprocessing
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+      for result in pool.imap(scanRepository, tasks, 1):
+        yield result
+      pool.close()
+    except:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
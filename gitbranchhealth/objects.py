@@ -0,0 +1,463 @@
+# objects.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for reading commit objects directly from a git repository's object
+# database (loose objects and packfiles), without spawning any git
+# subprocesses.
+
+import binascii
+import mmap
+import os
+import os.path
+import struct
+import zlib
+
+from refs import findCommonDir
+
+class ObjectReader:
+  """
+  Object used to look up commit objects in the object database of a git
+  repository. Loose objects are inflated directly; packed objects are located
+  through the fanout table of each pack's .idx file, and deltified objects are
+  reconstructed from their bases. Only as much of each commit is decoded as is
+  needed to read its header.
+  """
+
+  # Object type codes, as stored in packfile entry headers.
+  OBJ_COMMIT = 1
+  OBJ_OFS_DELTA = 6
+  OBJ_REF_DELTA = 7
+
+  # Signature of a version 2 (or later) pack index file.
+  IDX_SIGNATURE = b'\377tOc'
+
+  # Amount of compressed data to inflate at a time when streaming an object.
+  CHUNK_SIZE = 4096
+
+  def __init__(self, aGitDir):
+    """
+    Create a new ObjectReader instance.
+
+    :param aGitDir: The path to the git directory (e.g. '<repo>/.git') of the
+                    repository to read objects from.
+    """
+    self.__mObjectDirs = self.__findObjectDirs(os.path.join(findCommonDir(aGitDir), 'objects'))
+    self.__mPacks = None
+
+  def readCommitTime(self, aSha, aField='committer'):
+    """
+    Retrieve the committer (or author) timestamp of a given commit.
+
+    :param aSha: The hex sha of the commit to read.
+    :param aField: The identity field whose timestamp should be read: either
+                   'committer' or 'author'.
+
+    :return: The timestamp, in seconds since the epoch (UTC), or None if the
+             object could not be found or is not a commit.
+    """
+    header = self.readCommitHeader(aSha)
+    if header is None or aField not in header:
+      return None
+
+    return parseIdentity(header[aField])[1]
+
+  def readCommitHeader(self, aSha):
+    """
+    Retrieve the header fields (tree, parent, author, committer, ...) of a given
+    commit. The commit message is not decoded.
+
+    :param aSha: The hex sha of the commit to read.
+
+    :return: A dictionary mapping each header field name to its value, or None
+             if the object could not be found or is not a commit. The 'parent'
+             field, if present, is a list of parent shas.
+    """
+    data = self.__readLooseObject(aSha)
+    if data is None:
+      data = self.__readPackedObject(aSha)
+    if data is None:
+      return None
+
+    return parseCommitHeader(data)
+
+  def close(self):
+    """
+    Release all packfiles that were opened by this ObjectReader.
+    """
+    for pack in self.__mPacks or []:
+      pack.close()
+    self.__mPacks = None
+
+  ## Private API ##
+
+  def __findObjectDirs(self, aObjectDir):
+    """
+    Retrieve the object directory of the repository, followed by any alternate
+    object directories listed in objects/info/alternates.
+    """
+    objectDirs = [aObjectDir]
+    alternatesPath = os.path.join(aObjectDir, 'info', 'alternates')
+    if os.path.isfile(alternatesPath):
+      with open(alternatesPath, 'r') as alternatesHandle:
+        for line in alternatesHandle:
+          line = line.strip()
+          if line and not line.startswith('#'):
+            objectDirs.append(os.path.normpath(os.path.join(aObjectDir, line)))
+    return objectDirs
+
+  def __getPacks(self):
+    """
+    Retrieve the list of packfiles in all object directories. Packs are opened
+    lazily, the first time an object cannot be found as a loose object.
+    """
+    if self.__mPacks is not None:
+      return self.__mPacks
+
+    self.__mPacks = []
+    for objectDir in self.__mObjectDirs:
+      packDir = os.path.join(objectDir, 'pack')
+      if not os.path.isdir(packDir):
+        continue
+
+      for fileName in sorted(os.listdir(packDir)):
+        if not fileName.endswith('.idx'):
+          continue
+        packPath = os.path.join(packDir, fileName[:-len('.idx')] + '.pack')
+        if os.path.isfile(packPath):
+          self.__mPacks.append(PackFile(os.path.join(packDir, fileName), packPath))
+    return self.__mPacks
+
+  def __readLooseObject(self, aSha):
+    """
+    Inflate the header of a loose commit object.
+
+    :return: The (possibly truncated) body of the commit, containing at least
+             the full commit header, or None if there is no loose object with
+             the given sha or it is not a commit.
+    """
+    for objectDir in self.__mObjectDirs:
+      objectPath = os.path.join(objectDir, aSha[:2], aSha[2:])
+      try:
+        objectHandle = open(objectPath, 'rb')
+      except IOError:
+        continue
+
+      with objectHandle:
+        data = inflateCommitHeader(objectHandle.read)
+
+      nul = data.find(b'\0')
+      if nul < 0 or not data.startswith(b'commit '):
+        return None
+      return data[nul + 1:]
+    return None
+
+  def __readPackedObject(self, aSha):
+    """
+    Read a commit object from whichever packfile contains it.
+
+    :return: The body of the commit, or None if it is not in any pack or is not
+             a commit.
+    """
+    binSha = binascii.unhexlify(aSha)
+    for pack in self.__getPacks():
+      offset = pack.findOffset(binSha)
+      if offset is None:
+        continue
+
+      (objectType, data) = pack.readObject(offset, self.__readPackedBase)
+      if objectType != ObjectReader.OBJ_COMMIT:
+        return None
+      return data
+    return None
+
+  def __readPackedBase(self, aBinSha):
+    """
+    Read the full, undeltified contents of a packed object by binary sha. This
+    is used to resolve the base of a REF_DELTA entry.
+    """
+    for pack in self.__getPacks():
+      offset = pack.findOffset(aBinSha)
+      if offset is not None:
+        return pack.readObject(offset, self.__readPackedBase, aFull=True)
+    return (None, None)
+
+class PackFile:
+  """
+  A single packfile, along with its index. Both files are memory-mapped, so
+  that lookups only touch the pages they need.
+  """
+
+  def __init__(self, aIdxPath, aPackPath):
+    self.__mIdxHandle = open(aIdxPath, 'rb')
+    self.__mIdx = mmap.mmap(self.__mIdxHandle.fileno(), 0, access=mmap.ACCESS_READ)
+    self.__mPackHandle = open(aPackPath, 'rb')
+    self.__mPack = mmap.mmap(self.__mPackHandle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if self.__mIdx[0:4] == ObjectReader.IDX_SIGNATURE:
+      self.__mVersion = struct.unpack('>I', self.__mIdx[4:8])[0]
+      self.__mFanoutOffset = 8
+    else:
+      self.__mVersion = 1
+      self.__mFanoutOffset = 0
+    self.__mCount = self.__fanout(255)
+
+  def close(self):
+    self.__mIdx.close()
+    self.__mIdxHandle.close()
+    self.__mPack.close()
+    self.__mPackHandle.close()
+
+  def findOffset(self, aBinSha):
+    """
+    Find the offset of an object within this packfile. The fanout table narrows
+    the search to objects sharing the first byte of the sha, and the remaining
+    range of the sorted sha table is binary searched.
+
+    :param aBinSha: The 20-byte binary sha of the object.
+
+    :return: The offset of the object's entry in the packfile, or None if this
+             pack does not contain the object.
+    """
+    firstByte = bytearray(aBinSha[0:1])[0]
+    low = 0
+    if firstByte > 0:
+      low = self.__fanout(firstByte - 1)
+    high = self.__fanout(firstByte)
+
+    while low < high:
+      middle = (low + high) // 2
+      middleSha = self.__shaAt(middle)
+      if middleSha < aBinSha:
+        low = middle + 1
+      elif middleSha > aBinSha:
+        high = middle
+      else:
+        return self.__offsetAt(middle)
+    return None
+
+  def readObject(self, aOffset, aBaseReader, aFull=False):
+    """
+    Read the object stored at a given offset in this packfile.
+
+    :param aOffset: The offset of the object's entry.
+    :param aBaseReader: A callable that, given a binary sha, returns the
+                        (type, data) of an object in any pack. This is used to
+                        resolve REF_DELTA bases stored outside of this pack.
+    :param aFull: If True, inflate the entire object; otherwise, undeltified
+                  commits are only inflated as far as the end of their header.
+
+    :return: A (type, data) tuple.
+    """
+    (objectType, dataOffset) = self.__readEntryHeader(aOffset)
+
+    if objectType == ObjectReader.OBJ_OFS_DELTA:
+      (baseDistance, dataOffset) = self.__readOffsetDelta(dataOffset)
+      (baseType, baseData) = self.readObject(aOffset - baseDistance, aBaseReader, aFull=True)
+      return (baseType, applyDelta(baseData, self.__inflate(dataOffset, True)))
+
+    if objectType == ObjectReader.OBJ_REF_DELTA:
+      baseSha = self.__mPack[dataOffset:dataOffset + 20]
+      (baseType, baseData) = aBaseReader(baseSha)
+      if baseData is None:
+        return (None, None)
+      return (baseType, applyDelta(baseData, self.__inflate(dataOffset + 20, True)))
+
+    if objectType != ObjectReader.OBJ_COMMIT and not aFull:
+      return (objectType, None)
+
+    return (objectType, self.__inflate(dataOffset, aFull))
+
+  ## Private API ##
+
+  def __fanout(self, aIndex):
+    start = self.__mFanoutOffset + 4 * aIndex
+    return struct.unpack('>I', self.__mIdx[start:start + 4])[0]
+
+  def __shaAt(self, aIndex):
+    if self.__mVersion == 1:
+      start = self.__mFanoutOffset + 1024 + 24 * aIndex + 4
+    else:
+      start = self.__mFanoutOffset + 1024 + 20 * aIndex
+    return self.__mIdx[start:start + 20]
+
+  def __offsetAt(self, aIndex):
+    if self.__mVersion == 1:
+      start = self.__mFanoutOffset + 1024 + 24 * aIndex
+      return struct.unpack('>I', self.__mIdx[start:start + 4])[0]
+
+    # Version 2: sha table, then CRC table, then 4-byte offsets, then 8-byte
+    # offsets for objects beyond 2GB.
+    offsetTable = self.__mFanoutOffset + 1024 + 24 * self.__mCount
+    start = offsetTable + 4 * aIndex
+    offset = struct.unpack('>I', self.__mIdx[start:start + 4])[0]
+    if offset & 0x80000000:
+      largeStart = offsetTable + 4 * self.__mCount + 8 * (offset & 0x7fffffff)
+      offset = struct.unpack('>Q', self.__mIdx[largeStart:largeStart + 8])[0]
+    return offset
+
+  def __readEntryHeader(self, aOffset):
+    """
+    Decode the type and size header of a packfile entry.
+
+    :return: A (type, data offset) tuple.
+    """
+    position = aOffset
+    byte = bytearray(self.__mPack[position:position + 1])[0]
+    objectType = (byte >> 4) & 0x7
+    while byte & 0x80:
+      position += 1
+      byte = bytearray(self.__mPack[position:position + 1])[0]
+    return (objectType, position + 1)
+
+  def __readOffsetDelta(self, aOffset):
+    """
+    Decode the (negative) base distance of an OFS_DELTA entry.
+
+    :return: A (distance, data offset) tuple.
+    """
+    position = aOffset
+    byte = bytearray(self.__mPack[position:position + 1])[0]
+    distance = byte & 0x7f
+    while byte & 0x80:
+      position += 1
+      byte = bytearray(self.__mPack[position:position + 1])[0]
+      distance = ((distance + 1) << 7) | (byte & 0x7f)
+    return (distance, position + 1)
+
+  def __inflate(self, aOffset, aFull):
+    """
+    Inflate zlib-compressed data starting at a given offset in the packfile.
+    """
+    state = {'position': aOffset}
+    def readChunk(aSize):
+      start = state['position']
+      state['position'] = start + aSize
+      return self.__mPack[start:start + aSize]
+
+    if aFull:
+      return inflate(readChunk)
+    return inflateCommitHeader(readChunk)
+
+def inflate(aReadChunk):
+  """
+  Inflate an entire zlib stream, reading compressed data in chunks from a given
+  callable.
+  """
+  decompressor = zlib.decompressobj()
+  parts = []
+  while not decompressor.unused_data:
+    chunk = aReadChunk(ObjectReader.CHUNK_SIZE)
+    if not chunk:
+      break
+    parts.append(decompressor.decompress(chunk))
+    if decompressor.unused_data or len(chunk) < ObjectReader.CHUNK_SIZE:
+      break
+  parts.append(decompressor.flush())
+  return b''.join(parts)
+
+def inflateCommitHeader(aReadChunk):
+  """
+  Inflate a zlib stream only as far as is necessary to include the end of a
+  commit header (i.e. the first blank line). Since the committer line is the
+  last mandatory header field, this avoids inflating long commit messages.
+  """
+  decompressor = zlib.decompressobj()
+  data = b''
+  while b'\n\n' not in data:
+    chunk = aReadChunk(ObjectReader.CHUNK_SIZE)
+    if not chunk:
+      break
+    data += decompressor.decompress(chunk)
+    if decompressor.unused_data or len(chunk) < ObjectReader.CHUNK_SIZE:
+      data += decompressor.flush()
+      break
+  return data
+
+def applyDelta(aBaseData, aDelta):
+  """
+  Reconstruct an object from its base and a git delta.
+
+  :param aBaseData: The full contents of the base object.
+  :param aDelta: The inflated delta data.
+
+  :return: The full contents of the reconstructed object.
+  """
+  delta = bytearray(aDelta)
+  position = 0
+
+  # Skip the base size and result size, which are stored as varints.
+  for varint in range(2):
+    while delta[position] & 0x80:
+      position += 1
+    position += 1
+
+  result = []
+  while position < len(delta):
+    opcode = delta[position]
+    position += 1
+    if opcode & 0x80:
+      copyOffset = 0
+      copySize = 0
+      for shift in range(4):
+        if opcode & (1 << shift):
+          copyOffset |= delta[position] << (8 * shift)
+          position += 1
+      for shift in range(3):
+        if opcode & (0x10 << shift):
+          copySize |= delta[position] << (8 * shift)
+          position += 1
+      if copySize == 0:
+        copySize = 0x10000
+      result.append(aBaseData[copyOffset:copyOffset + copySize])
+    elif opcode:
+      result.append(bytes(delta[position:position + opcode]))
+      position += opcode
+    else:
+      raise ValueError('Invalid delta opcode 0')
+  return b''.join(result)
+
+def parseCommitHeader(aData):
+  """
+  Parse the header fields of a commit object's body.
+
+  :return: A dictionary mapping each header field name to its raw value.
+           The 'parent' field, if present, is a list of parent shas.
+  """
+  end = aData.find(b'\n\n')
+  if end >= 0:
+    aData = aData[:end]
+
+  header = {}
+  for line in aData.split(b'\n'):
+    # Skip continuation lines of multi-line fields, such as gpgsig.
+    if not line or line.startswith(b' '):
+      continue
+
+    parts = line.split(b' ', 1)
+    if len(parts) != 2:
+      continue
+
+    (key, value) = parts
+    if key == 'parent':
+      header.setdefault('parent', []).append(value)
+    elif key not in header:
+      header[key] = value
+  return header
+
+def parseIdentity(aIdentity):
+  """
+  Parse an identity line of a commit (e.g. the value of an 'author' or
+  'committer' header field) of the form 'Name <email> <epoch> <tz>'.
+
+  :return: A (name <email>, epoch) tuple.
+  """
+  parts = aIdentity.rsplit(' ', 2)
+  if len(parts) != 3:
+    return (aIdentity, None)
+
+  (identity, epoch, tzOffset) = parts
+  try:
+    return (identity, int(epoch))
+  except ValueError:
+    return (identity, None)
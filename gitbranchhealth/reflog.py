@@ -0,0 +1,84 @@
+# reflog.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for reading the time of the last update of refs from a git
+# repository's reflogs, without spawning any git subprocesses.
+
+import os
+import os.path
+
+from refs import findCommonDir
+
+class ReflogReader:
+  """
+  Object used to read the time at which refs were last updated (e.g. committed
+  to, rebased, fetched or pushed) from their reflogs in 'logs/'. Only the last
+  entry of each reflog is read, by seeking to the end of the file, so the cost
+  doesn't depend on the length of the reflog.
+  """
+
+  # Amount of data to read at a time, backwards from the end of a reflog, while
+  # looking for the start of its last entry.
+  BLOCK_SIZE = 1024
+
+  def __init__(self, aGitDir):
+    """
+    Create a new ReflogReader instance.
+
+    :param aGitDir: The path to the git directory (e.g. '<repo>/.git') of the
+                    repository whose reflogs should be read.
+    """
+    self.__mLogsDir = os.path.join(findCommonDir(aGitDir), 'logs')
+
+  def readLastUpdateTime(self, aRefPath):
+    """
+    Retrieve the time of the last update of a ref, according to its reflog.
+
+    :param aRefPath: The full path of the ref (e.g. 'refs/heads/master').
+
+    :return: The time of the last update, in seconds since the epoch (UTC), or
+             None if the ref has no (readable) reflog.
+    """
+    line = self.__readLastLine(os.path.join(self.__mLogsDir, *aRefPath.split('/')))
+    if line is None:
+      return None
+
+    # Each entry is '<old sha> <new sha> Name <email> <epoch> <tz>\t<message>'.
+    parts = line.split(b'\t', 1)[0].rsplit(b' ', 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+      return None
+    return int(parts[1])
+
+  ## Private API ##
+
+  def __readLastLine(self, aPath):
+    """
+    Read the last (non-empty) line of a file, reading backwards from its end
+    one block at a time.
+    """
+    try:
+      handle = open(aPath, 'rb')
+    except IOError:
+      return None
+
+    try:
+      handle.seek(0, os.SEEK_END)
+      end = handle.tell()
+      position = end
+      data = b''
+      while position > 0:
+        blockSize = min(ReflogReader.BLOCK_SIZE, position)
+        position -= blockSize
+        handle.seek(position)
+        data = handle.read(blockSize) + data
+
+        # The last line is complete once a newline is found before it.
+        stripped = data.rstrip(b'\n')
+        start = stripped.rfind(b'\n')
+        if start >= 0:
+          return stripped[start + 1:]
+
+      return data.rstrip(b'\n') or None
+    finally:
+      handle.close()
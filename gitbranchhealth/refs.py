@@ -0,0 +1,406 @@
+# refs.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for reading refs directly from a git repository's on-disk storage,
+# without spawning any git subprocesses.
+
+import hashlib
+import mmap
+import os
+import os.path
+import re
+
+from ignore import GLOB_CHARACTERS, translateGlob
+from util import encodeText
+
+def findCommonDir(aGitDir):
+  """
+  Retrieve the directory in which refs and objects are stored for a given git
+  directory. For linked worktrees this is the main repository's git directory,
+  as named by the 'commondir' file; for all other repositories it is the git
+  directory itself.
+  """
+  commonDirFile = os.path.join(aGitDir, 'commondir')
+  if not os.path.isfile(commonDirFile):
+    return aGitDir
+
+  with open(commonDirFile, 'r') as commonDirHandle:
+    commonDir = commonDirHandle.read().strip()
+  return os.path.normpath(os.path.join(aGitDir, commonDir))
+
+def findCheckedOutBranches(aGitDir):
+  """
+  Retrieve the paths of the branches checked out in a repository and in each of
+  its linked worktrees, by reading their HEAD files.
+
+  :param aGitDir: The path to the git directory of the repository.
+
+  :return: A set of ref paths (e.g. 'refs/heads/master').
+  """
+  commonDir = findCommonDir(aGitDir)
+
+  headFiles = [os.path.join(aGitDir, 'HEAD'), os.path.join(commonDir, 'HEAD')]
+  worktreesDir = os.path.join(commonDir, 'worktrees')
+  if os.path.isdir(worktreesDir):
+    for worktree in os.listdir(worktreesDir):
+      headFiles.append(os.path.join(worktreesDir, worktree, 'HEAD'))
+
+  checkedOut = set()
+  for headFile in headFiles:
+    try:
+      with open(headFile, 'r') as headHandle:
+        head = headHandle.read().strip()
+    except IOError:
+      continue
+    if head.startswith('ref:'):
+      checkedOut.add(head[len('ref:'):].strip())
+  return checkedOut
+
+def getRefPatternBase(aRefPattern):
+  """
+  Retrieve the ref namespace that contains every ref matched by a ref pattern:
+  the pattern itself if it has no glob characters, or else the path segments
+  before the first segment with a glob character (e.g. 'refs/heads/feature'
+  for 'refs/heads/feature/*-wip').
+
+  :param aRefPattern: A ref pattern, as accepted by 'git for-each-ref'.
+
+  :return: A ref namespace, without a trailing slash.
+  """
+  segments = []
+  for segment in aRefPattern.rstrip('/').split('/'):
+    if any([x in segment for x in GLOB_CHARACTERS]):
+      break
+    segments.append(segment)
+  return '/'.join(segments)
+
+def createRefPatternMatcher(aRefPattern):
+  """
+  Create a function that determines whether a ref path matches a ref pattern,
+  in the same way as 'git for-each-ref' does: either the pattern is a glob (in
+  which '*' doesn't match '/'), or it is a literal namespace, which matches
+  itself and every ref below it.
+
+  :param aRefPattern: A ref pattern (e.g. 'refs/heads' or 'refs/heads/feature/*').
+
+  :return: A function taking a ref path, and returning True if it matches.
+  """
+  prefix = aRefPattern
+  if not prefix.endswith('/'):
+    prefix += '/'
+  regex = re.compile('^(?:' + translateGlob(aRefPattern) + ')$')
+
+  def matches(aPath):
+    return aPath == aRefPattern or aPath.startswith(prefix) or regex.match(aPath) is not None
+
+  return matches
+
+class PackedRefs:
+  """
+  A memory-mapped packed-refs file. If the file's header declares that it is
+  sorted (as every packed-refs file written by git since 2.0 is), refs are
+  located by binary searching the file, so finding all refs with a given prefix
+  costs O(log n + k) for k matching refs, and none of the other refs are ever
+  parsed. Otherwise, the whole file is scanned.
+  """
+
+  HEADER = b'# pack-refs with:'
+
+  def __init__(self, aPath):
+    """
+    Open a packed-refs file. If it doesn't exist, the resulting object is empty.
+
+    :param aPath: The path to the packed-refs file.
+    """
+    self.__mData = b''
+    self.__mStart = 0
+    self.__mIsSorted = False
+
+    try:
+      with open(aPath, 'rb') as packedRefsHandle:
+        self.__mData = mmap.mmap(packedRefsHandle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, ValueError, EnvironmentError):
+      # The file doesn't exist, or is empty (which can't be mapped).
+      return
+
+    if self.__mData[:len(PackedRefs.HEADER)] == PackedRefs.HEADER:
+      headerEnd = self.__mData.find(b'\n')
+      if headerEnd < 0:
+        headerEnd = len(self.__mData)
+      traits = self.__mData[len(PackedRefs.HEADER):headerEnd].split()
+      self.__mIsSorted = b'sorted' in traits
+      self.__mStart = min(headerEnd + 1, len(self.__mData))
+
+  def isSorted(self):
+    return self.__mIsSorted
+
+  def iterPrefix(self, aPrefix):
+    """
+    Enumerate the refs whose paths start with a given prefix.
+
+    :param aPrefix: A string prefix of ref paths (e.g. 'refs/heads/').
+
+    :return: A generator of (path, sha) tuples, in the order of the file.
+    """
+    key = aPrefix
+    offset = self.__mStart
+    if self.__mIsSorted:
+      offset = self.__findFirstRecord(key)
+
+    while offset < len(self.__mData):
+      (path, sha, offset) = self.__readRecord(offset)
+      if path is None:
+        continue
+      if path.startswith(key):
+        yield (path, sha)
+      elif self.__mIsSorted:
+        return
+
+  def lookup(self, aRefPath):
+    """
+    Retrieve the sha of a single packed ref.
+
+    :param aRefPath: The full path of the ref (e.g. 'refs/heads/master').
+
+    :return: The hex sha of the ref, or None if it isn't packed.
+    """
+    key = aRefPath
+    offset = self.__mStart
+    if self.__mIsSorted:
+      offset = self.__findFirstRecord(key)
+
+    while offset < len(self.__mData):
+      (path, sha, offset) = self.__readRecord(offset)
+      if path == key:
+        return sha
+      elif self.__mIsSorted and path is not None:
+        return None
+    return None
+
+  ## Private API ##
+
+  def __findFirstRecord(self, aKey):
+    """
+    Binary search a sorted packed-refs file for the first record whose path is
+    not less than a given key.
+
+    :return: The offset of the record, or the length of the file if there is
+             none.
+    """
+    low = self.__mStart
+    high = len(self.__mData)
+    while low < high:
+      recordStart = self.__findRecordStart((low + high) // 2)
+      (path, sha, recordEnd) = self.__readRecord(recordStart)
+      if path is not None and path < aKey:
+        low = recordEnd
+      else:
+        high = recordStart
+    return low
+
+  def __findRecordStart(self, aOffset):
+    """
+    Find the start of the record containing a given offset. The peeled value of
+    an annotated tag ('^<sha>') is part of the record of the tag before it.
+    """
+    start = max(self.__mStart, self.__mData.rfind(b'\n', self.__mStart, aOffset) + 1)
+    while start > self.__mStart and self.__mData[start:start + 1] == b'^':
+      start = max(self.__mStart, self.__mData.rfind(b'\n', self.__mStart, start - 1) + 1)
+    return start
+
+  def __readRecord(self, aOffset):
+    """
+    Read the record at a given offset, along with any peeled value following
+    it.
+
+    :return: A (path, sha, next offset) tuple, where path and sha are None if
+             the record couldn't be parsed.
+    """
+    data = self.__mData
+    end = data.find(b'\n', aOffset)
+    if end < 0:
+      end = len(data)
+    line = data[aOffset:end].rstrip(b'\r')
+
+    nextOffset = end + 1
+    while data[nextOffset:nextOffset + 1] == b'^':
+      nextOffset = data.find(b'\n', nextOffset)
+      if nextOffset < 0:
+        nextOffset = len(data)
+      nextOffset += 1
+
+    parts = line.split(b' ', 1)
+    if len(parts) != 2 or line.startswith(b'#') or line.startswith(b'^'):
+      return (None, None, nextOffset)
+    return (parts[1], parts[0], nextOffset)
+
+class RefReader:
+  """
+  Object used to enumerate refs by reading loose ref files and the packed-refs
+  file directly. Loose refs take precedence over packed refs of the same name,
+  exactly as they do within git itself.
+  """
+
+  # Maximum number of symbolic ref hops to follow before giving up.
+  MAX_SYMREF_DEPTH = 5
+
+  def __init__(self, aGitDir):
+    """
+    Create a new RefReader instance.
+
+    :param aGitDir: The path to the git directory (e.g. '<repo>/.git') of the
+                    repository to read refs from.
+    """
+    self.__mGitDir = findCommonDir(aGitDir)
+    self.__mPackedRefs = None
+
+  def readRefs(self, aRefPrefixes):
+    """
+    Retrieve the path and tip sha of every ref that lives under one of the given
+    ref prefixes. Symbolic refs are resolved to the sha of the ref they point to.
+
+    :param aRefPrefixes: A list of ref namespaces (e.g. 'refs/heads' or
+                         'refs/remotes/origin') or ref patterns (e.g.
+                         'refs/heads/feature/*') to enumerate. Only the loose
+                         refs below the namespace of each pattern (see
+                         getRefPatternBase()) are listed, and refs that don't
+                         match are never resolved.
+
+    :return: A list of (path, sha) tuples. Refs are grouped in the order of
+             aRefPrefixes, and are sorted by path within each group. A ref
+             matching several prefixes is only included in the first group.
+    """
+    refs = []
+    seen = set()
+    for prefix in aRefPrefixes:
+      matches = createRefPatternMatcher(prefix)
+      found = {}
+
+      base = getRefPatternBase(prefix)
+      for (path, sha) in self.__getPackedRefs().iterPrefix(base):
+        if matches(path):
+          found[path] = sha
+
+      for path in self.__listLooseRefs(base):
+        if not matches(path):
+          continue
+        value = self.__readLooseRef(path)
+        if value is not None:
+          found[path] = value
+
+      for path in sorted(found.keys()):
+        if path in seen:
+          continue
+        sha = self.__peelSymbolicRef(found[path])
+        if sha:
+          seen.add(path)
+          refs.append((path, sha))
+    return refs
+
+  def computeFingerprint(self, aRefPrefixes, aSettings=[]):
+    """
+    Compute a fingerprint of the state of the refs in the given namespaces. The
+    fingerprint covers the modification time, size and inode of the
+    packed-refs file, and the path and contents of every loose ref in the
+    namespaces. It is cheap to compute, as no ref is resolved and packed-refs is
+    not read.
+
+    :param aRefPrefixes: A list of ref namespaces (or ref patterns) to include.
+    :param aSettings: A list of additional strings (e.g. the options of the
+                      current run) to include in the fingerprint.
+
+    :return: A hex string that changes whenever any of the refs change.
+    """
+    # Ref paths are hashed as the raw bytes read from the file system, so that
+    # names that aren't ASCII are never decoded.
+    digest = hashlib.sha1()
+    for setting in list(aSettings) + list(aRefPrefixes):
+      digest.update(b'setting ' + encodeText(setting) + b'\n')
+
+    packedRefsPath = os.path.join(self.__mGitDir, 'packed-refs')
+    try:
+      packedStat = os.stat(packedRefsPath)
+      packedState = '%r %d %d' % (packedStat.st_mtime, packedStat.st_size, packedStat.st_ino)
+    except OSError:
+      packedState = 'none'
+    digest.update(b'packed-refs ' + packedState + b'\n')
+
+    for prefix in aRefPrefixes:
+      for path in sorted(self.__listLooseRefs(getRefPatternBase(prefix))):
+        digest.update(b'loose ' + path + b' ' + str(self.__readLooseRef(path)) + b'\n')
+    return digest.hexdigest()
+
+  def readRef(self, aRefPath):
+    """
+    Retrieve the sha a single ref points to, following symbolic refs.
+
+    :param aRefPath: The full path of the ref (e.g. 'refs/heads/master').
+
+    :return: The hex sha of the ref, or None if it does not exist.
+    """
+    return self.__peelSymbolicRef('ref: ' + aRefPath)
+
+  ## Private API ##
+
+  def __getPackedRefs(self):
+    """
+    Retrieve the :class:`PackedRefs` of the repository, which is opened once per
+    RefReader.
+    """
+    if self.__mPackedRefs is None:
+      self.__mPackedRefs = PackedRefs(os.path.join(self.__mGitDir, 'packed-refs'))
+    return self.__mPackedRefs
+
+  def __listLooseRefs(self, aPrefix):
+    """
+    Retrieve the paths of all loose refs below a given ref namespace.
+    """
+    paths = []
+    prefixDir = os.path.join(self.__mGitDir, *aPrefix.split('/'))
+    if os.path.isfile(prefixDir):
+      return [aPrefix]
+
+    for (root, dirs, files) in os.walk(prefixDir):
+      relativeRoot = os.path.relpath(root, self.__mGitDir).replace(os.sep, '/')
+      for fileName in files:
+        # Skip lock files left behind by in-flight ref updates.
+        if fileName.endswith('.lock'):
+          continue
+        paths.append(relativeRoot + '/' + fileName)
+    return paths
+
+  def __readLooseRef(self, aRefPath):
+    """
+    Read the raw value (a sha or a 'ref: <path>' string) of a loose ref.
+    """
+    refFile = os.path.join(self.__mGitDir, *aRefPath.split('/'))
+    try:
+      with open(refFile, 'r') as refHandle:
+        return refHandle.read().strip()
+    except IOError:
+      return None
+
+  def __lookupRef(self, aRefPath):
+    """
+    Read the raw value of a ref, whether it is loose or packed.
+    """
+    value = self.__readLooseRef(aRefPath)
+    if value is not None:
+      return value
+
+    return self.__getPackedRefs().lookup(aRefPath)
+
+  def __peelSymbolicRef(self, aValue):
+    """
+    Follow a chain of symbolic refs until a sha is reached.
+
+    :return: The hex sha at the end of the chain, or None if the chain is broken
+             or too deep.
+    """
+    value = aValue
+    for depth in range(RefReader.MAX_SYMREF_DEPTH):
+      if value is None or not value.startswith('ref:'):
+        return value
+      value = self.__lookupRef(value[len('ref:'):].strip())
+    return None
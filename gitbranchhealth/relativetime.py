@@ -0,0 +1,71 @@
+# relativetime.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for formatting the time since the last activity on branches within
+# git-branchhealth.
+
+# Units of time, in the same order, and with the same lengths, as those used by
+# babel.dates.format_timedelta(). They're repeated here so that babel, which is
+# slow to import, is only imported once something actually needs formatting.
+TIMEDELTA_UNITS = (
+  ('year', 3600 * 24 * 365),
+  ('month', 3600 * 24 * 30),
+  ('week', 3600 * 24 * 7),
+  ('day', 3600 * 24),
+  ('hour', 3600),
+  ('minute', 60),
+  ('second', 1)
+)
+
+# The default threshold used by babel.dates.format_timedelta(): the fraction of
+# a unit after which a duration is presented in that unit, rather than the next
+# smaller one.
+THRESHOLD = 0.85
+
+# Formatted durations, keyed by (unit, value, locale).
+__formattedDurations = {}
+
+def findBucket(aSeconds):
+  """
+  Determine how babel.dates.format_timedelta() presents a duration with its
+  default arguments, e.g. ('week', 3) for any duration that it formats as
+  '3 weeks'. Any two durations in the same bucket are formatted identically.
+
+  :param aSeconds: The duration, in seconds.
+
+  :return: A (unit, value) tuple.
+  """
+  seconds = abs(aSeconds)
+  for (unit, secondsPerUnit) in TIMEDELTA_UNITS:
+    value = float(seconds) / secondsPerUnit
+    if value >= THRESHOLD or unit == 'second':
+      if unit == 'second' and value > 0:
+        value = max(1, value)
+      return (unit, int(round(value)))
+
+def formatRelativeTime(aSeconds, aLocale=None):
+  """
+  Format the time since an event as a human-readable string (e.g. '3 weeks
+  ago'). The output is exactly that of babel.dates.format_timedelta(), but as
+  there are only a handful of distinct strings for any realistic set of
+  branches, each one is only formatted once, and then reused.
+
+  :param aSeconds: The number of seconds since the event.
+  :param aLocale: The babel locale identifier to format with. Defaults to the
+                  locale babel uses for times (i.e. from LC_TIME or LANG).
+
+  :return: The formatted string.
+  """
+  import babel.dates
+
+  if aLocale is None:
+    aLocale = babel.dates.LC_TIME
+
+  (unit, value) = findBucket(aSeconds)
+  key = (unit, value, aLocale)
+  formatted = __formattedDurations.get(key)
+  if formatted is None:
+    formatted = babel.dates.format_timedelta(aSeconds, locale=aLocale) + " ago"
+    __formattedDurations[key] = formatted
+  return formatted
@@ -0,0 +1,419 @@
+# resolver.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for resolving the last activity of many refs at once within
+# git-branchhealth.
+
+import calendar
+from datetime import datetime
+import tempfile
+
+from cache import CommitDateCache
+from commitgraph import CommitGraph
+from objects import ObjectReader, parseIdentity
+from reflog import ReflogReader
+from refs import RefReader, createRefPatternMatcher
+from util import encodeText
+
+class ActivityResolver:
+  """
+  Object used to resolve the tip commit and date of last activity for a set of
+  refs in bulk. Rather than running one 'git log' per branch, a single
+  'git for-each-ref' call is made for all requested ref namespaces, so the
+  number of subprocesses does not depend on the number of branches.
+
+  The date of last activity is the author date of each tip commit, unless the
+  configuration selects the committer date (or the reflog) instead. Commit
+  dates are looked up in a persistent cache of previously resolved commits,
+  and only then by parsing commit objects. The repository's commit-graph, if
+  it has one, stores committer dates only, so it is only consulted (between
+  the cache and the commit objects) when committer dates are selected; it
+  doesn't speed up the default author dates.
+
+  If the configuration selects the 'native' backend, refs and commits are read
+  directly from the repository's on-disk storage, and no subprocesses are
+  spawned at all.
+  """
+
+  # Machine-readable output: '<sha> <epoch> <tz offset> <ref path>', for each
+  # kind of commit date. The raw date format is used (rather than :unix) so
+  # that older versions of git are supported.
+  FORMATS = {
+    'author': '%(objectname) %(authordate:raw) %(refname)',
+    'committer': '%(objectname) %(committerdate:raw) %(refname)'
+  }
+
+  # Appended to a format to also output the author and committer of the tip
+  # commit, each separated by a NUL byte (which can't occur in ref paths or
+  # identities).
+  IDENTITY_SUFFIX = '%00%(authorname) %(authoremail)%00%(committername) %(committeremail)'
+
+  # The 'git log' format of each kind of commit date.
+  LOG_FORMATS = {'author': '%at', 'committer': '%ct'}
+
+  def __init__(self, aConfig, aProcessRunner=None):
+    """
+    Create a new ActivityResolver instance.
+
+    :param aConfig: The :class:`config.BranchHealthConfig` object containing the
+                    configuration options for the new instance.
+    :param aProcessRunner: If given, the function used to start git processes,
+                           instead of GitPython (e.g. so that they can be timed
+                           out and killed). It is called with the arguments to
+                           git (e.g. ['for-each-ref', ...]) and a file to use
+                           as stdin (or None), and returns an object with a
+                           'stdout' stream and a 'wait()' method, such as a
+                           subprocess.Popen object.
+    """
+    self.__mConfig = aConfig
+    self.__mProcessRunner = aProcessRunner
+
+  def resolve(self, aRefPrefixes):
+    """
+    Retrieve the tip commit and last activity date of every ref that lives
+    under one of the given ref prefixes.
+
+    :param aRefPrefixes: A list of ref namespaces (e.g. 'refs/heads' or
+                         'refs/remotes/origin') or ref patterns (e.g.
+                         'refs/heads/feature/*') to resolve.
+
+    :return: A list of (path, sha, epoch) tuples, where epoch is the author
+             (or committer) timestamp of the tip commit, or the time of the
+             last update of the ref (see iterResolve()), in seconds since the
+             epoch (UTC). Refs are grouped in the order of aRefPrefixes, and
+             are sorted by path within each group.
+    """
+    return self.__groupByPrefix(sorted(self.iterResolve(aRefPrefixes)), aRefPrefixes)
+
+  def iterResolve(self, aRefPrefixes):
+    """
+    Resolve refs in the same way as resolve(), but yield each one as soon as it
+    has been resolved, in no particular order. Refs whose dates can be found
+    without git's help (i.e. in the cache or the commit-graph, or any ref when
+    using the native backend) are yielded while refs are still being
+    enumerated; the remaining refs are resolved in a single batch at the end.
+    The date of each distinct tip commit is only resolved once, no matter how
+    many refs point to it.
+
+    If the configuration selects the reflog (or the later of the reflog and
+    the tip commit) as the source of activity, the epoch of each ref is taken
+    from the last entry of its reflog instead, where it has one.
+
+    :param aRefPrefixes: A list of ref namespaces to resolve.
+
+    :return: A generator of (path, sha, epoch) tuples.
+    """
+    selectActivity = self.__createActivitySelector()
+    for (path, sha, epoch) in self.__iterCommitTimes(aRefPrefixes):
+      if selectActivity:
+        epoch = selectActivity(path, epoch)
+      yield (path, sha, epoch)
+
+  def iterResolveIdentities(self, aRefPrefixes):
+    """
+    Resolve refs in the same way as iterResolve(), but also retrieve the author
+    and committer of each tip commit, in the same batched pass. With the git
+    backend, this is a single call to 'git for-each-ref'; with the native
+    backend, each distinct tip commit is read once from the object database.
+    The commit date cache and the commit-graph don't store identities, so they
+    aren't used.
+
+    :param aRefPrefixes: A list of ref namespaces or ref patterns to resolve.
+
+    :return: A generator of (path, sha, epoch, author, committer) tuples, in no
+             particular order, where author and committer are of the form
+             'Name <email>'.
+    """
+    selectActivity = self.__createActivitySelector()
+    for (path, sha, epoch, author, committer) in self.__iterCommitIdentities(aRefPrefixes):
+      if selectActivity:
+        epoch = selectActivity(path, epoch)
+      yield (path, sha, epoch, author, committer)
+
+  def iterRefs(self, aRefPrefixes):
+    """
+    Enumerate the path and tip sha of every ref in the given namespaces, without
+    resolving any dates. With the git backend, this is a single call to
+    'git for-each-ref', whose output is consumed as it is produced. Ref patterns
+    are passed on to git (or :class:`refs.RefReader`), so refs that don't match
+    them are never enumerated at all.
+
+    :param aRefPrefixes: A list of ref namespaces or ref patterns to enumerate.
+
+    :return: A generator of (path, sha) tuples.
+    """
+    if self.__mConfig.getBackend() == 'native':
+      for ref in RefReader(self.__mConfig.getGitDir()).readRefs(aRefPrefixes):
+        yield ref
+      return
+
+    for line in self.__iterForEachRef('%(objectname) %(refname)', aRefPrefixes):
+      parts = line.split(' ', 1)
+      if len(parts) == 2:
+        yield (parts[1], parts[0])
+
+  ## Private API ##
+
+  def __createActivitySelector(self):
+    """
+    Create the function used to select the date of last activity on a ref,
+    given its path and the date of its tip commit, according to the configured
+    activity source.
+
+    :return: A function taking a ref path and the epoch of its tip commit and
+             returning the epoch of last activity, or None if the epoch of the
+             tip commit is used as is.
+    """
+    activitySource = self.__mConfig.getActivitySource()
+    if activitySource not in ['reflog', 'max']:
+      return None
+
+    reflogReader = ReflogReader(self.__mConfig.getGitDir())
+
+    def selectActivity(aPath, aCommitEpoch):
+      reflogEpoch = reflogReader.readLastUpdateTime(aPath)
+      if reflogEpoch is None:
+        return aCommitEpoch
+      elif activitySource == 'max':
+        return max(reflogEpoch, aCommitEpoch)
+      return reflogEpoch
+
+    return selectActivity
+
+  def __iterCommitTimes(self, aRefPrefixes):
+    """
+    Resolve the tip commit and author (or committer) timestamp of every ref in
+    the given namespaces, as described by iterResolve().
+    """
+    if not aRefPrefixes:
+      return
+
+    gitDir = self.__mConfig.getGitDir()
+    dateField = self.__mConfig.getCommitDateField()
+    isNative = self.__mConfig.getBackend() == 'native'
+    cache = None
+    if self.__mConfig.shouldUseCache():
+      cache = CommitDateCache(gitDir, aLog=self.__mConfig.getLog(), aDateField=dateField)
+
+    # The commit-graph only stores committer dates.
+    commitGraph = None
+    if dateField == 'committer':
+      commitGraph = CommitGraph(gitDir)
+      if not commitGraph.isAvailable():
+        commitGraph.close()
+        commitGraph = None
+
+    objectReader = None
+    if isNative:
+      objectReader = ObjectReader(gitDir)
+
+    try:
+      if not isNative and not cache and not commitGraph:
+        # Nothing can be looked up without git's help, so let git resolve the
+        # refs and their dates in one go.
+        for line in self.__iterForEachRef(ActivityResolver.FORMATS[dateField], aRefPrefixes):
+          parsed = self.__parseLine(line)
+          if parsed:
+            yield parsed
+        return
+
+      # Many refs usually share a tip (e.g. a local branch and its
+      # remote-tracking branches), so each distinct tip is only looked up once.
+      tipEpochs = {}
+      missingRefs = []
+      for (path, sha) in self.iterRefs(aRefPrefixes):
+        if sha in tipEpochs:
+          epoch = tipEpochs[sha]
+        else:
+          epoch = self.__lookupCommitTime(sha, dateField, cache, commitGraph, objectReader)
+          tipEpochs[sha] = epoch
+
+        if epoch is not None:
+          yield (path, sha, epoch)
+        elif objectReader:
+          self.__mConfig.getLog().debug("Skipping ref that does not point to a commit: " + path)
+        else:
+          missingRefs.append((path, sha))
+
+      missingEpochs = self.__readCommitTimesWithGit(set([sha for (path, sha) in missingRefs]), dateField)
+      for (path, sha) in missingRefs:
+        epoch = missingEpochs.get(sha)
+        if epoch is None:
+          self.__mConfig.getLog().debug("Skipping ref that does not point to a commit: " + path)
+          continue
+
+        if cache:
+          cache.put(sha, epoch)
+        yield (path, sha, epoch)
+    finally:
+      if objectReader:
+        objectReader.close()
+      if commitGraph:
+        commitGraph.close()
+      if cache:
+        cache.save()
+
+  def __iterCommitIdentities(self, aRefPrefixes):
+    """
+    Resolve the tip commit, author (or committer) timestamp, author and
+    committer of every ref in the given namespaces, as described by
+    iterResolveIdentities().
+    """
+    if not aRefPrefixes:
+      return
+
+    dateField = self.__mConfig.getCommitDateField()
+    if self.__mConfig.getBackend() != 'native':
+      identityFormat = ActivityResolver.FORMATS[dateField] + ActivityResolver.IDENTITY_SUFFIX
+      for line in self.__iterForEachRef(identityFormat, aRefPrefixes):
+        fields = line.split('\0')
+        parsed = self.__parseLine(fields[0])
+        if parsed and len(fields) == 3:
+          yield parsed + (fields[1], fields[2])
+      return
+
+    objectReader = ObjectReader(self.__mConfig.getGitDir())
+    try:
+      tipIdentities = {}
+      for (path, sha) in self.iterRefs(aRefPrefixes):
+        if sha not in tipIdentities:
+          header = objectReader.readCommitHeader(sha)
+          tipIdentities[sha] = None
+          if header and 'author' in header and 'committer' in header:
+            (author, authorEpoch) = parseIdentity(header['author'])
+            (committer, committerEpoch) = parseIdentity(header['committer'])
+            epoch = committerEpoch if dateField == 'committer' else authorEpoch
+            if epoch is not None:
+              tipIdentities[sha] = (epoch, author, committer)
+
+        if tipIdentities[sha] is None:
+          self.__mConfig.getLog().debug("Skipping ref that does not point to a commit: " + path)
+          continue
+
+        (epoch, author, committer) = tipIdentities[sha]
+        yield (path, sha, epoch, author, committer)
+    finally:
+      objectReader.close()
+
+  def __lookupCommitTime(self, aSha, aDateField, aCache, aCommitGraph, aObjectReader):
+    """
+    Look up the author (or committer) timestamp of a commit without git's help:
+    in the cache, then in the commit-graph (if given), and then (with the
+    native backend) in the commit object itself.
+
+    :return: The timestamp, or None if it couldn't be found.
+    """
+    epoch = None
+    if aCache:
+      epoch = aCache.get(aSha)
+    if epoch is None and aCommitGraph:
+      epoch = aCommitGraph.getCommitTime(aSha)
+    if epoch is None and aObjectReader:
+      epoch = aObjectReader.readCommitTime(aSha, aDateField)
+      if epoch is not None and aCache:
+        aCache.put(aSha, epoch)
+    return epoch
+
+  def __iterForEachRef(self, aFormat, aRefPrefixes):
+    """
+    Run 'git for-each-ref' with a given format over the given namespaces, and
+    yield each line of its output as it is produced.
+    """
+    arguments = ['--format=' + aFormat] + list(aRefPrefixes)
+    if self.__mProcessRunner:
+      process = self.__mProcessRunner(['for-each-ref'] + arguments, None)
+    else:
+      process = self.__mConfig.getRepo().git.for_each_ref(*arguments, as_process=True)
+    for line in process.stdout:
+      yield line.rstrip('\n')
+    process.wait()
+
+  def __readCommitTimesWithGit(self, aShas, aDateField):
+    """
+    Retrieve the author (or committer) timestamps of a set of commits with one
+    call to git. The shas are passed on stdin, so that any number of them can
+    be resolved.
+
+    :return: A dictionary mapping each sha to its timestamp.
+    """
+    if not aShas:
+      return {}
+
+    shaFile = tempfile.TemporaryFile()
+    try:
+      shaFile.write(('\n'.join(aShas) + '\n').encode('ascii'))
+      shaFile.seek(0)
+      arguments = ['--no-walk=unsorted', '--stdin', '--format=%H ' + ActivityResolver.LOG_FORMATS[aDateField]]
+      if self.__mProcessRunner:
+        process = self.__mProcessRunner(['log'] + arguments, shaFile)
+        output = process.stdout.read()
+        process.wait()
+      else:
+        output = encodeText(self.__mConfig.getRepo().git.log(*arguments, istream=shaFile))
+    finally:
+      shaFile.close()
+
+    epochs = {}
+    for line in output.splitlines():
+      parts = line.split(' ')
+      if len(parts) == 2 and parts[1].isdigit():
+        epochs[parts[0]] = int(parts[1])
+    return epochs
+
+  def __groupByPrefix(self, aResolved, aRefPrefixes):
+    """
+    Reorder a list of resolved refs (whose first element is the ref path) so
+    that they are grouped in the order of aRefPrefixes. Refs keep their
+    relative order within each group.
+    """
+    buckets = [[] for prefix in aRefPrefixes]
+    matchers = [createRefPatternMatcher(x) for x in aRefPrefixes]
+    for entry in aResolved:
+      index = self.__findPrefixIndex(entry[0], matchers)
+      if index is not None:
+        buckets[index].append(entry)
+
+    grouped = []
+    for bucket in buckets:
+      grouped.extend(bucket)
+    return grouped
+
+  def __parseLine(self, aLine):
+    """
+    Parse a single line of 'git for-each-ref' output in the format given by
+    ActivityResolver.FORMATS.
+
+    :return: A (path, sha, epoch) tuple, or None if the line does not refer to
+             a commit (e.g. an annotated tag with no committer).
+    """
+    parts = aLine.split(' ', 3)
+    if len(parts) != 4 or not parts[1].isdigit():
+      return None
+
+    sha, epoch, tzOffset, path = parts
+    return (path, sha, int(epoch))
+
+  def __findPrefixIndex(self, aPath, aMatchers):
+    """
+    Find the index of the first ref pattern matcher (see
+    :func:`refs.createRefPatternMatcher`) that matches a given ref path.
+    """
+    for index, matches in enumerate(aMatchers):
+      if matches(aPath):
+        return index
+    return None
+
+def epochToDateTime(aEpoch):
+  """
+  Convert a number of seconds since the epoch to a naive datetime in UTC, which
+  is the representation used by Branch for its date of last activity.
+  """
+  return datetime.utcfromtimestamp(aEpoch)
+
+def dateTimeToEpoch(aDateTime):
+  """
+  Convert a naive datetime in UTC, as used by Branch, back to a number of
+  seconds since the epoch.
+  """
+  return calendar.timegm(aDateTime.utctimetuple())
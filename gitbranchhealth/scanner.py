@@ -0,0 +1,241 @@
+# scanner.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module providing a library API for scanning many repositories concurrently
+# from within a long-running service.
+
+import logging
+import subprocess
+import tempfile
+import threading
+import traceback
+
+try:
+  from Queue import Queue, Empty
+except ImportError:
+  from queue import Queue, Empty
+
+from config import BranchHealthConfig
+from manager import BranchManager
+
+class ScanAborted(Exception):
+  """
+  Raised within the scan of a repository once it has timed out, or all scans
+  have been cancelled.
+  """
+
+class ConcurrentScanner:
+  """
+  Object used to scan the branches of many repositories concurrently, on a
+  pool of worker threads. scan() returns a generator, and iterating it blocks
+  the calling thread until the next repository has finished, so a service
+  should consume the results on a thread of its own; cancel() may be called
+  from any other thread.
+
+  Each repository is scanned by a :class:`manager.BranchManager`, with the
+  repository's own configuration (ignored branches, health thresholds,
+  backend, cache and activity source), just like a run of git-branchhealth on
+  that repository. Git processes are started directly rather than through
+  GitPython, so that they can be timed out and cancelled.
+
+  At most aMaxConcurrency repositories are scanned at once. Results are yielded
+  in the order in which the repositories finish, not the order they were given
+  in.
+  """
+
+  # Value placed on the result queue by each worker thread once it is done.
+  __DONE = object()
+
+  def __init__(self, aMaxConcurrency=8, aTimeout=None, aRemoteName='local', aHealthyDays=14, aGitCommand='git'):
+    """
+    Create a new ConcurrentScanner instance.
+
+    :param aMaxConcurrency: The maximum number of repositories to scan at once.
+    :param aTimeout: The maximum number of seconds to spend scanning any one
+                     repository, or None to wait indefinitely.
+    :param aRemoteName: The branches to scan in each repository, as given to
+                        --remote: 'local' for local branches, the name of a
+                        remote for its remote-tracking branches, or 'all' for
+                        both.
+    :param aHealthyDays: The number of days after which a branch is no longer
+                         considered healthy. If left at the default, the
+                         health thresholds configured in each repository are
+                         used instead.
+    :param aGitCommand: The git executable to run.
+    """
+    self.__mMaxConcurrency = max(1, aMaxConcurrency)
+    self.__mTimeout = aTimeout
+    self.__mRemoteName = aRemoteName
+    self.__mHealthyDays = aHealthyDays
+    self.__mGitCommand = aGitCommand
+    self.__mLock = threading.Lock()
+    self.__mProcesses = set()
+    self.__mCancelled = threading.Event()
+
+  def scan(self, aRepositories):
+    """
+    Scan a list of repositories. The scans start when the returned generator is
+    first iterated, and each step of it blocks until another repository has
+    finished.
+
+    :param aRepositories: A list of paths to repositories.
+
+    :return: A generator of (repository path, rows, error) tuples, yielded as
+             each repository finishes. Rows is a list of (branch path, sha,
+             epoch, health) tuples, oldest first, where health is one of
+             Branch.HEALTHY, Branch.AGED or Branch.OLD. Error is None, or a
+             description of why the repository could not be scanned
+             (including timeouts and cancellation).
+    """
+    pending = Queue()
+    for repoPath in aRepositories:
+      pending.put(repoPath)
+
+    results = Queue()
+    workerCount = min(self.__mMaxConcurrency, pending.qsize())
+    for workerIndex in range(workerCount):
+      worker = threading.Thread(target=self.__work, args=(pending, results))
+      worker.daemon = True
+      worker.start()
+
+    remainingWorkers = workerCount
+    while remainingWorkers > 0:
+      result = results.get()
+      if result is ConcurrentScanner.__DONE:
+        remainingWorkers -= 1
+      else:
+        yield result
+
+  def cancel(self):
+    """
+    Cancel all scans: running git processes are killed, no further git
+    processes are started, and repositories that have not been started yet are
+    reported as cancelled. This may be called from any thread.
+    """
+    with self.__mLock:
+      self.__mCancelled.set()
+      for process in list(self.__mProcesses):
+        self.__kill(process)
+
+  def isCancelled(self):
+    return self.__mCancelled.is_set()
+
+  ## Private API ##
+
+  def __work(self, aPending, aResults):
+    """
+    Scan repositories from the pending queue until it is empty.
+    """
+    try:
+      while True:
+        try:
+          repoPath = aPending.get_nowait()
+        except Empty:
+          return
+
+        if self.isCancelled():
+          aResults.put((repoPath, [], 'cancelled'))
+          continue
+
+        aResults.put(self.__scanRepository(repoPath))
+    finally:
+      aResults.put(ConcurrentScanner.__DONE)
+
+  def __scanRepository(self, aRepoPath):
+    """
+    Scan a single repository, honoring the timeout and cancellation.
+    """
+    # The git processes of this repository, and whether it has timed out. Both
+    # are only changed while holding the lock, so that a process can't be
+    # started after the scan has been aborted without being killed.
+    processes = set()
+    timedOut = threading.Event()
+
+    def checkAborted():
+      if timedOut.is_set():
+        raise ScanAborted('timed out after ' + str(self.__mTimeout) + ' seconds')
+      if self.isCancelled():
+        raise ScanAborted('cancelled')
+
+    def runGit(aArguments, aStdin):
+      errorFile = tempfile.TemporaryFile()
+      with self.__mLock:
+        checkAborted()
+        process = subprocess.Popen([self.__mGitCommand, '-C', aRepoPath] + aArguments,
+                                   stdin=aStdin, stdout=subprocess.PIPE, stderr=errorFile)
+        processes.add(process)
+        self.__mProcesses.add(process)
+      return WatchedProcess(process, errorFile, checkAborted)
+
+    timer = None
+    if self.__mTimeout is not None:
+      timer = threading.Timer(self.__mTimeout, self.__expire, args=(processes, timedOut))
+      timer.daemon = True
+      timer.start()
+
+    try:
+      config = BranchHealthConfig(aRepoPath, aRemoteName=self.__mRemoteName, aNumDays=self.__mHealthyDays, aLogLevel=logging.ERROR)
+      rows = []
+      for branch in BranchManager(config, runGit).iterBranches():
+        # Branches read without git (e.g. with the native backend) can only be
+        # checked for timeouts and cancellation between branches.
+        checkAborted()
+        rows.append((branch.getPath(), branch.getSha(), branch.getLastActivityEpoch(), branch.getHealth()))
+      checkAborted()
+    except ScanAborted as error:
+      return (aRepoPath, [], str(error))
+    except Exception as error:
+      return (aRepoPath, [], str(error) or traceback.format_exc())
+    finally:
+      if timer:
+        timer.cancel()
+      with self.__mLock:
+        for process in processes:
+          self.__kill(process)
+          self.__mProcesses.discard(process)
+
+    rows.sort(key=lambda row: (row[2], row[0]))
+    return (aRepoPath, rows, None)
+
+  def __expire(self, aProcesses, aTimedOut):
+    with self.__mLock:
+      aTimedOut.set()
+      for process in aProcesses:
+        self.__kill(process)
+
+  def __kill(self, aProcess):
+    if aProcess.poll() is not None:
+      return
+
+    try:
+      aProcess.kill()
+    except OSError:
+      # The process has already exited.
+      pass
+
+class WatchedProcess:
+  """
+  A git process started by a :class:`ConcurrentScanner`, as returned to
+  :class:`resolver.ActivityResolver`. Waiting for it fails if the scan was
+  aborted while it was running (in which case it was killed), or if git
+  failed.
+  """
+
+  def __init__(self, aProcess, aErrorFile, aCheckAborted):
+    self.stdout = aProcess.stdout
+    self.__mProcess = aProcess
+    self.__mErrorFile = aErrorFile
+    self.__mCheckAborted = aCheckAborted
+
+  def wait(self):
+    try:
+      returnCode = self.__mProcess.wait()
+      self.__mCheckAborted()
+      if returnCode != 0:
+        self.__mErrorFile.seek(0)
+        errorOutput = self.__mErrorFile.read().strip()
+        raise RuntimeError(errorOutput or 'git exited with status ' + str(returnCode))
+      return returnCode
+    finally:
+      self.__mErrorFile.close()
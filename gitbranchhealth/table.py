@@ -0,0 +1,169 @@
+# table.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for storing large numbers of branches compactly within
+# git-branchhealth.
+
+import binascii
+from array import array
+
+from branch import Branch
+from resolver import epochToDateTime
+
+# Typecode of a signed 64-bit array. Python 2 has no 'q' typecode, but its 'l'
+# typecode is 64 bits wide on every 64-bit platform except Windows.
+try:
+  array('q')
+  INT64_TYPECODE = 'q'
+except ValueError:
+  INT64_TYPECODE = 'l'
+
+class BranchTable:
+  """
+  A columnar table of branches. Rather than one Branch object (with its own
+  dictionary of attributes) per branch, each attribute is stored in a single
+  packed column for all branches:
+
+    - Paths are split into a namespace (e.g. 'refs/remotes/origin'), which is
+      stored once in a pool and referenced by index, and a name, which is
+      stored in a single shared buffer.
+    - Tip shas are stored as 20 raw bytes each.
+    - Dates of last activity are stored as epochs in a 64-bit array.
+    - Health is stored as one byte per branch.
+
+  This costs a few dozen bytes per branch, plus the length of its name. Branch
+  objects can still be created from rows of the table when they are needed
+  (e.g. for printing), one at a time.
+  """
+
+  SHA_SIZE = 20
+
+  def __init__(self):
+    self.__mNamespaces = []
+    self.__mNamespaceIds = {}
+    self.__mNamespaceColumn = array('i')
+    self.__mNames = bytearray()
+    self.__mNameOffsets = array(INT64_TYPECODE, [0])
+    self.__mShas = bytearray()
+    self.__mEpochs = array(INT64_TYPECODE)
+    self.__mHealth = bytearray()
+
+  def __len__(self):
+    return len(self.__mEpochs)
+
+  def append(self, aPath, aSha, aEpoch, aHealth=Branch.HEALTHY):
+    """
+    Add a branch to the end of this table.
+
+    :param aPath: The full ref path of the branch.
+    :param aSha: The hex sha of the commit at the tip of the branch.
+    :param aEpoch: The date of last activity on the branch, in seconds since
+                   the epoch (UTC).
+    :param aHealth: The health of the branch, if it is already known.
+    """
+    separator = aPath.rfind('/')
+    namespace = aPath[:separator]
+    namespaceId = self.__mNamespaceIds.get(namespace)
+    if namespaceId is None:
+      namespaceId = len(self.__mNamespaces)
+      self.__mNamespaces.append(namespace)
+      self.__mNamespaceIds[namespace] = namespaceId
+
+    self.__mNamespaceColumn.append(namespaceId)
+    self.__mNames.extend(aPath[separator + 1:])
+    self.__mNameOffsets.append(len(self.__mNames))
+    self.__mShas.extend(binascii.unhexlify(aSha))
+    self.__mEpochs.append(aEpoch)
+    self.__mHealth.append(aHealth)
+
+  def getPath(self, aIndex):
+    return self.__mNamespaces[self.__mNamespaceColumn[aIndex]] + '/' + self.getName(aIndex)
+
+  def getName(self, aIndex):
+    start = self.__mNameOffsets[aIndex]
+    end = self.__mNameOffsets[aIndex + 1]
+    return bytes(self.__mNames[start:end])
+
+  def getSha(self, aIndex):
+    start = BranchTable.SHA_SIZE * aIndex
+    return binascii.hexlify(bytes(self.__mShas[start:start + BranchTable.SHA_SIZE]))
+
+  def getLastActivityEpoch(self, aIndex):
+    return self.__mEpochs[aIndex]
+
+  def getHealth(self, aIndex):
+    return self.__mHealth[aIndex]
+
+  def classify(self, aClassifier):
+    """
+    Mark the health of every branch in this table.
+
+    :param aClassifier: The :class:`health.HealthClassifier` for this run.
+    """
+    classify = aClassifier.classify
+    for index in range(len(self)):
+      self.__mHealth[index] = classify(self.__mEpochs[index])
+
+  def select(self, aIndices):
+    """
+    Create a new table containing only the given rows of this table, in the
+    given order.
+
+    :param aIndices: An iterable of row indices.
+
+    :return: A new BranchTable.
+    """
+    selected = BranchTable()
+    for index in aIndices:
+      selected.append(self.getPath(index), self.getSha(index), self.__mEpochs[index], self.__mHealth[index])
+    return selected
+
+  def selectHealth(self, aHealth):
+    """
+    Create a new table containing only the branches of this table with a given
+    health.
+    """
+    return self.select([x for x in range(len(self)) if self.__mHealth[x] == aHealth])
+
+  def sortByAge(self, aRefPrefixes):
+    """
+    Create a new table containing the branches of this table in descending
+    order of age. Branches with the same date are ordered by the position of
+    their namespace in aRefPrefixes, and then by path, as in
+    BranchManager.getBranchMap().
+
+    :param aRefPrefixes: The ref namespaces that were scanned.
+
+    :return: A new, sorted BranchTable.
+    """
+    prefixes = [x.rstrip('/') + '/' for x in aRefPrefixes]
+    namespaceRanks = []
+    for namespace in self.__mNamespaces:
+      rank = len(prefixes)
+      for (index, prefix) in enumerate(prefixes):
+        if (namespace + '/').startswith(prefix):
+          rank = index
+          break
+      namespaceRanks.append(rank)
+
+    def sortKey(aIndex):
+      return (self.__mEpochs[aIndex], namespaceRanks[self.__mNamespaceColumn[aIndex]], self.getPath(aIndex))
+
+    return self.select(sorted(range(len(self)), key=sortKey))
+
+  def getBranch(self, aIndex, aConfig):
+    """
+    Create a Branch object for a row of this table.
+
+    :param aIndex: The index of the row.
+    :param aConfig: The :class:`config.BranchHealthConfig` for the Branch.
+    """
+    return Branch(self.getPath(aIndex), aConfig, epochToDateTime(self.__mEpochs[aIndex]), self.getSha(aIndex))
+
+  def iterBranches(self, aConfig):
+    """
+    Create a Branch object for each row of this table, in order, one at a time.
+    """
+    for index in range(len(self)):
+      yield self.getBranch(index, aConfig)
@@ -0,0 +1,139 @@
+# transaction.py
+#
+# Copyright (C) 2014 Scott Johnson <jaywir3@gmail.com>, and contributors
+#
+# Module for updating many refs at once, atomically, within git-branchhealth.
+
+import re
+import tempfile
+
+class RefUpdateResult:
+  """
+  The outcome of a request to update (e.g. delete or archive) a single ref.
+  """
+
+  # Constants specifying the outcome of an update
+  DELETED = 'deleted'
+  ARCHIVED = 'archived'
+  RESTORED = 'restored'
+  MISSING = 'missing'
+  MOVED = 'moved'
+  EXISTS = 'exists'
+  UNMERGED = 'unmerged'
+  PROTECTED = 'protected'
+  FAILED = 'failed'
+
+  # Outcomes of updates that were made.
+  SUCCESSFUL = [DELETED, ARCHIVED, RESTORED]
+
+  def __init__(self, aPath, aOutcome, aMessage=''):
+    """
+    Create a new RefUpdateResult object.
+
+    :param aPath: The full path of the ref (e.g. 'refs/heads/foo').
+    :param aOutcome: One of the outcome constants (e.g. RefUpdateResult.DELETED).
+    :param aMessage: A human-readable explanation of the outcome, if any.
+    """
+    self.__mPath = aPath
+    self.__mOutcome = aOutcome
+    self.__mMessage = aMessage
+
+  def __str__(self):
+    if self.__mMessage:
+      return self.__mPath + ": " + self.__mOutcome + " (" + self.__mMessage + ")"
+    return self.__mPath + ": " + self.__mOutcome
+
+  def getPath(self):
+    return self.__mPath
+
+  def getOutcome(self):
+    return self.__mOutcome
+
+  def getMessage(self):
+    return self.__mMessage
+
+  def isSuccessful(self):
+    return self.__mOutcome in RefUpdateResult.SUCCESSFUL
+
+class RefTransaction:
+  """
+  Object used to update many refs with a single 'git update-ref --stdin'
+  process. Every update in a transaction is applied, or none of them are, and
+  packed-refs is rewritten at most once, no matter how many refs are updated.
+
+  Updates are given in groups (e.g. creating an archived ref and deleting the
+  branch it was archived from), each of which succeeds or fails as a whole. If
+  the transaction fails because of one group (e.g. because one of its refs was
+  updated concurrently), that group is reported as failed, and the transaction
+  is retried without it.
+  """
+
+  # Pattern matching the ref that caused 'git update-ref' to fail.
+  FAILED_REF_PATTERN = re.compile(r"cannot lock ref '([^']+)'")
+
+  def __init__(self, aConfig):
+    """
+    Create a new RefTransaction instance.
+
+    :param aConfig: The :class:`config.BranchHealthConfig` object for this run.
+    """
+    self.__mConfig = aConfig
+
+  def commit(self, aGroups):
+    """
+    Apply groups of updates in a single transaction.
+
+    :param aGroups: A list of (key, commands) tuples, where key identifies the
+                    group (e.g. the path of a branch), and commands is a list of
+                    'git update-ref --stdin' commands (e.g. 'delete <ref> <sha>').
+
+    :return: A dictionary mapping the key of each group to None, if its updates
+             were applied, or to an error message, if they weren't.
+    """
+    # Imported here, as GitPython is slow to import.
+    from git.exc import GitCommandError
+
+    errors = {}
+    remaining = list(aGroups)
+    while remaining:
+      try:
+        self.__run([command for (key, commands) in remaining for command in commands])
+      except GitCommandError as error:
+        message = str(error).strip()
+        match = RefTransaction.FAILED_REF_PATTERN.search(message)
+        failedKeys = []
+        if match:
+          failedKeys = [key for (key, commands) in remaining if self.__touchesRef(commands, match.group(1))]
+
+        if not failedKeys:
+          # We can't tell which group caused the failure, so nothing was updated.
+          for (key, commands) in remaining:
+            errors[key] = message
+          return errors
+
+        for key in failedKeys:
+          errors[key] = message
+        remaining = [(key, commands) for (key, commands) in remaining if key not in failedKeys]
+        continue
+
+      for (key, commands) in remaining:
+        errors[key] = None
+      break
+    return errors
+
+  ## Private API ##
+
+  def __touchesRef(self, aCommands, aRefPath):
+    for command in aCommands:
+      if command.split(' ')[1] == aRefPath:
+        return True
+    return False
+
+  def __run(self, aCommands):
+    commandFile = tempfile.TemporaryFile()
+    try:
+      commandFile.write('\n'.join(aCommands) + '\n')
+      commandFile.seek(0)
+      self.__mConfig.getRepo().git.update_ref('--stdin', istream=commandFile)
+    finally:
+      commandFile.close()
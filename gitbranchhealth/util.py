@@ -1,6 +1,5 @@
 import os
 from os import path
-from branch import Branch
 
 def branchDateComparator(aBranch, aOther):
   """
@@ -18,8 +17,6 @@ def branchDateComparator(aBranch, aOther):
   """
   branchPath1 = aBranch.getPath()
   branchPath2 = aOther.getPath()
-  humanDate1 = aBranch.getLastActivityRelativeToNow()
-  humanDate2 = aOther.getLastActivityRelativeToNow()
   isoDate1 = aBranch.getLastActivity()
   isoDate2 = aOther.getLastActivity()
 
@@ -43,3 +40,22 @@ def parseIgnoredBranchListFromString(aIgnoredBranchString):
       ignoredBranches.add(name.strip())
 
   return list(ignoredBranches)
+
+def encodeText(aText):
+  """
+  Encode text decoded by GitPython (e.g. the output of a git command, a value
+  from the git configuration or the name of a remote) as UTF-8. Ref paths and
+  identities are kept as byte strings, exactly as git stores them, so that
+  names that aren't ASCII can be mixed with everything else that is read from
+  the repository.
+
+  @param aText The text to encode. Byte strings and other values are returned
+               unchanged.
+
+  @returns The UTF-8 encoding of aText, if it is a unicode string; aText,
+           otherwise.
+  """
+  if isinstance(aText, unicode):
+    return aText.encode('utf-8')
+
+  return aText
@@ -0,0 +1,98 @@
+import unittest
+import os
+from datetime import date
+from StringIO import StringIO
+
+from gitbranchhealth.archive import BranchArchiver
+from gitbranchhealth.branchhealth import BranchHealthApplication
+from gitbranchhealth.refs import RefReader
+from gitbranchhealth.transaction import RefUpdateResult
+from testutil import GitRepoTest
+
+class ArchiveTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ArchiveTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_archive_and_restore(self):
+    shas = dict(self.__readRefs('refs/heads'))
+    archiver = BranchArchiver(self.__mConfig)
+    results = archiver.archiveBranches([
+      ('refs/heads/bug-14', shas['refs/heads/bug-14']),
+      ('refs/heads/bug-27', None),
+      ('refs/heads/bug-44', shas['refs/heads/bug-14']),
+      ('refs/heads/master', None),
+      ('refs/remotes/origin/bug-143', None),
+    ], date(2014, 7, 20))
+
+    self.assertEquals([RefUpdateResult.ARCHIVED, RefUpdateResult.ARCHIVED, RefUpdateResult.MOVED,
+                       RefUpdateResult.PROTECTED, RefUpdateResult.FAILED],
+                      [x.getOutcome() for x in results])
+    self.assertEquals(['refs/heads/bug-143', 'refs/heads/bug-44', 'refs/heads/master'], [x[0] for x in self.__readRefs('refs/heads')])
+    self.assertEquals([('refs/archive/2014-07-20/bug-14', shas['refs/heads/bug-14']), ('refs/archive/2014-07-20/bug-27', shas['refs/heads/bug-27'])],
+                      self.__readRefs('refs/archive'))
+
+    # A branch can't be archived over another one with the same name.
+    self.__mConfig.getRepo().create_head('bug-14', shas['refs/heads/bug-44'])
+    results = archiver.archiveBranches([('refs/heads/bug-14', None)], date(2014, 7, 20))
+    self.assertEquals(RefUpdateResult.EXISTS, results[0].getOutcome())
+
+    # Nor restored over one.
+    results = archiver.restoreBranches('2014-07-20')
+    self.assertEquals([RefUpdateResult.EXISTS, RefUpdateResult.RESTORED], [x.getOutcome() for x in results])
+    self.assertEquals(shas['refs/heads/bug-27'], dict(self.__readRefs('refs/heads'))['refs/heads/bug-27'])
+
+    self.__mConfig.getRepo().git.branch('-D', 'bug-14')
+    results = archiver.restoreBranches('2014-07-20/bug-14')
+    self.assertEquals([RefUpdateResult.RESTORED], [x.getOutcome() for x in results])
+    self.assertEquals(shas, dict(self.__readRefs('refs/heads')))
+    self.assertEquals([], self.__readRefs('refs/archive'))
+
+  def test_reflogs_are_kept(self):
+    logsDir = os.path.join(self.__mConfig.getGitDir(), 'logs')
+    with open(os.path.join(logsDir, 'refs', 'heads', 'bug-14'), 'r') as logHandle:
+      reflog = logHandle.read()
+    self.assertTrue(reflog)
+
+    archiver = BranchArchiver(self.__mConfig)
+    archiver.archiveBranches([('refs/heads/bug-14', None)], date(2014, 7, 20))
+    self.assertFalse(os.path.exists(os.path.join(logsDir, 'refs', 'heads', 'bug-14')))
+    with open(os.path.join(logsDir, 'refs', 'archive', '2014-07-20', 'bug-14'), 'r') as logHandle:
+      self.assertTrue(logHandle.read().startswith(reflog))
+
+    archiver.restoreBranches('2014-07-20')
+    self.assertFalse(os.path.exists(os.path.join(logsDir, 'refs', 'archive', '2014-07-20', 'bug-14')))
+    with open(os.path.join(logsDir, 'refs', 'heads', 'bug-14'), 'r') as logHandle:
+      self.assertTrue(logHandle.read().startswith(reflog))
+
+    # Git adds an entry for the creation of the archived ref, and another one
+    # for the creation of the restored branch.
+    self.assertEquals(len(reflog.splitlines()) + 2, len(self.__mConfig.getRepo().git.reflog('refs/heads/bug-14').splitlines()))
+
+  def test_archive_from_command_line(self):
+    repoPath = self.__mConfig.getRepoPath()
+    BranchHealthApplication(['-R', repoPath, '-n', '-d', '1', '--archive']).showBranchHealth(StringIO())
+    self.assertEquals(['refs/heads/master'], [x[0] for x in self.__readRefs('refs/heads')])
+
+    archiveDate = date.today().isoformat()
+    self.assertEquals(4, len(self.__readRefs('refs/archive/' + archiveDate)))
+
+    output = StringIO()
+    BranchHealthApplication(['-R', repoPath, '--restore', archiveDate]).restoreArchivedBranches(output)
+    self.assertEquals(4, output.getvalue().count(': restored'))
+    self.assertEquals(5, len(self.__readRefs('refs/heads')))
+
+  ## Private API ##
+
+  def __readRefs(self, aPrefix):
+    return RefReader(self.__mConfig.getGitDir()).readRefs([aPrefix])
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,32 @@
+import unittest
+
+from gitbranchhealth.authors import AuthorReport, getIdentityEmail
+from gitbranchhealth.branch import Branch
+
+class AuthorsTestSuite(unittest.TestCase):
+  def test_identity_email(self):
+    self.assertEquals('jane@example.com', getIdentityEmail('Jane Doe <Jane@Example.com>'))
+    self.assertEquals('nobody', getIdentityEmail('Nobody'))
+
+  def test_report(self):
+    report = AuthorReport(2)
+    report.add('refs/heads/a', 300, Branch.OLD, 'Jane <jane@example.com>')
+    report.add('refs/heads/b', 100, Branch.OLD, 'Jane Doe <JANE@example.com>')
+    report.add('refs/heads/c', 200, Branch.HEALTHY, 'Jane Doe <jane@example.com>')
+    report.add('refs/heads/d', 50, Branch.AGED, 'John <john@example.com>')
+    report.add('refs/heads/e', 60, Branch.HEALTHY, 'John <john@example.com>')
+    report.add('refs/heads/f', 70, Branch.HEALTHY, 'John <john@example.com>')
+
+    (jane, john) = report.getSummaries()
+    self.assertEquals('Jane Doe <jane@example.com>', jane.getIdentity())
+    self.assertEquals(3, jane.getBranchCount())
+    self.assertEquals(2, jane.getHealthCount(Branch.OLD))
+    self.assertEquals([('refs/heads/b', 100), ('refs/heads/c', 200)], jane.getOldestBranches())
+    self.assertEquals(0, john.getHealthCount(Branch.OLD))
+    self.assertEquals([('refs/heads/d', 50), ('refs/heads/e', 60)], john.getOldestBranches())
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -1,4 +1,12 @@
+import unittest
+import os
+import subprocess
+import sys
+from StringIO import StringIO
+
 from gitbranchhealth.branchhealth import BranchHealthApplication
+from gitbranchhealth.cache import ReportCache, getCacheDir
+from gitbranchhealth.config import BranchHealthConfig
 
 from testutil import GitRepoTest
 
@@ -15,6 +23,185 @@ class BranchHealthTestSuite(GitRepoTest):
     trunkName = context.getConfig().getTrunkBranchName()
     self.assertEquals('mainline', trunkName)
 
+  def test_startup_imports(self):
+    # Importing the application (e.g. to print --help) shouldn't import any of
+    # the heavy third party modules.
+    script = ('import sys; import gitbranchhealth.branchhealth; '
+              'print(" ".join([x for x in ["git", "babel", "dateutil", "pytz", "nicelog", "colors"] if x in sys.modules]))')
+    packageDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=packageDir, stdout=subprocess.PIPE)
+    (output, errorOutput) = process.communicate()
+    self.assertEquals(0, process.returncode)
+    self.assertEquals('', output.strip())
+
+  def test_unchanged_refs_reuse_report(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    arguments = ['-R', repoPath, '-n', '-d', '1']
+    firstOutput = self.__showBranchHealth(arguments)
+    reportPath = os.path.join(getCacheDir(self.__mParent.getConfig().getGitDir()), ReportCache.FILE_NAME)
+    self.assertTrue(os.path.isfile(reportPath))
+
+    # Rewrite the report so that we can tell whether it was reused.
+    with open(reportPath, 'r') as reportHandle:
+      report = reportHandle.read()
+    with open(reportPath, 'w') as reportHandle:
+      reportHandle.write(report.replace('refs/heads/bug-14', 'refs/heads/cached-14'))
+    self.assertTrue('cached-14' in self.__showBranchHealth(arguments))
+
+    # Moving a ref invalidates the report.
+    repo = self.__mParent.getConfig().getRepo()
+    repo.git.update_ref('refs/heads/bug-14', 'refs/heads/bug-27')
+    output = self.__showBranchHealth(arguments)
+    self.assertFalse('cached-14' in output)
+    self.assertTrue('bug-14' in output)
+
+    # As does changing the number of healthy days.
+    self.__showBranchHealth(arguments)
+    with open(reportPath, 'w') as reportHandle:
+      reportHandle.write(report.replace('refs/heads/bug-14', 'refs/heads/cached-14'))
+    self.assertFalse('cached-14' in self.__showBranchHealth(['-R', repoPath, '-n', '-d', '2']))
+
+  def test_unsorted(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    sortedOutput = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache'])
+    unsortedOutput = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '-u'])
+    self.assertEquals(sorted(sortedOutput.splitlines()), sorted(unsortedOutput.splitlines()))
+
+  def test_limit(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    for cacheArguments in [[], ['--no-cache']]:
+      arguments = ['-R', repoPath, '-n'] + cacheArguments
+      allLines = self.__showBranchHealth(arguments).splitlines()
+      self.assertEquals(allLines[:2], self.__showBranchHealth(arguments + ['-l', '2']).splitlines())
+      self.assertEquals(allLines[-2:], self.__showBranchHealth(arguments + ['-l', '2', '--newest']).splitlines())
+
+  def test_limit_must_be_positive(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+      for limit in ['0', '-1']:
+        self.assertRaises(SystemExit, BranchHealthApplication, ['-R', repoPath, '-n', '-l', limit])
+      self.assertTrue('--limit must be at least 1' in sys.stderr.getvalue())
+    finally:
+      sys.stderr = stderr
+
+  def test_limit_with_cold_cache(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    expectedLines = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache']).splitlines()
+    reportPath = os.path.join(getCacheDir(self.__mParent.getConfig().getGitDir()), ReportCache.FILE_NAME)
+
+    # Without an up to date report, the oldest branches are selected with a
+    # bounded heap, and no (partial) report is saved.
+    self.assertEquals(expectedLines[:2], self.__showBranchHealth(['-R', repoPath, '-n', '-l', '2']).splitlines())
+    self.assertFalse(os.path.exists(reportPath))
+
+    # Once a full report has been saved, it is sliced instead.
+    self.__showBranchHealth(['-R', repoPath, '-n'])
+    with open(reportPath, 'r') as reportHandle:
+      report = reportHandle.read()
+    with open(reportPath, 'w') as reportHandle:
+      reportHandle.write(report.replace('refs/heads/bug-14', 'refs/heads/cached-14'))
+    self.assertTrue('cached-14' in self.__showBranchHealth(['-R', repoPath, '-n', '-l', '2']))
+
+  def test_no_cache(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache'])
+    self.assertFalse(os.path.exists(getCacheDir(self.__mParent.getConfig().getGitDir())))
+
+  def test_shared_tips(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    output = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '--all-remotes', '--shared-tips'])
+    lines = [x for x in output.splitlines() if x.startswith('refs/heads/bug-14:')]
+    self.assertEquals(1, len(lines))
+    self.assertTrue(lines[0].endswith(' (same commit as: refs/remotes/origin/bug-14)'))
+
+  def test_merged_only(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    repo = self.__mParent.getConfig().getRepo()
+    for name in ['bug-14', 'bug-27']:
+      repo.heads[name].commit = repo.index.commit('Work on ' + name, parent_commits=[repo.heads[name].commit], head=False,
+                                                  author_date='2014-01-01T00:00:00', commit_date='2014-01-01T00:00:00')
+    repo.index.commit('Merge bug-14', parent_commits=[repo.heads.master.commit, repo.heads['bug-14'].commit], head=True,
+                      author_date='2014-01-02T00:00:00', commit_date='2014-01-02T00:00:00')
+
+    output = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '--show-merged'])
+    lines = dict([(x.split(':')[0], x) for x in output.splitlines()])
+    self.assertTrue(lines['refs/heads/bug-14'].endswith(' [merged]'))
+    self.assertTrue(lines['refs/heads/bug-27'].endswith(' [unmerged]'))
+
+    # Only the merged branch is archived.
+    self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '-d', '1', '--archive', '--merged-only'])
+    self.assertEquals(['bug-27', 'master'], sorted([x.name for x in repo.heads]))
+
+  def test_by_author(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    output = self.__showBranchHealth(['-R', repoPath, '-n', '-d', '1', '--by-author', '-l', '2'])
+    lines = output.splitlines()
+    self.assertTrue(lines[0].endswith(' (4 branches, 4 old):'))
+    self.assertEquals(3, len(lines))
+    self.assertTrue(lines[1].startswith('  refs/heads/'))
+
+  def test_non_ascii_names(self):
+    from git import Actor
+
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    repo = self.__mParent.getConfig().getRepo()
+    author = Actor(u'Zo\xeb', 'zoe@example.com')
+    commit = repo.index.commit('Work on a cafe', parent_commits=[repo.heads.master.commit], head=False,
+                               author=author, committer=author,
+                               author_date='2014-01-01T00:00:00', commit_date='2014-01-01T00:00:00')
+    repo.git.branch('feature/caf\xc3\xa9', commit.hexsha)
+
+    # Ref paths and identities are printed as git stores them (UTF-8), whether
+    # they're loose or packed.
+    for packRefs in [False, True]:
+      if packRefs:
+        repo.git.pack_refs('--all')
+      for backend in BranchHealthConfig.BACKENDS:
+        for extraArguments in [[], ['-u']]:
+          output = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '--backend', backend] + extraArguments)
+          self.assertEquals(1, len([x for x in output.splitlines() if x.startswith('refs/heads/feature/caf\xc3\xa9:')]))
+
+        output = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache', '--backend', backend, '--by-author'])
+        self.assertTrue('Zo\xc3\xab <zoe@example.com> (1 branches, 1 old):' in output.splitlines())
+
+  def test_non_ascii_names_with_report(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    repo = self.__mParent.getConfig().getRepo()
+    repo.git.branch('feature/caf\xc3\xa9', 'bug-14')
+    arguments = ['-R', repoPath, '-n', '-d', '1']
+    expectedOutput = self.__showBranchHealth(arguments + ['--no-cache'])
+    self.assertTrue('refs/heads/feature/caf\xc3\xa9:' in expectedOutput)
+
+    # The first run saves the report, and the second one reuses it.
+    self.assertEquals(expectedOutput, self.__showBranchHealth(arguments))
+    self.assertTrue(os.path.isfile(os.path.join(getCacheDir(self.__mParent.getConfig().getGitDir()), ReportCache.FILE_NAME)))
+    self.assertEquals(expectedOutput, self.__showBranchHealth(arguments))
+
+  def test_bare_repository(self):
+    repoPath = self.__mParent.getConfig().getRepoPath()
+    barePath = os.path.join(self.__mParent.getTempDir(), 'mirror.git')
+    self.__mParent.getConfig().getRepo().git.clone('--mirror', repoPath, barePath)
+    self.assertFalse(os.path.exists(os.path.join(barePath, 'index')))
+
+    expectedLines = self.__showBranchHealth(['-R', repoPath, '-n', '--no-cache']).splitlines()
+    for backend in BranchHealthConfig.BACKENDS:
+      output = self.__showBranchHealth(['-R', barePath, '-n', '--backend', backend])
+      self.assertEquals([x.split(':')[0] for x in expectedLines], [x.split(':')[0] for x in output.splitlines()])
+
+    # Delete all of the (old) branches from the mirror.
+    self.__showBranchHealth(['-R', barePath, '-n', '-d', '1', '-D'])
+    self.assertEquals('', self.__showBranchHealth(['-R', barePath, '-n', '--no-cache']))
+    self.assertFalse(os.path.exists(os.path.join(barePath, 'index')))
+
+  ## Private API ##
+
+  def __showBranchHealth(self, aArguments):
+    stream = StringIO()
+    BranchHealthApplication(aArguments).showBranchHealth(stream)
+    return stream.getvalue()
+
 def allTests():
   unittest.main()
 
@@ -0,0 +1,104 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from gitbranchhealth.cache import CommitDateCache, CacheLock, ReportCache, getCacheDir
+from gitbranchhealth.resolver import ActivityResolver
+from gitbranchhealth.table import BranchTable
+from testutil import GitRepoTest
+
+class CacheTestSuite(unittest.TestCase):
+  def setUp(self):
+    self.__mGitDir = tempfile.mkdtemp(prefix='gitBranchHealthTest')
+
+  def tearDown(self):
+    shutil.rmtree(self.__mGitDir)
+
+  def test_round_trip(self):
+    cache = CommitDateCache(self.__mGitDir)
+    self.assertEquals(None, cache.get('a' * 40))
+    cache.put('a' * 40, 1405721203)
+    cache.save()
+
+    self.assertEquals(1405721203, CommitDateCache(self.__mGitDir).get('a' * 40))
+
+  def test_report_round_trip(self):
+    table = BranchTable()
+    table.append('refs/heads/caf\xc3\xa9', 'a' * 40, 1405721203)
+    table.append('refs/remotes/origin/na\xc3\xafve', 'b' * 40, 1405721204)
+    ReportCache(self.__mGitDir).save('fingerprint', table)
+
+    # Paths that aren't ASCII are saved, and read back, as UTF-8.
+    loaded = ReportCache(self.__mGitDir).load('fingerprint', BranchTable())
+    self.assertEquals([('refs/heads/caf\xc3\xa9', 'a' * 40, 1405721203), ('refs/remotes/origin/na\xc3\xafve', 'b' * 40, 1405721204)],
+                      [(loaded.getPath(x), loaded.getSha(x), loaded.getLastActivityEpoch(x)) for x in range(len(loaded))])
+    self.assertEquals(None, ReportCache(self.__mGitDir).load('other fingerprint', BranchTable()))
+
+  def test_least_recently_used_evicted(self):
+    cache = CommitDateCache(self.__mGitDir, aMaxEntries=2)
+    cache.put('a' * 40, 1)
+    cache.put('b' * 40, 2)
+    cache.get('a' * 40)
+    cache.put('c' * 40, 3)
+    cache.save()
+
+    cache = CommitDateCache(self.__mGitDir, aMaxEntries=2)
+    self.assertEquals(1, cache.get('a' * 40))
+    self.assertEquals(None, cache.get('b' * 40))
+    self.assertEquals(3, cache.get('c' * 40))
+
+  def test_concurrent_writers_are_merged(self):
+    first = CommitDateCache(self.__mGitDir)
+    second = CommitDateCache(self.__mGitDir)
+    first.get('a' * 40)
+    second.get('a' * 40)
+
+    first.put('a' * 40, 1)
+    first.save()
+    second.put('b' * 40, 2)
+    second.save()
+
+    cache = CommitDateCache(self.__mGitDir)
+    self.assertEquals(1, cache.get('a' * 40))
+    self.assertEquals(2, cache.get('b' * 40))
+
+  def test_locked_cache_is_not_written(self):
+    os.makedirs(getCacheDir(self.__mGitDir))
+    lock = CacheLock(os.path.join(getCacheDir(self.__mGitDir), CommitDateCache.FILE_NAMES['author'] + '.lock'))
+    self.assertTrue(lock.acquire())
+
+    cache = CommitDateCache(self.__mGitDir)
+    cache.put('a' * 40, 1)
+    cache.save()
+    lock.release()
+
+    self.assertEquals(None, CommitDateCache(self.__mGitDir).get('a' * 40))
+
+class CachedResolverTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(CachedResolverTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_resolver_reads_cache_first(self):
+    resolved = ActivityResolver(self.__mConfig).resolve(['refs/heads'])
+    masterSha = dict((path, sha) for (path, sha, epoch) in resolved)['refs/heads/master']
+
+    cache = CommitDateCache(self.__mConfig.getGitDir())
+    self.assertTrue(cache.get(masterSha) is not None)
+
+    # Poison the cache, to prove that it is consulted before git.
+    cache.put(masterSha, 42)
+    cache.save()
+    resolved = ActivityResolver(self.__mConfig).resolve(['refs/heads'])
+    self.assertEquals(42, dict((path, epoch) for (path, sha, epoch) in resolved)['refs/heads/master'])
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,75 @@
+import unittest
+import logging
+import os
+
+from gitbranchhealth.commitgraph import CommitGraph
+from gitbranchhealth.config import BranchHealthConfig
+from gitbranchhealth.resolver import ActivityResolver
+from testutil import GitRepoTest
+
+class CommitGraphTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(CommitGraphTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_no_commit_graph(self):
+    graph = CommitGraph(self.__mConfig.getGitDir())
+    self.assertFalse(graph.isAvailable())
+    self.assertEquals(None, graph.getCommitTime(self.__mConfig.getRepo().heads.master.commit.hexsha))
+
+  def test_commit_times(self):
+    repo = self.__mConfig.getRepo()
+    repo.git.commit_graph('write', '--reachable')
+    self.__verifyCommitTimes()
+
+  def test_split_commit_graph(self):
+    repo = self.__mConfig.getRepo()
+    repo.git.commit_graph('write', '--reachable', '--split')
+    self.__makeCommit('splitFile')
+    repo.git.commit_graph('write', '--reachable', '--split=no-merge')
+    self.assertTrue(os.path.isfile(os.path.join(self.__mConfig.getGitDir(), 'objects', 'info', 'commit-graphs', 'commit-graph-chain')))
+    self.__verifyCommitTimes()
+
+  def test_resolver_falls_back_for_missing_commits(self):
+    repo = self.__mConfig.getRepo()
+    repo.git.commit_graph('write', '--reachable')
+    newSha = self.__makeCommit('newFile')
+
+    graph = CommitGraph(self.__mConfig.getGitDir())
+    self.assertEquals(None, graph.findCommit(newSha))
+    graph.close()
+
+    # Only committer dates are stored in the commit-graph.
+    gitConfig = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aActivitySource='committer')
+    nativeConfig = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aBackend='native', aActivitySource='committer')
+    for config in [gitConfig, nativeConfig]:
+      resolved = dict((path, epoch) for (path, sha, epoch) in ActivityResolver(config).resolve(['refs/heads']))
+      self.assertEquals(repo.heads.master.commit.committed_date, resolved['refs/heads/master'])
+
+  ## Private API ##
+
+  def __makeCommit(self, aFileName):
+    repo = self.__mConfig.getRepo()
+    fh = open(os.path.join(self.__mConfig.getRepoPath(), aFileName), "w")
+    fh.write("TEST123")
+    fh.close()
+    repo.index.add([aFileName])
+    return repo.index.commit("A new commit").hexsha
+
+  def __verifyCommitTimes(self):
+    repo = self.__mConfig.getRepo()
+    graph = CommitGraph(self.__mConfig.getGitDir())
+    self.assertTrue(graph.isAvailable())
+    for commit in repo.iter_commits('--all'):
+      self.assertEquals(commit.committed_date, graph.getCommitTime(commit.hexsha))
+    graph.close()
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
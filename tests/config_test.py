@@ -96,6 +96,25 @@ class ConfigTestSuite(GitRepoTest):
 
     self.assertEquals(expectedBranchName, conf.getTrunkBranchName())
 
+  def test_default_health_thresholds(self):
+    conf = self.__mContext.getConfig()
+    self.assertEquals([14, 28], conf.getHealthThresholds())
+    self.assertEquals([14, 28], conf.getHealthClassifier().getThresholds())
+
+  def test_config_file_health_thresholds(self):
+    configFileHandle = open(os.path.join(self.__mTempDir, 'testrepo/.git/config'), "w")
+    configFileHandle.write("[branchhealth]\n")
+    configFileHandle.write("\tthresholds=7,30,90")
+    configFileHandle.close()
+    repoDir = os.path.join(self.__mTempDir, "testrepo")
+    self.__mContext = branchhealth.BranchHealthApplication(['-R', repoDir])
+    conf = self.__mContext.getConfig()
+    self.assertEquals([7, 30, 90], conf.getHealthThresholds())
+
+    self.__mContext = branchhealth.BranchHealthApplication(['-R', repoDir, '-d', '10'])
+    conf = self.__mContext.getConfig()
+    self.assertEquals([10, 20], conf.getHealthThresholds())
+
 def allTests():
   unittest.main()
 
@@ -0,0 +1,108 @@
+import unittest
+import os
+
+from git import Repo
+
+from gitbranchhealth.deletion import LocalBranchDeleter, RemoteBranchDeleter, splitRemoteBranchPath
+from gitbranchhealth.refs import RefReader
+from gitbranchhealth.transaction import RefUpdateResult
+from testutil import GitRepoTest
+
+class DeletionTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(DeletionTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+    self.__mRepo = self.__mConfig.getRepo()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_delete_branches(self):
+    shas = dict(RefReader(self.__mConfig.getGitDir()).readRefs(['refs/heads']))
+    self.assertTrue(self.__mRepo.config_reader().has_section('branch "bug-14"'))
+
+    results = LocalBranchDeleter(self.__mConfig).deleteBranches([
+      ('refs/heads/bug-14', shas['refs/heads/bug-14']),
+      ('refs/heads/bug-27', None),
+      ('refs/heads/bug-44', shas['refs/heads/bug-14']),
+      ('refs/heads/master', shas['refs/heads/master']),
+      ('refs/heads/missing', None),
+    ])
+
+    self.assertEquals(['refs/heads/bug-14', 'refs/heads/bug-27', 'refs/heads/bug-44', 'refs/heads/master', 'refs/heads/missing'],
+                      [x.getPath() for x in results])
+    self.assertEquals([RefUpdateResult.DELETED, RefUpdateResult.DELETED, RefUpdateResult.MOVED, RefUpdateResult.PROTECTED, RefUpdateResult.MISSING],
+                      [x.getOutcome() for x in results])
+
+    remaining = [path for (path, sha) in RefReader(self.__mConfig.getGitDir()).readRefs(['refs/heads'])]
+    self.assertEquals(['refs/heads/bug-143', 'refs/heads/bug-44', 'refs/heads/master'], remaining)
+    self.assertFalse(self.__mRepo.config_reader().has_section('branch "bug-14"'))
+
+  def test_locked_branch(self):
+    # A lock left by a concurrent update makes the transaction fail, but only
+    # the locked branch is left behind.
+    open(os.path.join(self.__mConfig.getGitDir(), 'refs', 'heads', 'bug-27.lock'), 'w').close()
+    results = LocalBranchDeleter(self.__mConfig).deleteBranches([('refs/heads/bug-14', None), ('refs/heads/bug-27', None)])
+    self.assertEquals([RefUpdateResult.DELETED, RefUpdateResult.FAILED], [x.getOutcome() for x in results])
+    self.assertFalse('bug-14' in self.__mRepo.heads)
+    self.assertTrue('bug-27' in self.__mRepo.heads)
+
+  def test_keep_checked_out_and_unmerged_branches(self):
+    self.__mRepo.heads['bug-44'].checkout()
+    unmerged = self.__mRepo.create_head('unmerged')
+    unmerged.checkout()
+    fh = open(os.path.join(self.__mRepo.working_tree_dir, 'unmergedFile'), 'w')
+    fh.write('unmerged')
+    fh.close()
+    self.__mRepo.index.add(['unmergedFile'])
+    self.__mRepo.index.commit('An unmerged commit')
+    self.__mRepo.heads['bug-44'].checkout()
+
+    results = LocalBranchDeleter(self.__mConfig).deleteBranches([('refs/heads/bug-44', None), ('refs/heads/unmerged', None)])
+    self.assertEquals([RefUpdateResult.PROTECTED, RefUpdateResult.UNMERGED], [x.getOutcome() for x in results])
+    self.assertTrue('bug-44' in self.__mRepo.heads)
+    self.assertTrue('unmerged' in self.__mRepo.heads)
+
+  def test_delete_remote_branches(self):
+    # Use two local bare repositories as remotes.
+    remotes = {}
+    for remoteName in ['backup', 'mirror/two']:
+      remotePath = os.path.join(self.__mParent.getTempDir(), remoteName.replace('/', '-') + '.git')
+      self.__mRepo.git.clone('--bare', self.__mRepo.working_tree_dir, remotePath)
+      self.__mRepo.create_remote(remoteName, remotePath).fetch()
+      remotes[remoteName] = Repo(remotePath)
+
+    shas = dict(RefReader(self.__mConfig.getGitDir()).readRefs(['refs/remotes']))
+    branches = [
+      ('refs/remotes/backup/bug-14', shas['refs/remotes/backup/bug-14']),
+      ('refs/remotes/backup/bug-27', shas['refs/remotes/backup/bug-14']),
+      ('refs/remotes/backup/bug-44', None),
+      ('refs/remotes/backup/master', None),
+      ('refs/remotes/mirror/two/bug-14', shas['refs/remotes/mirror/two/bug-14']),
+      ('refs/remotes/unknown/bug-14', None),
+    ]
+    results = RemoteBranchDeleter(self.__mConfig, aJobs=2, aChunkSize=2).deleteBranches(branches)
+
+    self.assertEquals([x[0] for x in branches], [x.getPath() for x in results])
+    self.assertEquals([RefUpdateResult.DELETED, RefUpdateResult.MOVED, RefUpdateResult.DELETED,
+                       RefUpdateResult.PROTECTED, RefUpdateResult.DELETED, RefUpdateResult.FAILED],
+                      [x.getOutcome() for x in results])
+
+    self.assertEquals(['bug-143', 'bug-27', 'master'], sorted([x.name for x in remotes['backup'].heads]))
+    self.assertEquals(['bug-143', 'bug-27', 'bug-44', 'master'], sorted([x.name for x in remotes['mirror/two'].heads]))
+
+    # The remote-tracking branches of deleted branches are gone, too.
+    remaining = [path for (path, sha) in RefReader(self.__mConfig.getGitDir()).readRefs(['refs/remotes/backup'])]
+    self.assertEquals(['refs/remotes/backup/bug-143', 'refs/remotes/backup/bug-27', 'refs/remotes/backup/master'], remaining)
+
+  def test_split_remote_branch_path(self):
+    self.assertEquals(('mirror/two', 'feature/x'), splitRemoteBranchPath('refs/remotes/mirror/two/feature/x', ['mirror', 'mirror/two']))
+    self.assertEquals(('mirror', 'x'), splitRemoteBranchPath('refs/remotes/mirror/x', ['mirror', 'mirror/two']))
+    self.assertEquals((None, None), splitRemoteBranchPath('refs/heads/x', ['mirror']))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,50 @@
+import unittest
+from datetime import date
+
+from gitbranchhealth.branch import Branch
+from gitbranchhealth.health import HealthClassifier, parseThresholdsFromString
+
+class HealthTestSuite(unittest.TestCase):
+  def setUp(self):
+    # 2014-07-20 00:00:00 UTC
+    self.__mMidnight = 1405814400
+    self.__mToday = date(2014, 7, 20)
+
+  def test_default_tiers(self):
+    classifier = HealthClassifier.fromHealthyDays(14, self.__mToday)
+    self.assertEquals([14, 28], classifier.getThresholds())
+    self.assertEquals(3, classifier.getTierCount())
+
+    self.assertEquals(Branch.HEALTHY, classifier.classify(self.__mMidnight + 3600))
+    self.assertEquals(Branch.HEALTHY, classifier.classify(self.__mMidnight - 14 * 86400))
+    self.assertEquals(Branch.AGED, classifier.classify(self.__mMidnight - 14 * 86400 - 1))
+    self.assertEquals(Branch.AGED, classifier.classify(self.__mMidnight - 28 * 86400))
+    self.assertEquals(Branch.OLD, classifier.classify(self.__mMidnight - 28 * 86400 - 1))
+
+  def test_many_tiers(self):
+    classifier = HealthClassifier([30, 7, 90], self.__mToday)
+    self.assertEquals([7, 30, 90], classifier.getThresholds())
+    self.assertEquals(0, classifier.getTier(self.__mMidnight))
+    self.assertEquals(1, classifier.getTier(self.__mMidnight - 10 * 86400))
+    self.assertEquals(2, classifier.getTier(self.__mMidnight - 60 * 86400))
+    self.assertEquals(3, classifier.getTier(self.__mMidnight - 100 * 86400))
+
+    self.assertEquals(Branch.AGED, classifier.classify(self.__mMidnight - 10 * 86400))
+    self.assertEquals(Branch.AGED, classifier.classify(self.__mMidnight - 60 * 86400))
+    self.assertEquals(Branch.OLD, classifier.classify(self.__mMidnight - 100 * 86400))
+
+  def test_single_tier(self):
+    classifier = HealthClassifier([30], self.__mToday)
+    self.assertEquals(Branch.HEALTHY, classifier.classify(self.__mMidnight))
+    self.assertEquals(Branch.OLD, classifier.classify(self.__mMidnight - 31 * 86400))
+
+  def test_parse_thresholds(self):
+    self.assertEquals([7, 30], parseThresholdsFromString('30, 7,, 30'))
+    self.assertRaises(ValueError, parseThresholdsFromString, '7,soon')
+    self.assertRaises(ValueError, parseThresholdsFromString, '0')
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,173 @@
+import unittest
+import random
+from datetime import datetime
+
+from git.exc import GitCommandError
+
+from gitbranchhealth.commitgraph import CommitGraph
+from gitbranchhealth.history import CommitHistory
+from testutil import GitRepoTest
+
+class HistoryTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(HistoryTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_find_reachable(self):
+    self.__advanceBranches(['bug-14', 'bug-27', 'bug-44'])
+    self.__mergeIntoMaster(['bug-14', 'bug-44'])
+    self.__verifyReachable()
+
+  def test_find_reachable_with_commit_graph(self):
+    repo = self.__mConfig.getRepo()
+    self.__advanceBranches(['bug-14', 'bug-27', 'bug-44'])
+    self.__mergeIntoMaster(['bug-14', 'bug-44'])
+    repo.git.commit_graph('write', '--reachable')
+    self.__verifyReachable()
+
+    # Commits made since the commit-graph was written are read from the object
+    # database.
+    self.__advanceBranches(['bug-143'])
+    self.__mergeIntoMaster(['bug-27'])
+    self.__verifyReachable()
+
+  def test_count_divergence(self):
+    self.__advanceBranches(['bug-14', 'bug-27', 'bug-27', 'bug-44'])
+    self.__mergeIntoMaster(['bug-44'])
+    self.__advanceBranches(['bug-44'])
+    self.__verifyDivergence()
+
+    # With a commit-graph, and commits made since it was written.
+    self.__mConfig.getRepo().git.commit_graph('write', '--reachable')
+    self.__verifyDivergence()
+    self.__mergeIntoMaster(['bug-14'])
+    self.__advanceBranches(['bug-143'])
+    self.__verifyDivergence()
+
+  def test_count_divergence_max_commits(self):
+    repo = self.__mConfig.getRepo()
+    self.__advanceBranches(['bug-27', 'bug-27', 'bug-27'])
+    trunkSha = repo.heads.master.commit.hexsha
+    bug27Sha = repo.heads['bug-27'].commit.hexsha
+
+    history = CommitHistory(self.__mConfig.getGitDir())
+    (ahead, behind, isExact) = history.countDivergence(trunkSha, [bug27Sha], 2)[bug27Sha]
+    self.assertFalse(isExact)
+    self.assertTrue(ahead <= 3)
+    self.assertEquals((3, 5, True), history.countDivergence(trunkSha, [bug27Sha])[bug27Sha])
+    history.close()
+
+  def test_count_divergence_max_commits_without_commit_graph(self):
+    repo = self.__mConfig.getRepo()
+    self.__createRandomHistory(['bug-14', 'bug-27', 'bug-44', 'bug-143'], 230)
+    trunkSha = repo.heads.master.commit.hexsha
+    tips = set([x.commit.hexsha for x in repo.heads])
+
+    expected = {}
+    for sha in tips:
+      (behind, ahead) = [int(x) for x in repo.git.rev_list('--left-right', '--count', trunkSha + '...' + sha).split()]
+      expected[sha] = (ahead, behind)
+
+    # Without a commit-graph, commits are walked in order of commit date, so
+    # counts that are cut short are still lower bounds.
+    history = CommitHistory(self.__mConfig.getGitDir())
+    for maxCommits in [30, 100, 150, None]:
+      divergence = history.countDivergence(trunkSha, tips, maxCommits)
+      for sha in tips:
+        (ahead, behind, isExact) = divergence[sha]
+        if isExact:
+          self.assertEquals(expected[sha], (ahead, behind))
+        else:
+          self.assertTrue(ahead <= expected[sha][0] and behind <= expected[sha][1])
+      if maxCommits is None:
+        self.assertTrue(all([divergence[sha][2] for sha in tips]))
+    history.close()
+
+  def test_commit_graph_parents(self):
+    repo = self.__mConfig.getRepo()
+    self.__mergeIntoMaster(['bug-14', 'bug-27', 'bug-44'])
+    repo.git.commit_graph('write', '--reachable')
+
+    graph = CommitGraph(self.__mConfig.getGitDir())
+    for line in repo.git.rev_list('--parents', '--all').splitlines():
+      shas = line.split()
+      position = graph.findCommit(shas[0])
+      self.assertEquals(shas[1:], [graph.getSha(x) for x in graph.getParents(position)])
+      for parentPosition in graph.getParents(position):
+        self.assertTrue(graph.getGeneration(parentPosition) < graph.getGeneration(position))
+    graph.close()
+
+  ## Private API ##
+
+  def __advanceBranches(self, aBranchNames):
+    repo = self.__mConfig.getRepo()
+    for name in aBranchNames:
+      repo.heads[name].commit = repo.index.commit('Work on ' + name, parent_commits=[repo.heads[name].commit], head=False)
+
+  def __createRandomHistory(self, aBranchNames, aCount):
+    # Commits are made on random branches (or master), with random branches
+    # merged in, and with increasing commit dates, but in an order that has
+    # nothing to do with their shas.
+    repo = self.__mConfig.getRepo()
+    random.seed(aCount)
+    names = ['master'] + aBranchNames
+    epoch = 1500000000
+    for index in range(aCount):
+      name = random.choice(names)
+      parents = [repo.heads[name].commit]
+      if random.random() < 0.3:
+        mergedCommit = repo.heads[random.choice(names)].commit
+        if mergedCommit not in parents:
+          parents.append(mergedCommit)
+
+      epoch += 60
+      date = datetime.utcfromtimestamp(epoch).strftime('%Y-%m-%dT%H:%M:%S')
+      repo.heads[name].commit = repo.index.commit('Commit ' + str(index), parent_commits=parents, head=False,
+                                                  author_date=date, commit_date=date)
+
+  def __mergeIntoMaster(self, aBranchNames):
+    # An octopus merge of the branches, made without a working tree.
+    repo = self.__mConfig.getRepo()
+    parents = [repo.heads.master.commit] + [repo.heads[x].commit for x in aBranchNames]
+    repo.index.commit('Merge ' + ', '.join(aBranchNames), parent_commits=parents, head=True)
+
+  def __verifyReachable(self):
+    repo = self.__mConfig.getRepo()
+    trunkSha = repo.heads.master.commit.hexsha
+    tips = set([x.commit.hexsha for x in repo.heads] + [x.commit.hexsha for x in repo.remotes.origin.refs])
+
+    expected = set()
+    for sha in tips:
+      try:
+        repo.git.merge_base('--is-ancestor', sha, trunkSha)
+        expected.add(sha)
+      except GitCommandError:
+        pass
+    self.assertTrue(len(expected) > 1)
+    self.assertTrue(len(expected) < len(tips))
+
+    history = CommitHistory(self.__mConfig.getGitDir())
+    self.assertEquals(expected, history.findReachable(trunkSha, tips))
+    history.close()
+
+  def __verifyDivergence(self):
+    repo = self.__mConfig.getRepo()
+    trunkSha = repo.heads.master.commit.hexsha
+    tips = set([x.commit.hexsha for x in repo.heads] + [x.commit.hexsha for x in repo.remotes.origin.refs])
+
+    history = CommitHistory(self.__mConfig.getGitDir())
+    divergence = history.countDivergence(trunkSha, tips)
+    history.close()
+    for sha in tips:
+      (behind, ahead) = [int(x) for x in repo.git.rev_list('--left-right', '--count', trunkSha + '...' + sha).split()]
+      self.assertEquals((ahead, behind, True), divergence[sha])
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
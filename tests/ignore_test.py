@@ -0,0 +1,53 @@
+import unittest
+import re
+
+from gitbranchhealth.ignore import IgnoreMatcher, translateGlob
+
+class IgnoreTestSuite(unittest.TestCase):
+  def test_exact_names(self):
+    matcher = IgnoreMatcher(['master', 'HEAD', 'release/1.0'])
+    self.assertTrue(matcher.matches('master'))
+    self.assertTrue(matcher.matches('feature/master'))
+    self.assertTrue(matcher.matches('release/1.0'))
+    self.assertFalse(matcher.matches('release/1.01'))
+    self.assertFalse(matcher.matches('mastery'))
+
+  def test_namespaces(self):
+    matcher = IgnoreMatcher(['dependabot/**', 'users/jdoe/'])
+    self.assertTrue(matcher.matches('dependabot/npm/lodash-4.17'))
+    self.assertTrue(matcher.matches('users/jdoe/experiment'))
+    self.assertFalse(matcher.matches('users/other/experiment'))
+    self.assertFalse(matcher.matches('dependabot'))
+    self.assertFalse(matcher.matches('users/jdoe'))
+
+  def test_globs(self):
+    matcher = IgnoreMatcher(['release/*', '*-wip', 'hotfix-[0-9]?', 'archive/**/old'])
+    self.assertTrue(matcher.matches('release/2.0'))
+    self.assertFalse(matcher.matches('release/2.0/fix'))
+    self.assertTrue(matcher.matches('parser-wip'))
+    self.assertFalse(matcher.matches('team/parser-wip'))
+    self.assertTrue(matcher.matches('hotfix-12'))
+    self.assertFalse(matcher.matches('hotfix-a2'))
+    self.assertTrue(matcher.matches('archive/old'))
+    self.assertTrue(matcher.matches('archive/2014/07/old'))
+    self.assertFalse(matcher.matches('feature'))
+
+  def test_translate_glob(self):
+    self.assertTrue(re.match('^' + translateGlob('a[!0-9].c') + '$', 'ab.c'))
+    self.assertFalse(re.match('^' + translateGlob('a[!0-9].c') + '$', 'a1.c'))
+    self.assertFalse(re.match('^' + translateGlob('a[!0-9].c') + '$', 'abxc'))
+
+  def test_many_patterns(self):
+    patterns = ['name-' + str(x) for x in range(100)] + ['glob-' + str(x) + '/*' for x in range(50)] + ['space-' + str(x) + '/' for x in range(50)]
+    matcher = IgnoreMatcher(patterns)
+    self.assertTrue(matcher.matches('name-99'))
+    self.assertTrue(matcher.matches('glob-49/foo'))
+    self.assertTrue(matcher.matches('space-7/foo/bar'))
+    self.assertFalse(matcher.matches('name-100'))
+    self.assertFalse(matcher.matches('feature/foo'))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -1,9 +1,11 @@
 import unittest
 import logging
+import types
 
 from gitbranchhealth.manager import BranchManager
 from gitbranchhealth.branchhealth import BranchHealthConfig
 from gitbranchhealth.branch import Branch
+from gitbranchhealth.transaction import RefUpdateResult
 from testutil import GitRepoTest
 
 class ManagerTestSuite(GitRepoTest):
@@ -32,6 +34,39 @@ class ManagerTestSuite(GitRepoTest):
     self.assertEquals('refs/remotes/', pref2)
 
 
+  def test_ignore_patterns(self):
+    conf = self.__mConfig
+    config = BranchHealthConfig(conf.getRepoPath(),
+                                'all',
+                                1,
+                                aIgnoredBranches=['HEAD', 'master', 'bug-1*', 'bug-27'],
+                                aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    self.assertEquals(['bug-44', 'bug-44'], [x.getName() for x in manager.getBranchMap()])
+    self.assertEquals(['bug-44', 'bug-44'], [x.getName() for x in manager.iterBranches()])
+
+  def test_ref_patterns(self):
+    conf = self.__mConfig
+    config = BranchHealthConfig(conf.getRepoPath(),
+                                'all',
+                                1,
+                                aRefPatterns=['bug-1*', 'refs/heads/bug-27', 'refs/tags/*'],
+                                aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    self.assertEquals(['refs/remotes/origin/bug-1*', 'refs/heads/bug-1*', 'refs/heads/bug-27'], manager.getRefPatterns())
+    self.assertEquals(['bug-14', 'bug-14', 'bug-27', 'bug-143', 'bug-143'],
+                      sorted([x.getName() for x in manager.getBranchMap()], key=lambda x: (len(x), x)))
+
+  def test_refs_sharing_tips(self):
+    conf = self.__mConfig
+    config = BranchHealthConfig(conf.getRepoPath(), 'all', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    sharedTips = manager.getRefsSharingTips()
+    bug14Sha = config.getRepo().git.rev_parse('refs/heads/bug-14')
+    self.assertEquals(['refs/heads/bug-14', 'refs/remotes/origin/bug-14'], sharedTips[bug14Sha])
+    for paths in sharedTips.values():
+      self.assertTrue(len(paths) > 1)
+
   def test_get_branch_map(self):
     # Set 'days' to 1 so that all branches should be old
     # Initially test local branches
@@ -78,6 +113,37 @@ class ManagerTestSuite(GitRepoTest):
 
     self.assertEquals(expectedBranches, actualBranches)
 
+  def test_iter_branches(self):
+    config = BranchHealthConfig(self.__mConfig.getRepoPath(), 'all', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    branches = manager.iterBranches()
+    self.assertTrue(isinstance(branches, types.GeneratorType))
+
+    firstBranch = next(branches)
+    self.assertEquals(Branch.OLD, firstBranch.getHealth())
+    streamedPaths = set([firstBranch.getPath()] + [x.getPath() for x in branches])
+    self.assertEquals(set([x.getPath() for x in manager.getBranchMap()]), streamedPaths)
+
+  def test_get_old_branches_only(self):
+    repo = self.__mConfig.getRepo()
+    repo.index.commit("A new commit")
+    repo.create_head('aNewBranch')
+
+    config = BranchHealthConfig(self.__mConfig.getRepoPath(), 'local', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    self.assertTrue('aNewBranch' in [x.getName() for x in manager.getBranchMap()])
+    self.assertEquals(['bug-14', 'bug-44', 'bug-27', 'bug-143'],
+                      [x.getName() for x in manager.getBranchMap(aOldOnly=True)])
+
+  def test_get_top_branches(self):
+    config = BranchHealthConfig(self.__mConfig.getRepoPath(), 'all', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    branchPaths = [x.getPath() for x in manager.getBranchMap()]
+
+    self.assertEquals(branchPaths[:3], [x.getPath() for x in manager.getTopBranches(3)])
+    self.assertEquals(branchPaths[-3:], [x.getPath() for x in manager.getTopBranches(3, aNewest=True)])
+    self.assertEquals(branchPaths, [x.getPath() for x in manager.getTopBranches(100)])
+
   def test_get_local_branches(self):
     manager = BranchManager(self.__mConfig)
     branches = manager.getLocalBranches()
@@ -118,6 +184,21 @@ class ManagerTestSuite(GitRepoTest):
     # Master and HEAD should be remaining
     self.assertTrue(len(config.getRepo().remotes.origin.refs) == 2)
 
+  def test_delete_remote_branches_keeps_moved_local_branches(self):
+    config = BranchHealthConfig(self.__mConfig.getRepoPath(), 'origin', 1)
+    manager = BranchManager(config)
+    branchesToDelete = [x for x in manager.getBranchMap() if x.getName() in ['bug-14', 'bug-27']]
+
+    # Work is committed to one of the local branches after the scan.
+    repo = config.getRepo()
+    repo.heads['bug-27'].commit = repo.index.commit('Local work', parent_commits=[repo.heads['bug-27'].commit], head=False)
+
+    results = dict((x.getPath(), x) for x in manager.deleteAllOldBranches(branchesToDelete))
+    self.assertTrue(results['refs/remotes/origin/bug-27'].isSuccessful())
+    self.assertTrue(results['refs/heads/bug-14'].isSuccessful())
+    self.assertEquals(RefUpdateResult.MOVED, results['refs/heads/bug-27'].getOutcome())
+    self.assertEquals(['bug-143', 'bug-27', 'bug-44', 'master'], sorted([x.name for x in repo.heads]))
+
 def allTests():
   unittest.main()
 
@@ -0,0 +1,87 @@
+import unittest
+import os
+import sys
+from StringIO import StringIO
+
+from gitbranchhealth.branchhealth import BranchHealthApplication
+from gitbranchhealth.multirepo import findRepositories, readRepositoryList
+from testutil import GitRepoTest
+
+class MultiRepositoryTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(MultiRepositoryTestSuite, self)
+    self.__mParent.setUp()
+    self.__mTempDir = self.__mParent.getTempDir()
+    self.__mRepoPath = self.__mParent.getConfig().getRepoPath()
+
+    # A directory that looks like a repository, but isn't one.
+    os.makedirs(os.path.join(self.__mTempDir, 'broken', '.git'))
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_find_repositories(self):
+    expected = [os.path.join(self.__mTempDir, 'broken'), self.__mRepoPath]
+    self.assertEquals(expected, findRepositories(self.__mTempDir))
+
+  def test_find_bare_repositories(self):
+    mirrorPath = os.path.join(self.__mTempDir, 'mirrors', 'project.git')
+    self.__mParent.getConfig().getRepo().git.clone('--mirror', self.__mRepoPath, mirrorPath)
+
+    expected = [os.path.join(self.__mTempDir, 'broken'), mirrorPath, self.__mRepoPath]
+    self.assertEquals(expected, findRepositories(self.__mTempDir))
+
+    context = BranchHealthApplication(['--scan-dir', os.path.join(self.__mTempDir, 'mirrors'), '-n', '-j', '1'])
+    stream = StringIO()
+    errorStream = StringIO()
+    context.showMultiRepositoryHealth(stream, errorStream)
+    self.assertEquals('', errorStream.getvalue())
+    lines = stream.getvalue().splitlines()
+    self.assertEquals(mirrorPath + ':', lines[0])
+    self.assertEquals(['refs/heads/bug-14:', 'refs/heads/bug-44:', 'refs/heads/bug-27:', 'refs/heads/bug-143:'],
+                      [x.split()[0] for x in lines[1:]])
+
+  def test_single_repository_options_rejected(self):
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+      for option in [['--by-author'], ['--show-merged'], ['--ahead-behind'], ['--shared-tips'], ['--restore', '2014-07-20']]:
+        self.assertRaises(SystemExit, BranchHealthApplication, ['--scan-dir', self.__mTempDir] + option)
+    finally:
+      sys.stderr = stderr
+
+  def test_read_repository_list(self):
+    listStream = StringIO('# comment\n/a/repo\n\n  /another/repo  \n')
+    self.assertEquals(['/a/repo', '/another/repo'], readRepositoryList(listStream))
+
+  def test_scan_directory(self):
+    context = BranchHealthApplication(['--scan-dir', self.__mTempDir, '-n', '-j', '2'])
+    self.assertTrue(context.isMultiRepository())
+
+    stream = StringIO()
+    errorStream = StringIO()
+    context.showMultiRepositoryHealth(stream, errorStream)
+
+    # The broken repository is reported, but doesn't stop the other one from
+    # being scanned.
+    self.assertTrue(os.path.join(self.__mTempDir, 'broken') in errorStream.getvalue())
+    lines = stream.getvalue().splitlines()
+    self.assertEquals(self.__mRepoPath + ':', lines[0])
+    self.assertEquals(['refs/heads/bug-14:', 'refs/heads/bug-44:', 'refs/heads/bug-27:', 'refs/heads/bug-143:'],
+                      [x.split()[0] for x in lines[1:]])
+
+  def test_combined_report_from_stdin(self):
+    context = BranchHealthApplication(['--repository-list', '-', '--combined', '-n', '-j', '1'])
+    stream = StringIO()
+    context.showMultiRepositoryHealth(stream, StringIO(), StringIO(self.__mRepoPath + '\n' + self.__mRepoPath + '\n'))
+
+    lines = stream.getvalue().splitlines()
+    self.assertEquals(8, len(lines))
+    self.assertTrue(lines[0].startswith(self.__mRepoPath + ' refs/heads/bug-14:'))
+    self.assertTrue(lines[1].startswith(self.__mRepoPath + ' refs/heads/bug-14:'))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,58 @@
+import unittest
+import os
+
+from gitbranchhealth.objects import ObjectReader, applyDelta, parseIdentity
+from gitbranchhealth.refs import RefReader
+from testutil import GitRepoTest
+
+class ObjectsTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ObjectsTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_read_commit_header(self):
+    repo = self.__mConfig.getRepo()
+    reader = ObjectReader(repo.git_dir)
+    for head in repo.heads:
+      sha = head.commit.hexsha
+      header = reader.readCommitHeader(sha)
+      self.assertEquals(head.commit.committed_date, reader.readCommitTime(sha))
+      self.assertEquals([x.hexsha for x in head.commit.parents], header.get('parent', []))
+    reader.close()
+
+  def test_read_tree_is_not_commit(self):
+    repo = self.__mConfig.getRepo()
+    reader = ObjectReader(repo.git_dir)
+    self.assertEquals(None, reader.readCommitTime(repo.heads.master.commit.tree.hexsha))
+    self.assertEquals(None, reader.readCommitTime('0' * 40))
+    reader.close()
+
+  def test_loose_ref_overrides_packed_ref(self):
+    repo = self.__mConfig.getRepo()
+    repo.git.pack_refs('--all')
+    masterSha = repo.heads.master.commit.hexsha
+    repo.git.update_ref('refs/heads/bug-14', masterSha)
+
+    refs = dict(RefReader(repo.git_dir).readRefs(['refs/heads']))
+    self.assertEquals(masterSha, refs['refs/heads/bug-14'])
+    self.assertEquals(repo.heads['bug-27'].commit.hexsha, refs['refs/heads/bug-27'])
+
+  def test_apply_delta(self):
+    base = b'0123456789'
+    # Copy 4 bytes from offset 2, then insert 'ab'.
+    delta = b'\x0a\x06' + b'\x91\x02\x04' + b'\x02ab'
+    self.assertEquals(b'2345ab', applyDelta(base, delta))
+
+  def test_parse_identity(self):
+    self.assertEquals(('A U Thor <a@example.com>', 1405721203),
+                      parseIdentity('A U Thor <a@example.com> 1405721203 -0500'))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
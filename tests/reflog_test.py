@@ -0,0 +1,70 @@
+import unittest
+import logging
+import os
+
+from gitbranchhealth.config import BranchHealthConfig
+from gitbranchhealth.reflog import ReflogReader
+from gitbranchhealth.resolver import ActivityResolver
+from testutil import GitRepoTest
+
+class ReflogTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ReflogTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_read_last_update_time(self):
+    reader = ReflogReader(self.__mConfig.getGitDir())
+    self.assertEquals(None, reader.readLastUpdateTime('refs/heads/does-not-exist'))
+
+    # Entries longer than a block, and many of them, so that the last entry
+    # spans a block boundary.
+    entries = []
+    for index in range(50):
+      message = 'update ' + str(index) + ' ' + 'x' * (index * 37)
+      entries.append(self.__createEntry(1500000000 + index, message))
+    self.__writeReflog('refs/heads/bug-14', entries)
+    self.assertEquals(1500000049, reader.readLastUpdateTime('refs/heads/bug-14'))
+
+    self.__writeReflog('refs/heads/bug-14', [self.__createEntry(1400000000, 'only entry')])
+    self.assertEquals(1400000000, reader.readLastUpdateTime('refs/heads/bug-14'))
+
+  def test_activity_sources(self):
+    repoPath = self.__mConfig.getRepoPath()
+    commitEpochs = self.__resolve('author')
+    self.__writeReflog('refs/heads/bug-14', [self.__createEntry(2000000000, 'pushed')])
+    self.__writeReflog('refs/heads/bug-27', [self.__createEntry(1, 'ancient')])
+    os.remove(os.path.join(self.__mConfig.getGitDir(), 'logs', 'refs', 'heads', 'bug-44'))
+
+    reflogEpochs = self.__resolve('reflog')
+    self.assertEquals(2000000000, reflogEpochs['refs/heads/bug-14'])
+    self.assertEquals(1, reflogEpochs['refs/heads/bug-27'])
+    self.assertEquals(commitEpochs['refs/heads/bug-44'], reflogEpochs['refs/heads/bug-44'])
+
+    maxEpochs = self.__resolve('max')
+    self.assertEquals(2000000000, maxEpochs['refs/heads/bug-14'])
+    self.assertEquals(commitEpochs['refs/heads/bug-27'], maxEpochs['refs/heads/bug-27'])
+    self.assertEquals(commitEpochs['refs/heads/bug-44'], maxEpochs['refs/heads/bug-44'])
+
+  ## Private API ##
+
+  def __resolve(self, aActivitySource):
+    config = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aActivitySource=aActivitySource)
+    return dict([(path, epoch) for (path, sha, epoch) in ActivityResolver(config).resolve(['refs/heads'])])
+
+  def __createEntry(self, aEpoch, aMessage):
+    sha = '0' * 40
+    return sha + ' ' + sha + ' A U Thor <author@example.com> ' + str(aEpoch) + ' +0000\t' + aMessage + '\n'
+
+  def __writeReflog(self, aRefPath, aEntries):
+    with open(os.path.join(self.__mConfig.getGitDir(), 'logs', *aRefPath.split('/')), 'w') as reflogHandle:
+      reflogHandle.write(''.join(aEntries))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+
+from gitbranchhealth.refs import PackedRefs, RefReader, createRefPatternMatcher, getRefPatternBase
+
+class RefsTestSuite(unittest.TestCase):
+  def setUp(self):
+    self.__mTempDir = tempfile.mkdtemp(prefix='gitBranchHealthTest')
+
+  def tearDown(self):
+    shutil.rmtree(self.__mTempDir)
+
+  def test_ref_patterns(self):
+    self.assertEquals('refs/heads', getRefPatternBase('refs/heads/'))
+    self.assertEquals('refs/heads/feature', getRefPatternBase('refs/heads/feature/*-wip'))
+
+    matches = createRefPatternMatcher('refs/heads/feature/*')
+    self.assertTrue(matches('refs/heads/feature/foo'))
+    self.assertFalse(matches('refs/heads/feature/foo/bar'))
+    self.assertTrue(createRefPatternMatcher('refs/heads')('refs/heads/feature/foo/bar'))
+    self.assertFalse(createRefPatternMatcher('refs/heads')('refs/headsup'))
+
+  def test_packed_refs_prefix(self):
+    refs = self.__createRefs(500)
+    for isSorted in [True, False]:
+      packedRefs = PackedRefs(self.__writePackedRefs(refs, isSorted))
+      self.assertEquals(isSorted, packedRefs.isSorted())
+      for prefix in ['refs/', 'refs/heads/', 'refs/heads/b', 'refs/remotes/origin/a7', 'refs/tags/', 'refs/zzz', 'a', '']:
+        expected = sorted([(path, sha) for (path, sha) in refs if path.startswith(prefix)])
+        self.assertEquals(expected, sorted(packedRefs.iterPrefix(prefix)))
+
+  def test_packed_refs_lookup(self):
+    refs = self.__createRefs(200)
+    packedRefs = PackedRefs(self.__writePackedRefs(refs, True))
+    for (path, sha) in refs:
+      self.assertEquals(sha, packedRefs.lookup(path))
+    self.assertEquals(None, packedRefs.lookup('refs/heads/a'))
+    self.assertEquals(None, packedRefs.lookup('refs/heads/zzzz'))
+    self.assertEquals(None, packedRefs.lookup('refs/a'))
+
+  def test_missing_or_empty_packed_refs(self):
+    path = os.path.join(self.__mTempDir, 'packed-refs')
+    self.assertEquals([], list(PackedRefs(path).iterPrefix('refs/')))
+    open(path, 'w').close()
+    self.assertEquals([], list(PackedRefs(path).iterPrefix('refs/')))
+    self.assertEquals(None, PackedRefs(path).lookup('refs/heads/master'))
+
+  def test_loose_refs_override_packed_refs(self):
+    refs = self.__createRefs(50)
+    self.__writePackedRefs(refs, True)
+    (path, sha) = [x for x in refs if x[0].startswith('refs/heads/')][0]
+    looseSha = 'f' * 40
+    looseDir = os.path.join(self.__mTempDir, *path.split('/')[:-1])
+    if not os.path.isdir(looseDir):
+      os.makedirs(looseDir)
+    with open(os.path.join(self.__mTempDir, *path.split('/')), 'w') as refHandle:
+      refHandle.write(looseSha + '\n')
+
+    reader = RefReader(self.__mTempDir)
+    readRefs = dict(reader.readRefs(['refs/heads']))
+    self.assertEquals(looseSha, readRefs[path])
+    self.assertEquals(len([x for x in refs if x[0].startswith('refs/heads/')]), len(readRefs))
+    self.assertEquals(looseSha, reader.readRef(path))
+
+  def test_fingerprint_non_ascii_refs(self):
+    path = 'refs/heads/caf\xc3\xa9'
+    self.__writePackedRefs([(path, 'a' * 40)], True)
+    reader = RefReader(self.__mTempDir)
+    packedFingerprint = reader.computeFingerprint(['refs/heads'], ['ignored=caf\xc3\xa9'])
+    self.assertEquals(packedFingerprint, reader.computeFingerprint(['refs/heads'], ['ignored=caf\xc3\xa9']))
+
+    # The loose ref's path is hashed as it was read from the file system.
+    os.makedirs(os.path.join(self.__mTempDir, 'refs', 'heads'))
+    with open(os.path.join(self.__mTempDir, *path.split('/')), 'w') as refHandle:
+      refHandle.write('b' * 40 + '\n')
+    looseFingerprint = reader.computeFingerprint(['refs/heads'], ['ignored=caf\xc3\xa9'])
+    self.assertNotEquals(packedFingerprint, looseFingerprint)
+    self.assertEquals([(path, 'b' * 40)], reader.readRefs(['refs/heads']))
+
+  ## Private API ##
+
+  def __createRefs(self, aCount):
+    random.seed(aCount)
+    refs = {}
+    namespaces = ['refs/heads/', 'refs/remotes/origin/', 'refs/tags/']
+    while len(refs) < aCount:
+      name = ''.join([random.choice('abc/') for x in range(random.randint(1, 6))]).strip('/').replace('//', '/')
+      if name:
+        path = random.choice(namespaces) + name + str(random.randint(0, 9))
+        refs[path] = '%040x' % random.getrandbits(160)
+    return sorted(refs.items())
+
+  def __writePackedRefs(self, aRefs, aIsSorted):
+    path = os.path.join(self.__mTempDir, 'packed-refs')
+    traits = 'peeled fully-peeled'
+    refs = list(aRefs)
+    if aIsSorted:
+      traits += ' sorted'
+    else:
+      random.shuffle(refs)
+
+    with open(path, 'w') as packedRefsHandle:
+      packedRefsHandle.write('# pack-refs with: ' + traits + ' \n')
+      for (refPath, sha) in refs:
+        packedRefsHandle.write(sha + ' ' + refPath + '\n')
+        if refPath.startswith('refs/tags/'):
+          packedRefsHandle.write('^' + sha[::-1] + '\n')
+    return path
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
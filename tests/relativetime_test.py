@@ -0,0 +1,38 @@
+import unittest
+
+import babel.dates
+from babel.dates import format_timedelta
+
+from gitbranchhealth.relativetime import TIMEDELTA_UNITS, findBucket, formatRelativeTime
+
+class RelativeTimeTestSuite(unittest.TestCase):
+  def test_units_match_babel(self):
+    self.assertEquals(tuple(babel.dates.TIMEDELTA_UNITS), TIMEDELTA_UNITS)
+
+  def test_find_bucket(self):
+    self.assertEquals(('second', 0), findBucket(0))
+    self.assertEquals(('minute', 1), findBucket(55))
+    self.assertEquals(('day', 5), findBucket(5 * 86400 + 3600))
+    self.assertEquals(('week', 3), findBucket(20 * 86400))
+    self.assertEquals(('year', 2), findBucket(-2 * 31536000))
+
+  def test_matches_babel(self):
+    units = [1, 60, 3600, 86400, 604800, 2592000, 31536000]
+    durations = list(range(0, 7200, 13))
+    for unit in units:
+      for count in range(1, 30):
+        for delta in (-1, 0, 1):
+          durations.append(int(count * unit * 0.85) + delta)
+
+    for locale in ('en_US', 'de_DE'):
+      for seconds in durations:
+        self.assertEquals(format_timedelta(seconds, locale=locale) + ' ago', formatRelativeTime(seconds, locale))
+
+  def test_default_locale(self):
+    self.assertEquals(format_timedelta(20 * 86400) + ' ago', formatRelativeTime(20 * 86400))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
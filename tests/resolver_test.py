@@ -0,0 +1,96 @@
+import unittest
+import logging
+
+from gitbranchhealth.resolver import ActivityResolver, epochToDateTime
+from gitbranchhealth.branch import Branch
+from gitbranchhealth.config import BranchHealthConfig
+from testutil import GitRepoTest
+
+class ResolverTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ResolverTestSuite, self)
+    self.__mParent.setUp()
+    self.__mConfig = self.__mParent.getConfig()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_resolve_local_branches(self):
+    resolver = ActivityResolver(self.__mConfig)
+    paths = [path for (path, sha, epoch) in resolver.resolve(['refs/heads'])]
+    expectedPaths = ['refs/heads/bug-14', 'refs/heads/bug-143', 'refs/heads/bug-27',
+                     'refs/heads/bug-44', 'refs/heads/master']
+    self.assertEquals(expectedPaths, paths)
+
+  def test_resolve_groups_by_prefix(self):
+    resolver = ActivityResolver(self.__mConfig)
+    resolved = resolver.resolve(['refs/remotes/origin', 'refs/heads'])
+    paths = [path for (path, sha, epoch) in resolved]
+    self.assertTrue(paths[0].startswith('refs/remotes/origin/'))
+    self.assertEquals('refs/heads/master', paths[-1])
+
+  def test_resolved_date_matches_branch(self):
+    resolver = ActivityResolver(self.__mConfig)
+    for (path, sha, epoch) in resolver.resolve(['refs/heads']):
+      branch = Branch(path, self.__mConfig)
+      self.assertEquals(branch.getLastActivity(), epochToDateTime(epoch))
+
+  def test_native_backend_matches_git(self):
+    nativeConfig = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aBackend='native')
+    prefixes = ['refs/remotes/origin', 'refs/heads']
+
+    expected = ActivityResolver(self.__mConfig).resolve(prefixes)
+    self.assertEquals(expected, ActivityResolver(nativeConfig).resolve(prefixes))
+
+    # Pack all refs and objects, so that the native backend has to read
+    # packed-refs and (deltified) packfiles.
+    self.__mConfig.getRepo().git.gc('--aggressive', '--prune=now')
+    self.assertEquals(expected, ActivityResolver(nativeConfig).resolve(prefixes))
+
+  def test_resolve_ref_patterns(self):
+    nativeConfig = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aBackend='native')
+    patterns = ['refs/heads/bug-1*', 'refs/heads/bug-2?', 'refs/heads/master']
+    expectedPaths = ['refs/heads/bug-14', 'refs/heads/bug-143', 'refs/heads/bug-27', 'refs/heads/master']
+    for config in [self.__mConfig, nativeConfig]:
+      resolver = ActivityResolver(config)
+      self.assertEquals(expectedPaths, [path for (path, sha, epoch) in resolver.resolve(patterns)])
+      self.assertEquals(sorted(expectedPaths), sorted([path for (path, sha) in resolver.iterRefs(patterns)]))
+
+    # A '*' doesn't match across namespaces.
+    self.assertEquals([], ActivityResolver(nativeConfig).resolve(['refs/*']))
+
+  def test_resolve_identities(self):
+    repo = self.__mConfig.getRepo()
+    nativeConfig = BranchHealthConfig(self.__mConfig.getRepoPath(), aLogLevel=logging.ERROR, aBackend='native')
+    prefixes = ['refs/remotes/origin', 'refs/heads']
+    expected = sorted(ActivityResolver(self.__mConfig).resolve(prefixes))
+    for config in [self.__mConfig, nativeConfig]:
+      resolved = sorted(ActivityResolver(config).iterResolveIdentities(prefixes))
+      self.assertEquals(expected, [x[:3] for x in resolved])
+      for (path, sha, epoch, author, committer) in resolved:
+        self.assertEquals(repo.git.log('-1', '--format=%an <%ae>|%cn <%ce>', sha), author + '|' + committer)
+
+  def test_author_and_committer_dates(self):
+    repo = self.__mConfig.getRepo()
+    master = repo.heads.master.commit
+    commit = repo.index.commit('Rebased commit', parent_commits=[master], head=False,
+                               author_date='2014-01-01T00:00:00', commit_date='2014-06-01T00:00:00')
+    repo.create_head('rebased', commit)
+    repo.git.commit_graph('write', '--reachable')
+
+    repoPath = self.__mConfig.getRepoPath()
+    for (activitySource, expectedEpoch) in [(None, commit.authored_date), ('committer', commit.committed_date)]:
+      for (backend, noCache) in [('git', True), ('git', False), ('native', False)]:
+        config = BranchHealthConfig(repoPath, aLogLevel=logging.ERROR, aBackend=backend, aNoCache=noCache, aActivitySource=activitySource)
+        for attempt in range(2):
+          resolved = dict((path, epoch) for (path, sha, epoch) in ActivityResolver(config).resolve(['refs/heads']))
+          self.assertEquals(expectedEpoch, resolved['refs/heads/rebased'])
+        identities = dict((x[0], x[2]) for x in ActivityResolver(config).iterResolveIdentities(['refs/heads']))
+        self.assertEquals(expectedEpoch, identities['refs/heads/rebased'])
+        self.assertEquals(epochToDateTime(expectedEpoch), Branch('rebased', config).getLastActivity())
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import stat
+import threading
+import time
+
+from gitbranchhealth.branch import Branch
+from gitbranchhealth.scanner import ConcurrentScanner
+from testutil import GitRepoTest
+
+class ScannerTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ScannerTestSuite, self)
+    self.__mParent.setUp()
+    self.__mRepoPath = self.__mParent.getConfig().getRepoPath()
+    self.__mTempDir = self.__mParent.getTempDir()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_scan_repositories(self):
+    missingPath = os.path.join(self.__mTempDir, 'missing')
+    scanner = ConcurrentScanner(aMaxConcurrency=2, aRemoteName='all')
+    results = dict((repoPath, (rows, error)) for (repoPath, rows, error) in scanner.scan([self.__mRepoPath, missingPath]))
+
+    # Ignored branches (master and origin/HEAD) are left out, as they would be
+    # by git-branchhealth itself.
+    (rows, error) = results[self.__mRepoPath]
+    self.assertEquals(None, error)
+    self.assertEquals(8, len(rows))
+    self.assertEquals(['refs/heads/bug-14', 'refs/remotes/origin/bug-14'], [path for (path, sha, epoch, health) in rows[0:2]])
+    for (path, sha, epoch, health) in rows:
+      self.assertEquals(Branch.OLD, health)
+
+    (rows, error) = results[missingPath]
+    self.assertEquals([], rows)
+    self.assertTrue(error)
+
+  def test_repository_configuration(self):
+    repo = self.__mParent.getConfig().getRepo()
+    writer = repo.config_writer()
+    writer.set_value('branchhealth', 'ignoredbranches', 'master,bug-1*')
+    writer.set_value('branchhealth', 'thresholds', '100000,200000')
+    writer.set_value('branchhealth', 'backend', 'native')
+    writer.release()
+
+    # The native backend doesn't run git at all, so a broken git executable
+    # makes no difference.
+    scanner = ConcurrentScanner(aGitCommand=os.path.join(self.__mTempDir, 'missing-git'))
+    [(repoPath, rows, error)] = list(scanner.scan([self.__mRepoPath]))
+    self.assertEquals(None, error)
+    self.assertEquals(['refs/heads/bug-27', 'refs/heads/bug-44'], sorted([path for (path, sha, epoch, health) in rows]))
+    for (path, sha, epoch, health) in rows:
+      self.assertEquals(Branch.HEALTHY, health)
+
+  def test_timeout(self):
+    scanner = ConcurrentScanner(aTimeout=0.5, aGitCommand=self.__createSlowGit())
+    start = time.time()
+    results = list(scanner.scan([self.__mRepoPath]))
+    self.assertTrue(time.time() - start < 5)
+    self.assertTrue(results[0][2].startswith('timed out'))
+
+  def test_cancel_running_scan(self):
+    scanner = ConcurrentScanner(aMaxConcurrency=1, aGitCommand=self.__createSlowGit())
+    generator = scanner.scan([self.__mRepoPath] * 3)
+    start = time.time()
+
+    # Cancel once the first slow git process has had time to start. It should
+    # be killed, and the remaining repositories should never be started.
+    threading.Timer(0.5, scanner.cancel).start()
+    results = list(generator)
+    self.assertTrue(time.time() - start < 5)
+    self.assertEquals(3, len(results))
+    for (repoPath, rows, error) in results:
+      self.assertEquals('cancelled', error)
+
+  ## Private API ##
+
+  def __createSlowGit(self):
+    scriptPath = os.path.join(self.__mTempDir, 'slow-git')
+    with open(scriptPath, 'w') as scriptHandle:
+      scriptHandle.write('#!/bin/sh\nexec sleep 10\n')
+    os.chmod(scriptPath, stat.S_IRWXU)
+    return scriptPath
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()
@@ -0,0 +1,90 @@
+import unittest
+import logging
+import time
+
+from gitbranchhealth.branch import Branch
+from gitbranchhealth.cache import ReportCache
+from gitbranchhealth.config import BranchHealthConfig
+from gitbranchhealth.health import HealthClassifier
+from gitbranchhealth.manager import BranchManager
+from gitbranchhealth.table import BranchTable
+from testutil import GitRepoTest
+
+class BranchTableTestSuite(unittest.TestCase):
+  def test_append_and_read(self):
+    table = BranchTable()
+    table.append('refs/heads/feature/one', 'a' * 40, 1405721203)
+    table.append('refs/remotes/origin/two', 'b' * 40, 1404058602, Branch.OLD)
+    table.append('refs/heads/three', 'c' * 40, 1405305521)
+
+    self.assertEquals(3, len(table))
+    self.assertEquals('refs/heads/feature/one', table.getPath(0))
+    self.assertEquals('one', table.getName(0))
+    self.assertEquals('refs/remotes/origin/two', table.getPath(1))
+    self.assertEquals('b' * 40, table.getSha(1))
+    self.assertEquals(1404058602, table.getLastActivityEpoch(1))
+    self.assertEquals(Branch.OLD, table.getHealth(1))
+    self.assertEquals('refs/heads/three', table.getPath(2))
+
+  def test_classify(self):
+    now = int(time.time())
+    table = BranchTable()
+    table.append('refs/heads/new', 'a' * 40, now)
+    table.append('refs/heads/aged', 'b' * 40, now - 20 * 86400)
+    table.append('refs/heads/old', 'c' * 40, now - 40 * 86400)
+    table.classify(HealthClassifier.fromHealthyDays(14))
+    self.assertEquals([Branch.HEALTHY, Branch.AGED, Branch.OLD], [table.getHealth(x) for x in range(3)])
+
+    oldTable = table.selectHealth(Branch.OLD)
+    self.assertEquals(['refs/heads/old'], [oldTable.getPath(x) for x in range(len(oldTable))])
+
+  def test_sort_by_age(self):
+    table = BranchTable()
+    table.append('refs/heads/b', 'a' * 40, 2)
+    table.append('refs/heads/a', 'a' * 40, 2)
+    table.append('refs/remotes/origin/a', 'a' * 40, 2)
+    table.append('refs/heads/c', 'a' * 40, 1)
+    sortedTable = table.sortByAge(['refs/remotes/origin', 'refs/heads'])
+    self.assertEquals(['refs/heads/c', 'refs/remotes/origin/a', 'refs/heads/a', 'refs/heads/b'],
+                      [sortedTable.getPath(x) for x in range(len(sortedTable))])
+
+class ManagerBranchTableTestSuite(GitRepoTest):
+  def setUp(self):
+    self.__mParent = super(ManagerBranchTableTestSuite, self)
+    self.__mParent.setUp()
+
+  def tearDown(self):
+    self.__mParent.tearDown()
+
+  def test_table_matches_branch_map(self):
+    config = BranchHealthConfig(self.__mParent.getConfig().getRepoPath(), 'all', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    table = manager.getBranchTable()
+    branchMap = manager.getBranchMap()
+
+    self.assertEquals([x.getPath() for x in branchMap], [table.getPath(x) for x in range(len(table))])
+    self.assertEquals([x.getHealth() for x in branchMap], [table.getHealth(x) for x in range(len(table))])
+    self.assertEquals([x.getSha() for x in branchMap], [table.getSha(x) for x in range(len(table))])
+
+  def test_table_from_cache(self):
+    config = BranchHealthConfig(self.__mParent.getConfig().getRepoPath(), 'all', 1, aLogLevel=logging.ERROR)
+    manager = BranchManager(config)
+    reportCache = ReportCache(config.getGitDir())
+    self.assertEquals(None, manager.loadBranchTableFromCache(reportCache))
+
+    # The first call computes and saves the table, and later calls load it,
+    # with the health of each branch marked again.
+    expected = manager.getBranchTable()
+    for table in [manager.getBranchTableFromCache(reportCache), manager.loadBranchTableFromCache(reportCache)]:
+      self.assertTrue(isinstance(table, BranchTable))
+      self.assertEquals([expected.getPath(x) for x in range(len(expected))], [table.getPath(x) for x in range(len(table))])
+      self.assertEquals([expected.getHealth(x) for x in range(len(expected))], [table.getHealth(x) for x in range(len(table))])
+
+    oldTable = manager.getBranchTableFromCache(reportCache, aOldOnly=True)
+    self.assertEquals(len(expected.selectHealth(Branch.OLD)), len(oldTable))
+
+def allTests():
+  unittest.main()
+
+if __name__ == '__main__':
+  allTests()